@@ -3,6 +3,10 @@ import logging
 import traceback
 
 from modules.mongodb_connector import MongoDBConnector
+from modules.mongodb_indexes import ensure_indexes
+from modules.response_cache import response_cache
+from modules import explain_executor
+from configs.mongo_conf import mongo_settings
 from modules.time_utils import get_kst_time
 from configs.app_conf import app_settings
 from configs.report_conf import report_settings
@@ -13,18 +17,22 @@ from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
+from .middleware import MongoRouteTagMiddleware, CompressionMiddleware
+
 from .routes.instance_setup import router as instance_setup_router
-from .routes.slow_query import router as slow_queries_router
+from .routes.slow_query import router as slow_queries_router, slow_query_live
 from .routes.slow_query_explain import router as slow_query_explain_router
 from .routes.mysql_com_status import router as mysql_com_status_router
 from .routes.mysql_disk_usage import router as mysql_disk_usage_router
 from .routes.slow_query_stat import router as slow_query_stat_router
+from .routes.mongo_admin import router as mongo_admin_router
 
 from report_tools import instance_statistics
 from report_tools import report_generator
 from report_tools import prometheus_daily_metrics
 from report_tools import report_downloader
 from report_tools import cleanup
+from report_tools import archiver
 from report_tools.scheduler import start_scheduler
 import threading
 
@@ -35,10 +43,20 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     await MongoDBConnector.initialize()
     logger.info(f"MongoDB connection initialized at {get_kst_time()}")
+    db = await MongoDBConnector.get_database()
+    await ensure_indexes(db)
+    response_cache.start_invalidation(db, [
+        mongo_settings.MONGO_COM_STATUS_COLLECTION,
+        mongo_settings.MONGO_DISK_USAGE_COLLECTION,
+        mongo_settings.MONGO_SLOW_LOG_ROLLUP_COLLECTION,
+        mongo_settings.MONGO_RDS_INSTANCE_ALL_STAT_COLLECTION
+    ])
     yield
-    if MongoDBConnector.client:
-        await MongoDBConnector.close()
-        logger.info(f"MongoDB connection closed at {get_kst_time()}")
+    await response_cache.stop_invalidation()
+    await explain_executor.shutdown()
+    await slow_query_live.stop()
+    await MongoDBConnector.close()
+    logger.info(f"MongoDB connection closed at {get_kst_time()}")
 
 app = FastAPI(
     title=app_settings.APP_TITLE,
@@ -55,6 +73,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MongoRouteTagMiddleware)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=app_settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=app_settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=app_settings.COMPRESSION_BROTLI_QUALITY
+)
 
 app.mount("/static", StaticFiles(directory=app_settings.STATIC_FILES_DIR), name="static")
 templates = Jinja2Templates(directory=app_settings.TEMPLATES_DIR)
@@ -73,6 +98,8 @@ app.include_router(report_generator.router, prefix="/api/v1/reports", tags=["Rep
 app.include_router(prometheus_daily_metrics.router, prefix="/api/v1/prometheus", tags=["Prometheus Metrics"])
 app.include_router(report_downloader.router, prefix="/api/v1/reports", tags=["Report Downloader"])
 app.include_router(cleanup.router, prefix="/api/v1/reports", tags=["Cleanup"])
+app.include_router(archiver.router, prefix="/api/v1/reports", tags=["Archive"])
+app.include_router(mongo_admin_router, prefix="/api/v1/admin/mongodb", tags=["MongoDB Admin"])
 
 
 # 기본 리포트 디렉토리 생성
@@ -88,8 +115,9 @@ async def get_favicon():
 @app.get("/", tags=["Health Check"])
 async def health_check():
     try:
-        db = await MongoDBConnector.get_database()
-        await db.command('ping')
+        await MongoDBConnector.get_database()
+        if not await MongoDBConnector.ping():
+            raise ConnectionError("MongoDB ping failed")
         return JSONResponse(content={"status": "healthy", "database": "connected"}, status_code=200)
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
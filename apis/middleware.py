@@ -0,0 +1,144 @@
+import zlib
+from typing import Optional
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+from modules.mongodb_monitoring import current_route
+
+
+class MongoRouteTagMiddleware:
+    """
+    요청을 처리하는 동안 MongoDB 명령 리스너가 사용할 라우트 태그를 설정하는 ASGI 미들웨어입니다.
+    경로 변수 값이 아니라 라우트 경로 템플릿으로 태그를 붙여 같은 엔드포인트끼리 집계되도록 합니다.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_route.set(f"{scope['method']} {self._route_path(scope)}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
+
+    @staticmethod
+    def _route_path(scope: Scope) -> str:
+        app = scope.get("app")
+        for route in getattr(getattr(app, "router", None), "routes", []):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return scope["path"]
+
+
+# 이미 압축된 형식(parquet, 이미지 등)은 다시 압축하지 않음
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/msgpack",
+                      "application/vnd.apache.arrow.stream", "application/javascript", "text/", "image/svg+xml")
+# 이벤트마다 즉시 전달되어야 하는 스트림 (SSE)
+UNBUFFERED_TYPES = ("text/event-stream",)
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    qualities = {}
+    for part in accept_encoding.split(","):
+        fields = [field.strip() for field in part.split(";")]
+        quality = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        qualities[fields[0].lower()] = quality
+    # q 값이 같으면 brotli 우선
+    candidates = [(qualities[name], name == "br", name) for name in ("br", "gzip") if qualities.get(name, 0) > 0]
+    return max(candidates)[2] if candidates else None
+
+
+class _Encoder:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+        self.encoding = encoding
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+        # 스트리밍 응답은 청크마다 sync flush 하여 클라이언트가 바로 풀 수 있도록 함
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Accept-Encoding 에 따라 brotli 또는 gzip 으로 응답을 압축하는 ASGI 미들웨어입니다.
+    단일 본문 응답은 minimum_size 미만이면 그대로 보내고, 스트리밍 응답은 청크 단위로 압축합니다.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if ("content-encoding" in headers or message["status"] in (204, 304)
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)
+                        or content_type.startswith(UNBUFFERED_TYPES)):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # 표현이 달라지므로 강한 ETag 를 약한 ETag 로 변경
+                    headers["etag"] = f"W/{etag}"
+                await send(start_message)
+
+            await send({"type": "http.response.body", "body": encoder.compress(body, not more_body),
+                        "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
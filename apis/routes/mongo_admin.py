@@ -0,0 +1,83 @@
+from fastapi import APIRouter, HTTPException, Query
+from modules.mongodb_connector import MongoDBConnector
+from modules.mongodb_indexes import ensure_indexes, get_index_drift_report
+from modules.response_cache import response_cache
+from modules.sql_utils import backfill_slow_query_metadata
+from modules.explain_executor import backfill_plan_summaries
+from configs.mongo_conf import mongo_settings
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/pool_stats")
+async def get_pool_stats():
+    return MongoDBConnector.get_pool_stats()
+
+
+@router.get("/indexes")
+async def get_index_report():
+    try:
+        db = await MongoDBConnector.get_database()
+        return await get_index_drift_report(db)
+    except Exception as e:
+        logger.error(f"Error building index drift report: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"인덱스 리포트 생성 중 오류 발생: {str(e)}")
+
+
+@router.post("/indexes")
+async def apply_indexes():
+    try:
+        db = await MongoDBConnector.get_database()
+        return await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Error applying index catalog: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"인덱스 적용 중 오류 발생: {str(e)}")
+
+
+@router.post("/slow_queries/backfill", description="tables/digest 가 없는 기존 슬로우 쿼리 문서 채우기")
+async def backfill_slow_queries(batch_size: int = Query(1000, ge=100, le=10000)):
+    try:
+        collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_COLLECTION)
+        return {"updated": await backfill_slow_query_metadata(collection, batch_size)}
+    except Exception as e:
+        logger.error(f"Error backfilling slow query metadata: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"슬로우 쿼리 백필 중 오류 발생: {str(e)}")
+
+
+@router.post("/plans/backfill", description="summary/formatted_sql 이 없는 기존 실행 계획 문서 채우기")
+async def backfill_plans(batch_size: int = Query(500, ge=10, le=5000)):
+    try:
+        return {"updated": await backfill_plan_summaries(batch_size)}
+    except Exception as e:
+        logger.error(f"Error backfilling plan summaries: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"실행 계획 백필 중 오류 발생: {str(e)}")
+
+
+@router.get("/command_stats", description="라우트/명령/컬렉션별 MongoDB 명령 집계 (explain 샘플 포함)")
+async def get_command_stats(
+    sort_by: str = Query("total_ms", pattern="^(total_ms|avg_ms|max_ms|count|docs_returned|docs_examined|docs_examined_per_returned)$"),
+    limit: int = Query(50, ge=1, le=1000)
+):
+    return {
+        "sample_rate": MongoDBConnector.command_listener.sample_rate,
+        "commands": MongoDBConnector.command_listener.snapshot(sort_by=sort_by, limit=limit)
+    }
+
+
+@router.delete("/command_stats")
+async def reset_command_stats():
+    MongoDBConnector.command_listener.reset()
+    return {"status": "success"}
+
+
+@router.get("/response_cache")
+async def get_response_cache_stats():
+    return response_cache.get_stats()
+
+
+@router.delete("/response_cache")
+async def clear_response_cache():
+    response_cache.clear()
+    return {"status": "success"}
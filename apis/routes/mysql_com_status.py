@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Optional, List
-from datetime import timedelta
+from datetime import datetime, timedelta
 from modules.mongodb_connector import MongoDBConnector
+from modules.response_cache import response_cache, cache_tag
+from modules.content_negotiation import JSON, MSGPACK, ARROW
+from modules.downsampling import series_pipeline, resolve_resolution, lttb_rows, strip_buckets
 from configs.mongo_conf import mongo_settings
 
 router = APIRouter()
@@ -43,13 +46,55 @@ def transform_data_to_table_format(data: dict, command_names: Optional[List[str]
     return transformed_data
 
 
+COMMAND_STATUS_FIELDS = ("total", "avgForHours", "avgForSeconds", "percentage")
+
+
+async def get_command_status_history(instance_name: str, command_names: Optional[List[str]], days: int,
+                                     resolution: str, max_points: Optional[int], lttb: bool):
+    collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_COM_STATUS_COLLECTION)
+    match = {
+        'instance_name': instance_name,
+        'timestamp': {'$gte': datetime.utcnow() - timedelta(days=days)}
+    }
+    bucket = await resolve_resolution(collection, match, resolution, max_points, lttb_enabled=lttb)
+    pipeline = series_pipeline(match, 'command_status', COMMAND_STATUS_FIELDS, command_names, bucket,
+                               name_key='command')
+    rows = await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+    if bucket and lttb and max_points:
+        rows = lttb_rows(rows, max_points, 'command', COMMAND_STATUS_FIELDS[0])
+    return strip_buckets(rows)
+
+
 @router.get("/command_status")
 async def read_status(
+        request: Request,
         instance_name: str = Query(..., description="The name of the instance to retrieve"),
-        command: Optional[List[str]] = Query(None, description="List of command names to retrieve")
+        command: Optional[List[str]] = Query(None, description="List of command names to retrieve"),
+        days: Optional[int] = Query(None, ge=1, le=365,
+                                    description="Return the history of the last N days instead of the latest sample"),
+        resolution: str = Query("raw", pattern=r"^(raw|auto|\d+[mhd])$",
+                                description="History bucket size (e.g. 15m, 1h, 1d), auto to fit max_points, or raw"),
+        max_points: Optional[int] = Query(None, ge=10, le=10000, description="Maximum history points per command"),
+        lttb: bool = Query(False, description="Select max_points per command with LTTB after bucketing")
 ):
-    data = await get_command_status(instance_name)
-    if data:
-        transformed_data = transform_data_to_table_format(data, command)
-        return transformed_data
-    raise HTTPException(status_code=404, detail="Data not found")
\ No newline at end of file
+    if max_points and resolution == "raw":
+        resolution = "auto"
+
+    async def produce():
+        if days is not None:
+            try:
+                rows = await get_command_status_history(instance_name, command, days, resolution, max_points, lttb)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if rows:
+                return rows
+            raise HTTPException(status_code=404, detail="Data not found")
+
+        data = await get_command_status(instance_name)
+        if data:
+            return transform_data_to_table_format(data, command)
+        raise HTTPException(status_code=404, detail="Data not found")
+
+    return await response_cache.respond(
+        request, produce, tags=[cache_tag(mongo_settings.MONGO_COM_STATUS_COLLECTION, instance_name)],
+        formats=(JSON, MSGPACK, ARROW))
@@ -1,85 +1,108 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, AsyncIterator
 from datetime import timedelta, datetime
 from modules.mongodb_connector import MongoDBConnector
+from modules.response_cache import response_cache, cache_tag
+from modules import fast_json
+from modules.content_negotiation import JSON, MSGPACK, ARROW, negotiate
+from modules.arrow_export import stream_export
+from modules.downsampling import series_pipeline, resolve_resolution, lttb_rows, strip_buckets
 from configs.mongo_conf import mongo_settings
 import pytz
+import pyarrow as pa
 
 router = APIRouter()
 
 kst = pytz.timezone('Asia/Seoul')
 
-async def get_disk_usage_status(instance_name: str, metric_names: Optional[List[str]] = None,
-                                days: Optional[int] = None):
-    db: AsyncIOMotorDatabase = await MongoDBConnector.get_database()
-    collection = db[mongo_settings.MONGO_DISK_USAGE_COLLECTION]
+DISK_USAGE_FIELDS = ("total", "avgForHours", "avgForSeconds")
+DISK_USAGE_SCHEMA = pa.schema([("timestamp", pa.string()), ("name", pa.string())] +
+                              [(field, pa.float64()) for field in DISK_USAGE_FIELDS])
+
+
+def disk_usage_match(instance_name: str, days: Optional[int] = None) -> dict:
     query = {'instance_name': instance_name}
 
     if days is not None:
         end_date = datetime.now(kst)
         start_date = end_date - timedelta(days=days)
         query['timestamp'] = {'$gte': start_date, '$lte': end_date}
+    return query
+
+
+def build_disk_usage_pipeline(instance_name: str, metric_names: Optional[List[str]] = None,
+                              days: Optional[int] = None, resolution: Optional[str] = None) -> List[dict]:
+    """
+    disk_status 를 (timestamp, name, total, avgForHours, avgForSeconds) 행으로 펼치는 집계 파이프라인입니다.
+    시간대 변환과 메트릭 필터, 해상도별 버킷팅을 MongoDB 에서 처리합니다.
+    """
+    return series_pipeline(disk_usage_match(instance_name, days), 'disk_status', DISK_USAGE_FIELDS,
+                           metric_names, resolution)
+
+
+async def get_disk_usage_cursor(instance_name: str, metric_names: Optional[List[str]] = None,
+                                days: Optional[int] = None, resolution: Optional[str] = None):
+    collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_DISK_USAGE_COLLECTION)
+    return collection.aggregate(build_disk_usage_pipeline(instance_name, metric_names, days, resolution),
+                                batchSize=1000, allowDiskUse=True)
+
+
+async def _chain(first: dict, cursor) -> AsyncIterator[dict]:
+    yield first
+    async for row in cursor:
+        yield row
+
+
+async def _stream_json_array(first: dict, cursor) -> AsyncIterator[bytes]:
+    yield b"[" + fast_json.dumps(first)
+    async for row in cursor:
+        yield b"," + fast_json.dumps(row)
+    yield b"]"
 
-    projection = {'_id': 0, 'timestamp': 1}
-
-    # metric_names가 제공된 경우, 해당 메트릭만 포함하도록 projection 수정
-    if metric_names:
-        for metric in metric_names:
-            projection[f'disk_status.{metric}'] = 1
-    else:
-        projection['disk_status'] = 1
-
-    cursor = collection.find(query, projection).sort('timestamp', 1)  # 1은 오름차순, -1은 내림차순
-
-    results = await cursor.to_list(length=None)
-
-    # Convert UTC timestamp to KST
-    for result in results:
-        if 'timestamp' in result:
-            result['timestamp'] = result['timestamp'].replace(tzinfo=pytz.UTC).astimezone(kst)
-
-    # metric_names가 제공된 경우, 결과를 재구성
-    if metric_names:
-        for result in results:
-            filtered_disk_status = {}
-            for metric in metric_names:
-                if 'disk_status' in result and metric in result['disk_status']:
-                    filtered_disk_status[metric] = result['disk_status'][metric]
-            result['disk_status'] = filtered_disk_status
-
-    return results
-
-def transform_data_to_table_format(data_list: List[dict], metric_names: Optional[List[str]] = None):
-    transformed_data = []
-    for data in data_list:
-        timestamp = data.get("timestamp")
-        if timestamp:
-            if not timestamp.tzinfo:
-                timestamp = kst.localize(timestamp)
-            timestamp = timestamp.strftime('%Y-%m-%d %H:%M:%S')
-
-        if "disk_status" in data:
-            for metric, details in data["disk_status"].items():
-                if metric_names and metric not in metric_names:
-                    continue
-                row = {
-                    "timestamp": timestamp,
-                    "name": metric,
-                    "total": details.get("total", 0),
-                    "avgForHours": details.get("avgForHours", 0),
-                    "avgForSeconds": details.get("avgForSeconds", 0)
-                }
-                transformed_data.append(row)
-    return transformed_data
 
 @router.get("/disk_usage")
 async def read_status(
+        request: Request,
         instance_name: str = Query(..., description="The name of the instance to retrieve"),
         metric_name: Optional[List[str]] = Query(None, description="List of metric names to retrieve", alias="metric"),
-        days: Optional[int] = Query(None, description="Number of days to retrieve data for")
+        days: Optional[int] = Query(None, description="Number of days to retrieve data for"),
+        resolution: str = Query("raw", pattern=r"^(raw|auto|\d+[mhd])$",
+                                description="Bucket size (e.g. 15m, 1h, 1d), auto to fit max_points, or raw"),
+        max_points: Optional[int] = Query(None, ge=10, le=10000, description="Maximum points per metric"),
+        lttb: bool = Query(False, description="Select max_points per metric with LTTB after bucketing")
 ):
-    data_list = await get_disk_usage_status(instance_name, metric_name, days)
-    if data_list:
-        transformed_data = transform_data_to_table_format(data_list, metric_name)
-        return transformed_data
-    raise HTTPException(status_code=404, detail="Data not found")
\ No newline at end of file
+    if max_points and resolution == "raw":
+        resolution = "auto"
+
+    if days is None and resolution == "raw":
+        # 전체 이력은 캐시하지 않고 커서에서 바로 스트리밍
+        media_type = negotiate(request, (JSON, ARROW))
+        cursor = await get_disk_usage_cursor(instance_name, metric_name, days)
+        try:
+            first = await cursor.next()
+        except StopAsyncIteration:
+            raise HTTPException(status_code=404, detail="Data not found")
+        if media_type == ARROW:
+            return StreamingResponse(stream_export(_chain(first, cursor), DISK_USAGE_SCHEMA, "arrow"),
+                                     media_type=ARROW, headers={"Vary": "Accept"})
+        return StreamingResponse(_stream_json_array(first, cursor), media_type=JSON, headers={"Vary": "Accept"})
+
+    async def produce():
+        collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_DISK_USAGE_COLLECTION)
+        try:
+            bucket = await resolve_resolution(collection, disk_usage_match(instance_name, days), resolution,
+                                              max_points, lttb_enabled=lttb)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        cursor = await get_disk_usage_cursor(instance_name, metric_name, days, bucket)
+        rows = await cursor.to_list(length=None)
+        if not rows:
+            raise HTTPException(status_code=404, detail="Data not found")
+        if bucket and lttb and max_points:
+            rows = lttb_rows(rows, max_points, 'name', DISK_USAGE_FIELDS[0])
+        return strip_buckets(rows)
+
+    return await response_cache.respond(
+        request, produce, tags=[cache_tag(mongo_settings.MONGO_DISK_USAGE_COLLECTION, instance_name)],
+        formats=(JSON, MSGPACK, ARROW))
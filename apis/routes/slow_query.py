@@ -1,10 +1,24 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request, Header
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
+from bson import ObjectId
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, Optional, Tuple, AsyncIterator
+import base64
+import re
+import json
 import logging
 from modules.mongodb_connector import MongoDBConnector
 from modules.time_utils import convert_utc_to_kst
+from modules import fast_json
+from modules.fast_json import FastJSONResponse
+from modules.content_negotiation import JSON, NDJSON, MSGPACK, ARROW, negotiate, render
+from modules.sql_utils import sql_digest, search_prefixes
+from modules.live_stream import ChangeStreamBroadcaster, SubscriberLimitReached, LiveStreamUnavailable
+from modules.arrow_export import (
+    EXPORT_FORMATS, SLOW_QUERY_SCHEMA, DEFAULT_BATCH_SIZE,
+    build_slow_query_filter, open_slow_query_cursor, stream_export
+)
 from configs.mongo_conf import mongo_settings
 
 router = APIRouter(tags=["Query Tool"])
@@ -21,44 +35,268 @@ class SlowQueryItem(BaseModel):
     sql_text: str
     start: datetime
     end: datetime
+    tables: Optional[List[str]] = None
+    digest: Optional[str] = None
+    event_id: Optional[str] = None
+
+SLOW_QUERY_PROJECTION = {field: 1 for field in SlowQueryItem.model_fields}
+SLOW_QUERY_MEDIA_TYPES = (JSON, NDJSON, MSGPACK, ARROW)
+
+
+def encode_cursor(start: datetime, object_id: ObjectId) -> str:
+    """(start, _id) 를 클라이언트에 그대로 돌려받을 불투명 토큰으로 인코딩합니다."""
+    payload = json.dumps({"s": start.isoformat(), "i": str(object_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, ObjectId]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return datetime.fromisoformat(payload["s"]), ObjectId(payload["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _to_row(item: dict) -> dict:
+    # pydantic 모델 검증 없이 응답 행으로 변환
+    return {
+        "instance": item.get("instance"),
+        "pid": item.get("pid"),
+        "user": item.get("user"),
+        "host": item.get("host"),
+        "db": item.get("db"),
+        "time": item.get("time"),
+        "sql_text": item.get("sql_text"),
+        "start": convert_utc_to_kst(item["start"]).isoformat(),
+        "end": convert_utc_to_kst(item["end"]).isoformat() if item.get("end") else None,
+        "tables": item.get("tables"),
+        "digest": item.get("digest"),
+        "event_id": item.get("event_id")
+    }
+
+
+async def _ndjson_rows(cursor) -> AsyncIterator[bytes]:
+    async for item in cursor:
+        yield fast_json.dumps(_to_row(item)) + b"\n"
+
 
 @router.get("/slow_queries", response_model=List[SlowQueryItem])
 async def get_slow_queries(
+    request: Request,
     days: Optional[int] = Query(None, ge=1, le=30, description="Number of days to look back"),
     instance: Optional[List[str]] = Query(None, description="Filter by one or more instance names"),
-    limit: int = Query(100, ge=1, le=1000, description="Number of results to return"),
-    skip: int = Query(0, ge=0, description="Number of results to skip")
+    limit: Optional[int] = Query(None, ge=1, le=100000,
+                                 description="Number of results to return (default 100, max 1000 unless streaming)"),
+    skip: int = Query(0, ge=0, description="Number of results to skip (ignored when cursor is given)"),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson|msgpack|arrow)$",
+                                  description="ndjson/arrow stream rows; also selected by the Accept header")
 ):
-    try:
-        db = await MongoDBConnector.get_database()
-        collection = db[mongo_settings.MONGO_SLOW_LOG_COLLECTION]
+    media_type = negotiate(request, SLOW_QUERY_MEDIA_TYPES, format)
+    stream = media_type in (NDJSON, ARROW)
+    if limit is None:
+        limit = None if stream else 100
+    elif not stream and limit > 1000:
+        raise HTTPException(status_code=400, detail="limit must be 1000 or less unless streaming ndjson/arrow")
 
-        query = {}
+    query = {}
 
-        if days is not None:
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-            query["start"] = {"$gte": start_date, "$lte": end_date}
+    if days is not None:
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+        query["start"] = {"$gte": start_date, "$lte": end_date}
 
-        if instance:
-            if len(instance) == 1:
-                query["instance"] = instance[0]
-            else:
-                query["instance"] = {"$in": instance}
+    if instance:
+        if len(instance) == 1:
+            query["instance"] = instance[0]
+        else:
+            query["instance"] = {"$in": instance}
 
-        sort = [("start", -1)]
+    return await _respond_rows(query, media_type, limit, skip, cursor)
 
-        cursor = collection.find(query).sort(sort).skip(skip).limit(limit)
 
-        items = []
-        async for item in cursor:
-            item['_id'] = str(item['_id'])
-            item['start'] = convert_utc_to_kst(item['start'])
-            item['end'] = convert_utc_to_kst(item['end']) if 'end' in item else None
-            items.append(SlowQueryItem(**item))
+async def _respond_rows(query: dict, media_type: str, limit: Optional[int], skip: int = 0,
+                        cursor: Optional[str] = None) -> Response:
+    """(start, _id) 내림차순 keyset 페이지네이션으로 조회해 협상된 형식으로 응답합니다."""
+    if cursor:
+        # keyset: 이전 페이지 마지막 행 (start, _id) 이후부터 조회
+        last_start, last_id = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"start": {"$lt": last_start}},
+            {"start": last_start, "_id": {"$lt": last_id}}
+        ]}]}
 
-        return items
+    try:
+        collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_COLLECTION)
+        find_cursor = collection.find(query, SLOW_QUERY_PROJECTION).sort([("start", -1), ("_id", -1)])
+        if skip and not cursor:
+            find_cursor = find_cursor.skip(skip)
+        if limit:
+            find_cursor = find_cursor.limit(limit)
+
+        if media_type == NDJSON:
+            return StreamingResponse(_ndjson_rows(find_cursor.batch_size(1000)), media_type=NDJSON)
+        if media_type == ARROW:
+            # Arrow 는 KST 문자열 대신 UTC timestamp 컬럼으로 내보냄
+            return StreamingResponse(stream_export(find_cursor.batch_size(1000), SLOW_QUERY_SCHEMA, "arrow", 1000),
+                                     media_type=ARROW)
+
+        documents = await find_cursor.to_list(length=limit)
+        headers = {"Vary": "Accept"}
+        if len(documents) == limit:
+            headers["X-Next-Cursor"] = encode_cursor(documents[-1]["start"], documents[-1]["_id"])
+        rows = [_to_row(item) for item in documents]
+        if media_type == MSGPACK:
+            return Response(content=render(rows, MSGPACK), media_type=MSGPACK, headers=headers)
+        return FastJSONResponse(content=rows, headers=headers)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving slow query items: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def _search_limit(request: Request, format: Optional[str], limit: Optional[int]) -> Tuple[str, Optional[int]]:
+    media_type = negotiate(request, SLOW_QUERY_MEDIA_TYPES, format)
+    if media_type in (NDJSON, ARROW):
+        return media_type, limit
+    if limit is not None and limit > 1000:
+        raise HTTPException(status_code=400, detail="limit must be 1000 or less unless streaming ndjson/arrow")
+    return media_type, limit or 100
+
+
+def _search_filter(days: Optional[int], instance: Optional[List[str]], db: Optional[str]) -> dict:
+    query = {}
+    if days is not None:
+        query["start"] = {"$gte": datetime.utcnow() - timedelta(days=days)}
+    if instance:
+        query["instance"] = instance[0] if len(instance) == 1 else {"$in": instance}
+    if db:
+        query["db"] = db
+    return query
+
+
+@router.get("/slow_queries/search/table", response_model=List[SlowQueryItem],
+            description="특정 테이블을 참조하는 슬로우 쿼리 검색 (수집 시 추출한 tables 인덱스 사용)")
+async def search_by_table(
+    request: Request,
+    table: List[str] = Query(..., description="Table name(s); rows referencing any of them are returned"),
+    days: Optional[int] = Query(None, ge=1, le=365, description="Number of days to look back"),
+    instance: Optional[List[str]] = Query(None, description="Filter by one or more instance names"),
+    db: Optional[str] = Query(None, description="Filter by database name"),
+    limit: Optional[int] = Query(None, ge=1, le=100000),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson|msgpack|arrow)$")
+):
+    media_type, limit = _search_limit(request, format, limit)
+    query = _search_filter(days, instance, db)
+    names = [name.split(".")[-1].strip("`").lower() for name in table]
+    query["tables"] = names[0] if len(names) == 1 else {"$in": names}
+    return await _respond_rows(query, media_type, limit, cursor=cursor)
+
+
+@router.get("/slow_queries/search/digest", response_model=List[SlowQueryItem],
+            description="같은 쿼리 패턴(digest)의 슬로우 쿼리 검색")
+async def search_by_digest(
+    request: Request,
+    digest: Optional[str] = Query(None, pattern="^[0-9a-f]{64}$", description="Query digest"),
+    sql_text: Optional[str] = Query(None, description="Example SQL; its digest is used when digest is omitted"),
+    days: Optional[int] = Query(None, ge=1, le=365, description="Number of days to look back"),
+    instance: Optional[List[str]] = Query(None, description="Filter by one or more instance names"),
+    db: Optional[str] = Query(None, description="Filter by database name"),
+    limit: Optional[int] = Query(None, ge=1, le=100000),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson|msgpack|arrow)$")
+):
+    if not digest and not sql_text:
+        raise HTTPException(status_code=422, detail="digest or sql_text is required")
+    media_type, limit = _search_limit(request, format, limit)
+    query = _search_filter(days, instance, db)
+    query["digest"] = digest or sql_digest(sql_text)
+    return await _respond_rows(query, media_type, limit, cursor=cursor)
+
+
+@router.get("/slow_queries/search/text", response_model=List[SlowQueryItem],
+            description="sql_text 부분 문자열 검색 (식별자 접두어 인덱스로 후보를 좁힌 뒤 부분 문자열 확인). "
+                        "검색어는 식별자/키워드의 처음 또는 '_' 다음 위치에서 시작해야 하며 리터럴 값은 찾지 않음")
+async def search_by_text(
+    request: Request,
+    q: str = Query(..., min_length=3, description="Substring starting at a word (or '_') boundary, e.g. 'order_it', '_items', 'status = ', 'pending'"),
+    days: Optional[int] = Query(None, ge=1, le=365, description="Number of days to look back"),
+    instance: Optional[List[str]] = Query(None, description="Filter by one or more instance names"),
+    db: Optional[str] = Query(None, description="Filter by database name"),
+    limit: Optional[int] = Query(None, ge=1, le=100000),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson|msgpack|arrow)$")
+):
+    prefixes = search_prefixes(q)
+    if not prefixes:
+        raise HTTPException(status_code=400, detail="q must contain an identifier or keyword of at least 3 characters")
+    media_type, limit = _search_limit(request, format, limit)
+    query = _search_filter(days, instance, db)
+    # 수집 시 저장한 접두어(sql_prefixes) 인덱스로 후보를 찾고, 좁혀진 후보에만 정규식 적용.
+    # 접두어가 상한에 걸려 잘린 문서는 검색어 접두어가 빠졌을 수 있으므로 항상 후보에 포함
+    query["$or"] = [{"sql_prefixes": {"$all": prefixes}}, {"sql_prefixes_truncated": True}]
+    query["sql_text"] = {"$regex": re.escape(q), "$options": "i"}
+    return await _respond_rows(query, media_type, limit, cursor=cursor)
+
+
+# 모든 실시간 구독자가 공유하는 변경 스트림 하나
+slow_query_live = ChangeStreamBroadcaster(mongo_settings.MONGO_SLOW_LOG_COLLECTION, render=_to_row,
+                                          fields=SlowQueryItem.model_fields, event_id_field="event_id")
+
+
+@router.get("/slow_queries/live", response_class=StreamingResponse,
+            description="새 슬로우 쿼리를 Server-Sent Events 로 실시간 전달 (구독자별 MongoDB 조회 없음)")
+async def stream_slow_queries(
+    instance: Optional[List[str]] = Query(None, description="Filter by one or more instance names"),
+    db: Optional[List[str]] = Query(None, description="Filter by one or more database names"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID",
+                                          description="재연결 시 이 이벤트 이후 저장된 슬로우 쿼리부터 전달")
+):
+    # 구독 등록은 응답 전송이 시작될 때 events 안에서 하고, 여기서는 503 을 돌려주기 위한 확인만 함
+    try:
+        slow_query_live.check_capacity()
+    except SubscriberLimitReached as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except LiveStreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    filters = {"instance": set(instance or ()), "db": set(db or ())}
+    return StreamingResponse(slow_query_live.events(filters, last_event_id), media_type="text/event-stream",
+                             headers=headers)
+
+
+@router.get("/slow_queries/live/stats")
+async def get_live_stream_stats():
+    return slow_query_live.get_stats()
+
+
+@router.get("/slow_queries/export", description="슬로우 쿼리 이력을 Parquet 또는 Arrow IPC 스트림으로 내보내기")
+async def export_slow_queries(
+    start_date: Optional[datetime] = Query(None, description="Start of range (UTC, inclusive)"),
+    end_date: Optional[datetime] = Query(None, description="End of range (UTC, exclusive)"),
+    days: Optional[int] = Query(None, ge=1, le=365, description="Number of days to look back when start_date is omitted"),
+    instance: Optional[List[str]] = Query(None, description="Filter by one or more instance names"),
+    db: Optional[str] = Query(None, description="Filter by database name"),
+    format: str = Query("parquet", pattern="^(parquet|arrow)$", description="parquet or arrow (IPC stream)"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1000, le=100000, description="Rows per record batch")
+):
+    if start_date is None and days is not None:
+        start_date = (end_date or datetime.utcnow()) - timedelta(days=days)
+
+    try:
+        query = build_slow_query_filter(start_date, end_date, instance, db)
+        cursor = await open_slow_query_cursor(query, batch_size)
+    except Exception as e:
+        logger.error(f"Error preparing slow query export: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"slow_queries_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{extension}"
+    return StreamingResponse(
+        stream_export(cursor, SLOW_QUERY_SCHEMA, format, batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
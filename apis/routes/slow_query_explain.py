@@ -1,16 +1,23 @@
-import re
+import asyncio
 import sqlparse
 import json
 import logging
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import Response
 from datetime import datetime, timezone, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
 
 from modules.mongodb_connector import MongoDBConnector
-from modules.mysql_connector import MySQLConnector
 from modules.load_instance import load_instances_from_mongodb
+from modules.explain_executor import (
+    ExplainRejected, explain_executor, explain_and_save, plan_key, start_explain_job, get_explain_job
+)
+from modules.fast_json import FastJSONResponse
 from configs.mongo_conf import mongo_settings
+from configs.mysql_conf import EXPLAIN_BATCH_MAX_QUERIES, EXPLAIN_TIMEOUT
 
 router = APIRouter(tags=["Query Tool"])
 
@@ -19,48 +26,62 @@ logger = logging.getLogger(__name__)
 
 
 class ExplainRequest(BaseModel):
-    pid: int
+    event_id: Optional[str] = None
+    pid: Optional[int] = None
+    force: bool = False
 
 
-class SQLQueryExecutor:
-    @staticmethod
-    def remove_sql_comments(sql_text):
-        return re.sub(r'/\*.*?\*/', '', sql_text, flags=re.DOTALL)
+class PlanKey(BaseModel):
+    instance: str
+    db: str
+    digest: str
 
-    @staticmethod
-    def validate_sql_query(sql_text):
-        query_without_comments = SQLQueryExecutor.remove_sql_comments(sql_text).strip()
-        if not query_without_comments.lower().startswith("select"):
-            raise ValueError("SELECT 쿼리만 가능합니다.")
-        if "into" in query_without_comments.lower().split("from")[0]:
-            raise ValueError("SELECT ... INTO ... FROM 형태의 프로시저 쿼리는 실행할 수 없습니다.")
-        return query_without_comments
 
-    @staticmethod
-    async def execute(mysql_connector, connection_params, sql_text):
-        try:
-            validated_sql = SQLQueryExecutor.validate_sql_query(sql_text)
-            explain_query = f"EXPLAIN FORMAT=JSON {validated_sql}"
+class ExplainBatchRequest(BaseModel):
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    hours: int = Field(24, ge=1, le=24 * 30)
+    top_n: int = Field(20, ge=1, le=EXPLAIN_BATCH_MAX_QUERIES)
+    instance: Optional[List[str]] = None
+
+
+# /plans/ 목록에서 조회하는 필드 (explain_result, formatted_sql 제외)
+PLAN_LIST_PROJECTION = {
+    "_id": 1, "event_id": 1, "pid": 1, "instance": 1, "db": 1, "user": 1, "time": 1, "sql_text": 1, "digest": 1,
+    "plan_hash": 1, "regression": 1, "summary": 1, "created_at": 1
+}
 
-            execution_plan = await mysql_connector.execute_query_with_new_connection(connection_params, explain_query)
-            if not execution_plan or 'EXPLAIN' not in execution_plan[0]:
-                raise ValueError("EXPLAIN 결과가 예상된 형식이 아닙니다.")
-            return json.loads(execution_plan[0]['EXPLAIN'])
-        except Exception as e:
-            logger.error(f"SQL 실행 중 오류 발생: {str(e)}")
-            logger.error(f"쿼리: {explain_query}")
-            raise HTTPException(status_code=500, detail=f"SQL 실행 중 오류 발생: {str(e)}")
+
+async def find_slow_query(event_id: Optional[str], pid: Optional[int]) -> Optional[dict]:
+    """
+    event_id (인덱스 단건 조회) 또는 pid 로 슬로우 쿼리를 찾습니다.
+    pid 는 인스턴스 간, 재시작 후 재사용되므로 가장 최근 이벤트를 반환합니다.
+    """
+    collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_COLLECTION)
+    if event_id:
+        return await collection.find_one({"event_id": event_id})
+    return await collection.find_one({"pid": pid}, sort=[("start", -1)])
+
+
+def _parse_object_id(value: str) -> ObjectId:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid plan id or cursor")
 
 
 class MarkdownGenerator:
     @staticmethod
     def generate(document):
-        formatted_sql = sqlparse.format(document['sql_text'], reindent=True, keyword_case='upper')
+        # 저장 시 계산한 formatted_sql 이 없는 과거 문서만 여기서 정렬
+        formatted_sql = document.get('formatted_sql') or \
+            sqlparse.format(document['sql_text'], reindent=True, keyword_case='upper')
         formatted_explain = json.dumps(document['explain_result'], indent=4, ensure_ascii=False)
         markdown_content = (
             f"### 인스턴스: {document['instance']}\n\n"
             f"- 데이터베이스: {document['db']}\n"
             f"- PID: {document['pid']}\n"
+            f"- Event ID: {document.get('event_id') or 'N/A'}\n"
             f"- 사용자: {document.get('user', 'N/A')}\n"
             f"- 실행시간: {document['time']}\n\n"
             f"- SQL TEXT:\n```sql\n{formatted_sql}\n```\n\n"
@@ -71,93 +92,199 @@ class MarkdownGenerator:
 
 @router.post("/explain")
 async def execute_sql(request: ExplainRequest):
-    pid = request.pid
     try:
-        mongodb = await MongoDBConnector.get_database()
-        slow_log_collection = mongodb[mongo_settings.MONGO_SLOW_LOG_COLLECTION]
-        plan_collection = mongodb[mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION]
-
-        if not pid:
-            raise HTTPException(status_code=422, detail="PID is required")
-        document = await slow_log_collection.find_one({"pid": pid})
+        if not request.event_id and not request.pid:
+            raise HTTPException(status_code=422, detail="event_id or pid is required")
+        document = await find_slow_query(request.event_id, request.pid)
         if document is None:
-            raise HTTPException(status_code=404, detail="해당 PID의 문서를 찾을 수 없습니다.")
+            raise HTTPException(status_code=404, detail="해당 이벤트(PID)의 문서를 찾을 수 없습니다.")
 
         rds_instances = await load_instances_from_mongodb()
         rds_info = next((item for item in rds_instances if item["instance_name"] == document["instance"]), None)
         if not rds_info:
             raise HTTPException(status_code=400, detail="instance_name에 해당하는 RDS 인스턴스 정보를 찾을 수 없습니다.")
 
-        connection_params = {
-            "host": rds_info["host"],
-            "port": rds_info["port"],
-            "user": rds_info["user"],
-            "password": rds_info["password"],  # MySQLConnector 내부에서 복호화됨
-            "db": document["db"],
-            "charset": 'utf8mb4'
-        }
+        # 인스턴스별 EXPLAIN 커넥션 풀 사용 (요청마다 새 커넥션을 열지 않음)
+        plan, cached = await explain_and_save(document, rds_info, force=request.force)
 
-        mysql_connector = MySQLConnector("slow_query_explain")
-        execution_plan = await SQLQueryExecutor.execute(mysql_connector, connection_params, document["sql_text"])
-
-        query_plan_document = {
-            "pid": pid,
-            "instance": document["instance"],
-            "db": document["db"],
-            "user": document["user"],
-            "time": document["time"],
-            "sql_text": SQLQueryExecutor.remove_sql_comments(document["sql_text"]),
-            "explain_result": execution_plan,
-            "created_at": datetime.now(timezone.utc)
+        if cached:
+            message = "같은 쿼리 패턴의 최근 실행 계획이 있어 저장된 실행 계획을 사용합니다."
+        elif plan.get("regression"):
+            message = "EXPLAIN이 실행되었으며, 이전과 다른 실행 계획이 감지되었습니다."
+        else:
+            message = "SQL 쿼리에 대한 EXPLAIN이 실행되었으며, 실행 계획이 저장되었습니다."
+        return {
+            "message": message,
+            "event_id": document.get("event_id"),
+            "cached": cached,
+            "digest": plan["digest"],
+            "plan_hash": plan["plan_hash"],
+            "regression": bool(plan.get("regression"))
         }
-        await plan_collection.update_one({"pid": pid}, {"$set": query_plan_document}, upsert=True)
-
-        return {"message": "SQL 쿼리에 대한 EXPLAIN이 실행되었으며, 실행 계획이 저장되었습니다."}
+    except HTTPException:
+        raise
+    except ExplainRejected as e:
+        # 인스턴스 대기열이 가득 참, 잠시 후 재시도
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"EXPLAIN이 {EXPLAIN_TIMEOUT}초 안에 끝나지 않았습니다.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"execute_sql 함수 실행 중 오류 발생: {str(e)}")
         raise HTTPException(status_code=500, detail=f"내부 서버 오류: {str(e)}")
 
 
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+@router.post("/explain/batch", status_code=202)
+async def start_batch_explain(request: ExplainBatchRequest):
+    """기간 내 상위 슬로우 쿼리를 인스턴스별로 동시에 EXPLAIN 하는 작업을 시작하고 job_id 를 반환합니다."""
+    # 시간대가 없는 값은 UTC 로 간주
+    end = _as_utc(request.end) if request.end else datetime.now(timezone.utc)
+    start = _as_utc(request.start) if request.start else end - timedelta(hours=request.hours)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    job = start_explain_job(start, end, request.top_n, request.instance)
+    return {"job_id": job.job_id, "status": job.status}
+
+
+@router.get("/explain/stats")
+async def get_explain_stats():
+    """대상(인스턴스/복제본)별 EXPLAIN 대기열 깊이, 거절/타임아웃 수, 커넥션 풀 대기 시간"""
+    return explain_executor.get_stats()
+
+
+@router.get("/explain/jobs/{job_id}")
+async def get_batch_explain(job_id: str):
+    job = get_explain_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="해당 작업을 찾을 수 없습니다.")
+    return job.to_dict()
+
+
 @router.get("/download", response_class=Response)
-async def download_markdown(pid: int = Query(...)):
+async def download_markdown(event_id: Optional[str] = Query(None), pid: Optional[int] = Query(None)):
+    if not event_id and pid is None:
+        raise HTTPException(status_code=422, detail="event_id or pid is required")
     try:
-        mongodb = await MongoDBConnector.get_database()
-        plan_collection = mongodb[mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION]
+        plan_collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION)
 
-        cursor = plan_collection.find({"pid": pid})
         markdown_content = ""
-        async for document in cursor:
-            markdown_content += MarkdownGenerator.generate(document)
+        if event_id:
+            document = await plan_collection.find_one({"event_id": event_id})
+            if document:
+                markdown_content = MarkdownGenerator.generate(document)
+        else:
+            async for document in plan_collection.find({"pid": pid}):
+                markdown_content += MarkdownGenerator.generate(document)
 
         if not markdown_content:
-            raise HTTPException(status_code=404, detail="주어진 PID에 대한 기록을 찾을 수 없습니다.")
+            # 실행 계획은 쿼리 패턴 단위로 저장되므로 다른 이벤트로 저장된 같은 패턴의 계획을 찾음
+            slow_query = await find_slow_query(event_id, pid)
+            document = await plan_collection.find_one(plan_key(slow_query)) if slow_query else None
+            if document:
+                markdown_content = MarkdownGenerator.generate(document)
 
-        filename = f"slowlog_pid_{pid}.md"
+        if not markdown_content:
+            raise HTTPException(status_code=404, detail="주어진 이벤트(PID)에 대한 기록을 찾을 수 없습니다.")
+
+        filename = f"slowlog_{event_id}.md" if event_id else f"slowlog_pid_{pid}.md"
         headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
         return Response(content=markdown_content.encode('utf-8'), media_type="text/markdown", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"download_markdown 함수 실행 중 오류 발생: {str(e)}")
         raise HTTPException(status_code=500, detail=f"내부 서버 오류: {str(e)}")
 
 
-@router.get("/plans/")
-async def get_items():
+@router.get("/plans/", response_class=FastJSONResponse)
+async def get_items(
+    limit: int = Query(100, ge=1, le=1000, description="Number of plans to return"),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
+    instance: Optional[str] = Query(None, description="Filter by instance name"),
+    db: Optional[str] = Query(None, description="Filter by database name"),
+    event_id: Optional[str] = Query(None, description="Plan of the query pattern of this slow query event")
+):
+    """실행 계획 목록 (요약만 조회, 전체 실행 계획 JSON 은 /plans/{plan_id} 로 조회)"""
+    query = {}
+    if event_id:
+        # 이벤트의 쿼리 패턴 (instance, db, digest) 로 계획을 찾음
+        slow_query = await find_slow_query(event_id, None)
+        if slow_query is None:
+            raise HTTPException(status_code=404, detail="해당 이벤트의 문서를 찾을 수 없습니다.")
+        query.update(plan_key(slow_query))
+    if instance:
+        query["instance"] = instance
+    if db:
+        query["db"] = db
+    if cursor:
+        query["_id"] = {"$lt": _parse_object_id(cursor)}
     try:
-        mongodb = await MongoDBConnector.get_database()
-        collection = mongodb[mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION]
-        items = []
-        sort = [("_id", -1)]
+        collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION)
+        documents = await collection.find(query, PLAN_LIST_PROJECTION).sort("_id", -1).limit(limit).to_list(length=limit)
 
-        async for item in collection.find({}).sort(sort):
-            if '_id' in item:
-                del item['_id']
-            if 'explain_result' in item:
-                del item['explain_result']
+        headers = {}
+        if len(documents) == limit:
+            headers["X-Next-Cursor"] = str(documents[-1]["_id"])
+        items = []
+        for item in documents:
+            item["id"] = str(item.pop("_id"))
             if 'created_at' in item:
                 item['created_at'] = item['created_at'] + kst_delta
             items.append(item)
 
-        return items
+        return FastJSONResponse(items, headers=headers)
     except Exception as e:
         logger.error(f"get_items 함수 실행 중 오류 발생: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"내부 서버 오류: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"내부 서버 오류: {str(e)}")
+
+
+@router.get("/plans/regressions", response_class=FastJSONResponse)
+async def get_plan_regressions(limit: int = Query(100, ge=1, le=1000)):
+    """실행 계획 형태가 바뀐 쿼리 패턴 목록 (최근 변경순)"""
+    try:
+        collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION)
+        items = []
+        async for item in collection.find({"regression": True}, {'_id': 0, 'explain_result': 0}) \
+                .sort("plan_changed_at", -1).limit(limit):
+            for key in ('created_at', 'plan_changed_at'):
+                if item.get(key):
+                    item[key] = item[key] + kst_delta
+            items.append(item)
+        return FastJSONResponse(items)
+    except Exception as e:
+        logger.error(f"get_plan_regressions 함수 실행 중 오류 발생: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"내부 서버 오류: {str(e)}")
+
+
+@router.post("/plans/regressions/ack")
+async def acknowledge_plan_regression(request: PlanKey):
+    """확인한 실행 계획 변경의 regression 표시를 해제합니다."""
+    collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION)
+    result = await collection.update_one(request.model_dump(), {"$set": {"regression": False}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="해당 쿼리 패턴의 실행 계획을 찾을 수 없습니다.")
+    return {"acknowledged": True}
+
+
+@router.get("/plans/{plan_id}", response_class=FastJSONResponse)
+async def get_plan(plan_id: str):
+    """실행 계획 상세 (explain_result 전체 JSON 포함)"""
+    object_id = _parse_object_id(plan_id)
+    try:
+        collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION)
+        document = await collection.find_one({"_id": object_id})
+    except Exception as e:
+        logger.error(f"get_plan 함수 실행 중 오류 발생: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"내부 서버 오류: {str(e)}")
+    if document is None:
+        raise HTTPException(status_code=404, detail="해당 실행 계획을 찾을 수 없습니다.")
+    document["id"] = str(document.pop("_id"))
+    for key in ('created_at', 'plan_changed_at'):
+        if document.get(key):
+            document[key] = document[key] + kst_delta
+    return FastJSONResponse(document)
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
 from modules.mongodb_connector import MongoDBConnector
 from configs.mongo_conf import mongo_settings
 from datetime import datetime, timedelta
 from typing import List, Dict
 from modules.slack_utils import send_slack_notification
+from modules.slow_query_rollup import rollup_time_filter
+from modules.response_cache import response_cache, cache_tag
+from modules.content_negotiation import JSON, MSGPACK
 import logging
 
 router = APIRouter()
@@ -11,31 +14,15 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+# 롤업 갱신은 스케줄러(report_tools/scheduler.py)가 맡고 여기서는 롤업 컬렉션만 읽음
+# 응답 생성 중 갱신하면 $merge 가 자신의 캐시 태그를 무효화해 캐시가 채워지지 않음
 async def get_slow_query_stats(start_datetime, end_datetime):
     db = await MongoDBConnector.get_database()
 
-    logger.info(f"Querying slow queries from {start_datetime} to {end_datetime}")
-
-    # 전체 데이터 수 확인
-    total_count = await db[mongo_settings.MONGO_SLOW_LOG_COLLECTION].count_documents({})
-    logger.info(f"Total documents in collection: {total_count}")
-
-    # 날짜 범위 내의 데이터 수 확인
-    date_filter = {
-        "start": {
-            "$gte": start_datetime,
-            "$lt": end_datetime
-        }
-    }
-    filtered_count = await db[mongo_settings.MONGO_SLOW_LOG_COLLECTION].count_documents(date_filter)
-    logger.info(f"Documents in date range: {filtered_count}")
-
-    # 샘플 데이터 확인
-    sample_data = await db[mongo_settings.MONGO_SLOW_LOG_COLLECTION].find_one()
-    logger.info(f"Sample document: {sample_data}")
+    logger.info(f"Querying slow query rollup from {start_datetime} to {end_datetime}")
 
     aggregation_pipeline = [
-        {"$match": date_filter},
+        {"$match": rollup_time_filter(start_datetime, end_datetime)},
         {
             "$group": {
                 "_id": {
@@ -43,75 +30,52 @@ async def get_slow_query_stats(start_datetime, end_datetime):
                     "db": "$db",
                     "user": "$user"
                 },
-                "total_count": {"$sum": 1},
-                "max_time": {"$max": "$time"},
-                "total_time": {"$sum": "$time"}
+                "count": {"$sum": "$count"},
+                "max_time": {"$max": "$max_time"},
+                "total_time": {"$sum": "$total_time"}
             }
         },
-        {
-            "$group": {
-                "_id": "$_id.instance",
-                "dbs": {
-                    "$push": {
-                        "db": "$_id.db",
-                        "user": "$_id.user",
-                        "count": "$total_count",
-                        "max_time": "$max_time",
-                        "total_time": "$total_time"
-                    }
-                }
-            }
-        },
-        {
-            "$unwind": "$dbs"
-        },
         {
             "$project": {
                 "_id": 0,
-                "instance": "$_id",
-                "db": "$dbs.db",
-                "user": "$dbs.user",
-                "count": "$dbs.count",
-                "max_time": "$dbs.max_time",
-                "total_time": "$dbs.total_time",
+                "instance": "$_id.instance",
+                "db": "$_id.db",
+                "user": "$_id.user",
+                "count": 1,
+                "max_time": 1,
+                "total_time": 1,
                 "avg_time": {
                     "$round": [
                         {
-                            "$cond": {"if": {"$ne": ["$dbs.count", 0]},
-                                      "then": {"$divide": ["$dbs.total_time", "$dbs.count"]}, "else": 0}
+                            "$cond": {"if": {"$ne": ["$count", 0]},
+                                      "then": {"$divide": ["$total_time", "$count"]}, "else": 0}
                         },
                         3
                     ]
                 }
             }
-        }
+        },
+        {"$sort": {"instance": 1, "db": 1, "user": 1}}
     ]
-    cursor = db[mongo_settings.MONGO_SLOW_LOG_COLLECTION].aggregate(aggregation_pipeline)
+    cursor = db[mongo_settings.MONGO_SLOW_LOG_ROLLUP_COLLECTION].aggregate(aggregation_pipeline)
     result = await cursor.to_list(length=None)
 
-    logger.info(f"Query result: {result}")
+    logger.info(f"Slow query stats returned {len(result)} rows")
 
     return result
 
 async def get_simplified_slow_query_stats(start_datetime, end_datetime):
     db = await MongoDBConnector.get_database()
 
-    logger.info(f"Querying slow queries from {start_datetime} to {end_datetime}")
-
-    date_filter = {
-        "start": {
-            "$gte": start_datetime,
-            "$lt": end_datetime
-        }
-    }
+    logger.info(f"Querying slow query rollup from {start_datetime} to {end_datetime}")
 
     aggregation_pipeline = [
-        {"$match": date_filter},
+        {"$match": rollup_time_filter(start_datetime, end_datetime)},
         {
             "$group": {
                 "_id": None,
-                "total_count": {"$sum": 1},
-                "max_execution_time": {"$max": "$time"}
+                "total_count": {"$sum": "$count"},
+                "max_execution_time": {"$max": "$max_time"}
             }
         },
         {
@@ -123,11 +87,9 @@ async def get_simplified_slow_query_stats(start_datetime, end_datetime):
         }
     ]
 
-    cursor = db[mongo_settings.MONGO_SLOW_LOG_COLLECTION].aggregate(aggregation_pipeline)
+    cursor = db[mongo_settings.MONGO_SLOW_LOG_ROLLUP_COLLECTION].aggregate(aggregation_pipeline)
     result = await cursor.to_list(length=None)
 
-    logger.info(f"Query result: {result}")
-
     return result[0] if result else {"total_count": 0, "max_execution_time": 0}
 
 async def send_slack_weekly_report(data: List[Dict], start_date: datetime.date, end_date: datetime.date):
@@ -186,25 +148,31 @@ async def send_slack_weekly_report(data: List[Dict], start_date: datetime.date,
 
 @router.get("/slow_query_stats")
 async def get_statistics(
+    request: Request,
     start_date: str = Query(None, description="Start date in YYYY-MM-DD format"),
     end_date: str = Query(None, description="End date in YYYY-MM-DD format"),
     days: int = Query(7, description="Number of days to look back if no dates are provided")
 ):
-    if not start_date and not end_date:
-        end_datetime = datetime.now()
-        start_datetime = end_datetime - timedelta(days=days)
-    else:
-        start_datetime = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
-        end_datetime = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) if end_date else None
-
-    result = await get_slow_query_stats(start_datetime, end_datetime)
+    async def produce():
+        if not start_date and not end_date:
+            end_datetime = datetime.now()
+            start_datetime = end_datetime - timedelta(days=days)
+        else:
+            start_datetime = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+            end_datetime = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) if end_date else None
+
+        result = await get_slow_query_stats(start_datetime, end_datetime)
+
+        return {
+            "start_date": start_datetime.strftime("%Y-%m-%d") if start_datetime else None,
+            "end_date": (end_datetime - timedelta(days=1)).strftime("%Y-%m-%d") if end_datetime else None,
+            "is_cumulative": not (start_datetime and end_datetime),
+            "data": result
+        }
 
-    return {
-        "start_date": start_datetime.strftime("%Y-%m-%d") if start_datetime else None,
-        "end_date": (end_datetime - timedelta(days=1)).strftime("%Y-%m-%d") if end_datetime else None,
-        "is_cumulative": not (start_datetime and end_datetime),
-        "data": result
-    }
+    return await response_cache.respond(
+        request, produce, tags=[cache_tag(mongo_settings.MONGO_SLOW_LOG_ROLLUP_COLLECTION)],
+        formats=(JSON, MSGPACK))
 
 @router.get("/weekly_slow_query_stats")
 async def get_weekly_statistics():
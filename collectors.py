@@ -7,7 +7,9 @@ from collectors.mysql_command_status import MySQLCommandStatusMonitor
 from collectors.mysql_disk_status import MySQLDiskStatusMonitor
 from modules.load_instance import load_instances_from_mongodb
 from modules.mongodb_connector import MongoDBConnector
+from modules.mongodb_indexes import ensure_indexes
 from modules.mysql_connector import MySQLConnector
+from modules.bulk_writer import bulk_writer
 from configs.mongo_conf import mongo_settings
 from configs.log_conf import LOG_LEVEL, LOG_FORMAT
 import logging
@@ -30,6 +32,7 @@ class DynamicCollectorManager:
         for collectors in self.collectors.values():
             for collector in collectors.values():
                 await collector.stop()
+        await bulk_writer.stop()
         for connector in self.mysql_connectors.values():
             await connector.close_pool()
         logger.info("DynamicCollectorManager stopped")
@@ -38,13 +41,15 @@ class DynamicCollectorManager:
         try:
             await MongoDBConnector.initialize()
             self.mongodb = await MongoDBConnector.get_database()
+            await ensure_indexes(self.mongodb)
+            await bulk_writer.start()
             self.instances = await load_instances_from_mongodb()
             logger.info(f"Loaded {len(self.instances)} instances from MongoDB")
 
             for instance in self.instances:
                 instance_name = instance['instance_name']
                 self.mysql_connectors[instance_name] = MySQLConnector(instance_name)
-                await self.mysql_connectors[instance_name].create_pool(instance, pool_size=1)
+                await self.mysql_connectors[instance_name].create_pools(instance)
 
             await self.setup_collectors()
             logger.info("Collectors setup completed")
@@ -60,6 +65,9 @@ class DynamicCollectorManager:
         instance_name = instance['instance_name']
         if instance_name not in self.collectors:
             try:
+                if instance_name not in self.mysql_connectors:
+                    self.mysql_connectors[instance_name] = MySQLConnector(instance_name)
+                    await self.mysql_connectors[instance_name].create_pools(instance)
                 mysql_connector = self.mysql_connectors[instance_name]
 
                 slow_query_monitor = SlowQueryMonitor(mysql_connector)
@@ -205,6 +213,9 @@ class DynamicCollectorManager:
             'account': instance.get('account', '')
         }
 
+    def get_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: connector.get_pool_stats() for name, connector in self.mysql_connectors.items()}
+
     async def refresh_instances(self):
         while not self._stop_event.is_set():
             try:
@@ -222,6 +233,8 @@ class DynamicCollectorManager:
                     await self.stop_collector(instance_name)
 
                 logger.info(f"Refreshed instances. Current count: {len(self.instances)}")
+                logger.info(f"MySQL pool stats: {self.get_pool_stats()}")
+                logger.info(f"Bulk writer stats: {bulk_writer.get_stats()}")
             except Exception as e:
                 logger.error(f"Error refreshing instances: {e}")
             finally:
@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 
 from modules.mongodb_connector import MongoDBConnector
+from modules.bulk_writer import bulk_writer
 from modules.mysql_connector import MySQLConnector
 from configs.mongo_conf import mongo_settings
 from configs.log_conf import LOG_LEVEL, LOG_FORMAT
@@ -42,11 +43,12 @@ class MySQLCommandStatusMonitor:
 
     async def query_mysql_status(self, query: str, single_row: bool = False) -> Optional[Any]:
         try:
-            result = await self.mysql_connector.execute_query(query)
+            # SHOW GLOBAL STATUS 결과는 (Variable_name, Value) 튜플
+            _, rows = await self.mysql_connector.execute_query_raw(query)
             if single_row:
-                return int(result[0]['Value']) if result else 0
+                return int(rows[0][1]) if rows else 0
             else:
-                return {row['Variable_name']: row['Value'] for row in result}
+                return dict(rows)
         except Exception as e:
             logger.error(f"Failed to execute query for {self.mysql_connector.instance_name}: {e}")
             return None
@@ -77,8 +79,8 @@ class MySQLCommandStatusMonitor:
                 'instance_name': self.mysql_connector.instance_name,
                 'command_status': command_status
             }
-            result = await self.status_collection.insert_one(document)
-            logger.info(f"Saved command status for {self.mysql_connector.instance_name}. MongoDB _id: {result.inserted_id}")
+            await bulk_writer.write(mongo_settings.MONGO_COM_STATUS_COLLECTION, document)
+            logger.info(f"Queued command status for {self.mysql_connector.instance_name}")
         except Exception as e:
             logger.error(f"Failed to save command status for {self.mysql_connector.instance_name} to MongoDB: {e}")
             raise
@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 
 from modules.mongodb_connector import MongoDBConnector
+from modules.bulk_writer import bulk_writer
 from modules.mysql_connector import MySQLConnector
 from configs.mongo_conf import mongo_settings
 from configs.log_conf import LOG_LEVEL, LOG_FORMAT
@@ -38,11 +39,12 @@ class MySQLDiskStatusMonitor:
 
     async def execute_mysql_query(self, query: str, single_row: bool = False) -> Optional[Any]:
         try:
-            result = await self.mysql_connector.execute_query(query)
+            # SHOW GLOBAL STATUS 결과는 (Variable_name, Value) 튜플
+            _, rows = await self.mysql_connector.execute_query_raw(query)
             if single_row:
-                return int(result[0]['Value']) if result else 0
+                return int(rows[0][1]) if rows else 0
             else:
-                return {row['Variable_name']: row['Value'] for row in result}
+                return dict(rows)
         except Exception as e:
             logger.error(f"Failed to execute query for {self.mysql_connector.instance_name}: {e}")
             return None
@@ -67,7 +69,7 @@ class MySQLDiskStatusMonitor:
             'instance_name': self.mysql_connector.instance_name,
             'disk_status': metrics
         }
-        await self.status_collection.insert_one(document)
+        await bulk_writer.write(mongo_settings.MONGO_DISK_USAGE_COLLECTION, document)
 
     async def fetch_and_save_instance_data(self):
         uptime = await self.execute_mysql_query("SHOW GLOBAL STATUS LIKE 'Uptime';", True)
@@ -88,7 +90,7 @@ class MySQLDiskStatusMonitor:
 
         processed_metrics = self.process_metrics(raw_status, uptime)
         await self.store_metrics_to_mongodb(processed_metrics)
-        logger.info(f"Disk status data saved for {self.mysql_connector.instance_name}")
+        logger.info(f"Disk status data queued for {self.mysql_connector.instance_name}")
 
     async def run(self):
         try:
@@ -1,12 +1,16 @@
 import asyncio
 import pytz
 import re
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
-from dataclasses import dataclass
+from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import dataclass, field
 from modules.mongodb_connector import MongoDBConnector
-from modules.mysql_connector import MySQLConnector
+from modules.bulk_writer import bulk_writer
+from modules.mysql_connector import MySQLConnector, WORKLOAD_SAMPLER
+from modules.sql_utils import extract_tables, sql_digest, slow_query_event_id, event_start_slots, identifier_prefixes
 from configs.mongo_conf import mongo_settings
+from configs.mysql_conf import MYSQL_SAMPLER_QUERY_TIMEOUT
 import logging
 from configs.log_conf import LOG_LEVEL, LOG_FORMAT
 
@@ -14,6 +18,11 @@ logging.basicConfig(level=getattr(logging, LOG_LEVEL), format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 EXEC_TIME = 2
+# 최근 저장한 슬로우 쿼리 이벤트 키 (instance, pid, digest, start 칸) 보관 개수
+RECENT_KEYS_SIZE = 4096
+
+MULTI_SPACE_PATTERN = re.compile(' +')
+CONTROL_CHAR_PATTERN = re.compile(r'[\n\t\r]+')
 
 @dataclass
 class QueryDetails:
@@ -26,10 +35,17 @@ class QueryDetails:
     sql_text: str
     start: datetime
     end: Optional[datetime] = None
+    tables: List[str] = field(default_factory=list)
+    digest: Optional[str] = None
+    start_slots: List[int] = field(default_factory=list)
+    sql_prefixes: List[str] = field(default_factory=list)
+    sql_prefixes_truncated: bool = False
+    event_id: Optional[str] = None
 
 class SlowQueryMonitor:
     def __init__(self, mysql_connector: MySQLConnector):
         self.pid_time_cache: Dict[int, Dict[str, Any]] = {}
+        self.recent_keys: OrderedDict = OrderedDict()
         self.logger = logging.getLogger(__name__)
         self.mysql_connector = mysql_connector
         self._stop_event = asyncio.Event()
@@ -47,17 +63,19 @@ class SlowQueryMonitor:
 
     async def query_mysql_instance(self) -> None:
         try:
-            sql_query = """SELECT `ID`, `DB`, `USER`, `HOST`, `TIME`, `INFO`
+            # 시작 시각은 수집기 시계가 아니라 서버 시계로 계산 (UNIX_TIMESTAMP() - TIME)
+            sql_query = """SELECT `ID`, `DB`, `USER`, `HOST`, `TIME`, `INFO`, UNIX_TIMESTAMP() - `TIME` AS `START`
                             FROM `information_schema`.`PROCESSLIST`
                             WHERE info IS NOT NULL
                             AND DB not in ('information_schema', 'mysql', 'performance_schema')
                             AND USER not in ('monitor', 'rdsadmin', 'system user')
                             ORDER BY `TIME` DESC"""
 
-            result = await self.mysql_connector.execute_query(sql_query)
+            _, rows = await self.mysql_connector.execute_query_raw(sql_query, workload=WORKLOAD_SAMPLER,
+                                                                   timeout=MYSQL_SAMPLER_QUERY_TIMEOUT)
 
             current_pids = set()
-            for row in result:
+            for row in rows:
                 await self.process_query_result(row, current_pids)
 
             await self.handle_finished_queries(current_pids)
@@ -65,22 +83,24 @@ class SlowQueryMonitor:
         except Exception as e:
             self.logger.error(f"Error querying MySQL instance {self.mysql_connector.instance_name}: {e}")
 
-    async def process_query_result(self, row: Dict[str, Any], current_pids: set) -> None:
-        pid, db, user, host, time, info = row['ID'], row['DB'], row['USER'], row['HOST'], row['TIME'], row['INFO']
+    async def process_query_result(self, row: Tuple, current_pids: set) -> None:
+        # SELECT 절의 컬럼 순서: ID, DB, USER, HOST, TIME, INFO, START
+        pid, db, user, host, time, info, start_ts = row
         current_pids.add(pid)
 
         if time >= EXEC_TIME:
-            cache_data = self.pid_time_cache.setdefault(pid, {'max_time': 0})
+            start = datetime.fromtimestamp(int(start_ts), pytz.utc)
+            cache_data = self.pid_time_cache.get(pid)
+            if cache_data and not set(event_start_slots(start)) & set(event_start_slots(cache_data['start'])):
+                # 폴링 사이에 앞 쿼리가 끝나고 같은 pid 에서 다음 슬로우 쿼리가 시작됨
+                await self.persist_query(cache_data)
+                cache_data = None
+            if cache_data is None:
+                cache_data = self.pid_time_cache[pid] = {'max_time': 0, 'start': start}
             cache_data['max_time'] = max(cache_data['max_time'], time)
 
-            if 'start' not in cache_data:
-                utc_now = datetime.now(pytz.utc)
-                utc_start_timestamp = int((utc_now - timedelta(seconds=EXEC_TIME)).timestamp())
-                utc_start_datetime = datetime.fromtimestamp(utc_start_timestamp, pytz.utc)
-                cache_data['start'] = utc_start_datetime
-
-            info_cleaned = re.sub(' +', ' ', info).encode('utf-8', 'ignore').decode('utf-8')
-            info_cleaned = re.sub(r'[\n\t\r]+', ' ', info_cleaned).strip()
+            info_cleaned = MULTI_SPACE_PATTERN.sub(' ', info).encode('utf-8', 'ignore').decode('utf-8')
+            info_cleaned = CONTROL_CHAR_PATTERN.sub(' ', info_cleaned).strip()
 
             cache_data['details'] = QueryDetails(
                 instance=self.mysql_connector.instance_name,
@@ -96,23 +116,41 @@ class SlowQueryMonitor:
     async def handle_finished_queries(self, current_pids: set) -> None:
         for pid, cache_data in list(self.pid_time_cache.items()):
             if pid not in current_pids:
-                data_to_insert = vars(cache_data['details'])
-                data_to_insert['time'] = cache_data['max_time']
-                data_to_insert['end'] = datetime.now(pytz.utc)
-
-                existing_query = await self.collection.find_one({
-                    'pid': data_to_insert['pid'],
-                    'instance': data_to_insert['instance'],
-                    'db': data_to_insert['db'],
-                    'start': data_to_insert['start']
-                })
-
-                if not existing_query:
-                    await self.collection.insert_one(data_to_insert)
-                    self.logger.info(f"Inserted slow query data: instance={self.mysql_connector.instance_name}, DB={data_to_insert['db']}, PID={pid}, execution_time={data_to_insert['time']}s")
-
+                await self.persist_query(cache_data)
                 del self.pid_time_cache[pid]
 
+    async def persist_query(self, cache_data: Dict[str, Any]) -> None:
+        data_to_insert = vars(cache_data['details'])
+        data_to_insert['time'] = cache_data['max_time']
+        data_to_insert['end'] = datetime.now(pytz.utc)
+        # 검색용 테이블 목록과 쿼리 패턴 digest 는 이벤트당 한 번만 계산
+        data_to_insert['tables'] = extract_tables(data_to_insert['sql_text'])
+        data_to_insert['digest'] = sql_digest(data_to_insert['sql_text'])
+        # 중복 판정용 시작 시각 칸, unique 키 (instance, pid, digest, start_slots) 의 일부
+        data_to_insert['start_slots'] = event_start_slots(data_to_insert['start'])
+        # /slow_queries/search/text 후보 검색용 접두어 (상한에 걸려 잘린 문서는 검색 시 정규식으로만 확인)
+        data_to_insert['sql_prefixes'], data_to_insert['sql_prefixes_truncated'] = \
+            identifier_prefixes(data_to_insert['sql_text'])
+        # /explain, /download 에서 pid 대신 사용하는 고정 이벤트 식별자
+        data_to_insert['event_id'] = slow_query_event_id(data_to_insert['instance'], data_to_insert['pid'],
+                                                         data_to_insert['start'], data_to_insert['digest'])
+
+        # 이 수집기가 이미 저장한 이벤트는 MongoDB 왕복 없이 로컬에서 거르고,
+        # 다른 수집기가 먼저 저장한 같은 이벤트는 unique 인덱스의 duplicate key 오류로 벌크 writer 가 무시
+        event_keys = [(data_to_insert['instance'], data_to_insert['pid'], data_to_insert['digest'], slot)
+                      for slot in data_to_insert['start_slots']]
+        if any(key in self.recent_keys for key in event_keys):
+            return
+        self.remember_keys(event_keys)
+        await bulk_writer.write(mongo_settings.MONGO_SLOW_LOG_COLLECTION, data_to_insert)
+        self.logger.info(f"Queued slow query data: instance={self.mysql_connector.instance_name}, DB={data_to_insert['db']}, PID={data_to_insert['pid']}, execution_time={data_to_insert['time']}s")
+
+    def remember_keys(self, event_keys: List[Tuple]) -> None:
+        for event_key in event_keys:
+            self.recent_keys[event_key] = True
+        while len(self.recent_keys) > RECENT_KEYS_SIZE:
+            self.recent_keys.popitem(last=False)
+
     async def run_mysql_slow_queries(self) -> None:
         try:
             self.logger.info(f"Starting slow query monitoring for {self.mysql_connector.instance_name}")
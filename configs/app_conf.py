@@ -26,6 +26,17 @@ class AppSettings(BaseSettings):
     # CORS 설정
     ALLOWED_ORIGINS: list = ["http://localhost:8000"]
 
+    # 응답 압축 설정 (바이트 미만 응답은 압축하지 않음)
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
+    # 슬로우 쿼리 실시간 스트림(SSE) 설정
+    LIVE_STREAM_BUFFER_SIZE: int = int(os.getenv("LIVE_STREAM_BUFFER_SIZE", 256))  # 구독자별 버퍼 이벤트 수, 넘치면 연결 종료
+    LIVE_STREAM_MAX_SUBSCRIBERS: int = int(os.getenv("LIVE_STREAM_MAX_SUBSCRIBERS", 200))
+    LIVE_STREAM_HEARTBEAT: float = float(os.getenv("LIVE_STREAM_HEARTBEAT", 15))  # keepalive 주석 전송 주기 (초)
+    LIVE_STREAM_CATCHUP_LIMIT: int = int(os.getenv("LIVE_STREAM_CATCHUP_LIMIT", 500))  # Last-Event-ID 재연결 시 다시 보내는 최대 이벤트 수
+
     # 기타 설정
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
 
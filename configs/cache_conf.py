@@ -0,0 +1,29 @@
+import os
+from pydantic_settings import BaseSettings
+from functools import lru_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class CacheSettings(BaseSettings):
+    # 읽기 API 응답 캐시
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 512))
+    # 변경 스트림 무효화가 동작하지 않을 때(standalone 등)의 최대 지연을 결정 (초)
+    RESPONSE_CACHE_DEFAULT_TTL: int = int(os.getenv("RESPONSE_CACHE_DEFAULT_TTL", 900))
+    RESPONSE_CACHE_DAILY_TTL: int = int(os.getenv("RESPONSE_CACHE_DAILY_TTL", 3600))
+    # 원본 컬렉션 변경 스트림으로 캐시 무효화 (replica set 필요)
+    RESPONSE_CACHE_CHANGE_STREAMS: bool = os.getenv("RESPONSE_CACHE_CHANGE_STREAMS", "True").lower() == "true"
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+@lru_cache()
+def get_cache_settings():
+    return CacheSettings()
+
+
+cache_settings = get_cache_settings()
@@ -14,11 +14,38 @@ class MongoSettings(BaseSettings):
                                                               "mysql_slow_query_instance")
     MONGO_SLOW_LOG_COLLECTION: str = os.getenv("MONGO_SLOW_LOG_COLLECTION", "mysql_slow_queries")
     MONGO_SLOW_LOG_PLAN_COLLECTION: str = os.getenv("MONGO_SLOW_LOG_PLAN_COLLECTION", "mysql_slow_query_plans")
+    MONGO_SLOW_LOG_PLAN_HISTORY_COLLECTION: str = os.getenv("MONGO_SLOW_LOG_PLAN_HISTORY_COLLECTION",
+                                                            "mysql_slow_query_plan_history")
     MONGO_COM_STATUS_COLLECTION: str = os.getenv("MONGO_COM_STATUS_COLLECTION", "mysql_com_status")
     MONGO_RDS_INSTANCE_ALL_STAT_COLLECTION: str = os.getenv("MONGO_RDS_INSTANCE_ALL_STAT_COLLECTION","aws_rds_instance_all_stat")
     MONGO_DISK_USAGE_COLLECTION: str = os.getenv("MONGO_DISK_USAGE_COLLECTION", "mysql_disk_usage")
     MONGO_SAVE_PROME_COLLECTION: str = os.getenv("MONGO_SAVE_PROME_COLLECTION", "prome_daily")
-
+    MONGO_SLOW_LOG_ROLLUP_COLLECTION: str = os.getenv("MONGO_SLOW_LOG_ROLLUP_COLLECTION", "mysql_slow_queries_hourly")
+    MONGO_ROLLUP_CHECKPOINT_COLLECTION: str = os.getenv("MONGO_ROLLUP_CHECKPOINT_COLLECTION", "rollup_checkpoints")
+    # 롤업 대상에서 제외할 최근 구간 (초), 벌크 writer 에서 아직 기록되지 않은 문서를 건너뛰지 않기 위함
+    SLOW_LOG_ROLLUP_LAG_SECONDS: int = int(os.getenv("SLOW_LOG_ROLLUP_LAG_SECONDS", 60))
+    # 커넥션 풀 / 압축 / 타임아웃 설정
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", 100))
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", 0))
+    MONGODB_COMPRESSORS: str = os.getenv("MONGODB_COMPRESSORS", "zstd,zlib")
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGODB_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", 5000))
+    MONGODB_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", 60000))
+    # 백그라운드 헬스 체크 주기 (초)
+    MONGODB_HEARTBEAT_INTERVAL: int = int(os.getenv("MONGODB_HEARTBEAT_INTERVAL", 10))
+    # 명령 모니터링: explain(executionStats) 샘플링 비율 (0 이면 비활성)
+    MONGO_EXPLAIN_SAMPLE_RATE: float = float(os.getenv("MONGO_EXPLAIN_SAMPLE_RATE", 0.01))
+    MONGO_EXPLAIN_INTERVAL: float = float(os.getenv("MONGO_EXPLAIN_INTERVAL", 5.0))  # 초
+    # 수집기 공용 벌크 writer 설정
+    BULK_WRITER_BATCH_SIZE: int = int(os.getenv("BULK_WRITER_BATCH_SIZE", 500))
+    BULK_WRITER_FLUSH_INTERVAL: float = float(os.getenv("BULK_WRITER_FLUSH_INTERVAL", 1.0))  # 초
+    BULK_WRITER_QUEUE_SIZE: int = int(os.getenv("BULK_WRITER_QUEUE_SIZE", 10000))
+    BULK_WRITER_DROP_POLICY: str = os.getenv("BULK_WRITER_DROP_POLICY", "block")  # block, drop_newest, drop_oldest
+    # 컬렉션별 write concern (JSON, 예: {"mysql_disk_usage": 0, "mysql_slow_queries": "majority"})
+    BULK_WRITER_WRITE_CONCERNS: str = os.getenv("BULK_WRITER_WRITE_CONCERNS", "{}")
+    # 일시적 오류(네트워크, 서버 선택 실패 등)로 실패한 배치 재시도 횟수와 첫 대기 시간(초, 매번 2배)
+    BULK_WRITER_MAX_RETRIES: int = int(os.getenv("BULK_WRITER_MAX_RETRIES", 5))
+    BULK_WRITER_RETRY_BACKOFF: float = float(os.getenv("BULK_WRITER_RETRY_BACKOFF", 0.5))
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,4 +10,40 @@ EXEC_TIME = int(os.getenv('EXEC_TIME', 2))  # 기본값 1초
 # 기타 MySQL 관련 설정들
 MYSQL_DEFAULT_PORT = 3306
 MYSQL_CONNECTION_TIMEOUT = int(os.getenv('MYSQL_CONNECTION_TIMEOUT', 10))
-MYSQL_MAX_POOL_SIZE = int(os.getenv('MYSQL_MAX_POOL_SIZE', 1))
\ No newline at end of file
+MYSQL_MAX_POOL_SIZE = int(os.getenv('MYSQL_MAX_POOL_SIZE', 1))
+
+# 워크로드별 커넥션 풀 설정
+# sampler: 1초 주기의 PROCESSLIST 샘플링 전용, batch: 디스크/커맨드 상태 등 배치성 수집
+MYSQL_SAMPLER_POOL_SIZE = int(os.getenv('MYSQL_SAMPLER_POOL_SIZE', 1))
+MYSQL_BATCH_POOL_SIZE = int(os.getenv('MYSQL_BATCH_POOL_SIZE', MYSQL_MAX_POOL_SIZE))
+MYSQL_SAMPLER_ACQUIRE_TIMEOUT = float(os.getenv('MYSQL_SAMPLER_ACQUIRE_TIMEOUT', 0.5))  # 초
+MYSQL_BATCH_ACQUIRE_TIMEOUT = float(os.getenv('MYSQL_BATCH_ACQUIRE_TIMEOUT', 30))  # 초
+
+# 모니터링 세션 가드레일 설정 (커넥션 생성 시 SET SESSION 으로 적용)
+MYSQL_SESSION_MAX_EXECUTION_TIME = int(os.getenv('MYSQL_SESSION_MAX_EXECUTION_TIME', 5000))  # 밀리초, 0이면 미적용
+MYSQL_SESSION_LOCK_WAIT_TIMEOUT = int(os.getenv('MYSQL_SESSION_LOCK_WAIT_TIMEOUT', 5))  # 초, 0이면 미적용
+MYSQL_SESSION_READ_ONLY = os.getenv('MYSQL_SESSION_READ_ONLY', 'True').lower() == 'true'
+MYSQL_SESSION_ISOLATION = os.getenv('MYSQL_SESSION_ISOLATION', 'READ-COMMITTED')  # 빈 값이면 미적용
+MYSQL_SESSION_SQL_MODE = os.getenv('MYSQL_SESSION_SQL_MODE', '')  # 빈 값이면 서버 기본값 사용
+
+# 클라이언트 측 쿼리 데드라인 (초)
+MYSQL_QUERY_TIMEOUT = float(os.getenv('MYSQL_QUERY_TIMEOUT', 10))
+MYSQL_SAMPLER_QUERY_TIMEOUT = float(os.getenv('MYSQL_SAMPLER_QUERY_TIMEOUT', 3))
+
+# 대용량 메타데이터 조회 시 스트리밍(SS 커서) 배치 크기
+MYSQL_STREAM_BATCH_SIZE = int(os.getenv('MYSQL_STREAM_BATCH_SIZE', 1000))
+
+# 실행 계획(EXPLAIN) 일괄 작업 설정
+EXPLAIN_POOL_SIZE = int(os.getenv('EXPLAIN_POOL_SIZE', 2))  # 인스턴스별 EXPLAIN 전용 커넥션 풀 크기
+EXPLAIN_INSTANCE_CONCURRENCY = int(os.getenv('EXPLAIN_INSTANCE_CONCURRENCY', 2))  # 인스턴스별 동시 EXPLAIN 수
+EXPLAIN_BATCH_MAX_QUERIES = int(os.getenv('EXPLAIN_BATCH_MAX_QUERIES', 200))  # 일괄 작업 한 번의 최대 쿼리 수
+EXPLAIN_JOB_RETENTION_SECONDS = int(os.getenv('EXPLAIN_JOB_RETENTION_SECONDS', 3600))  # 완료된 작업 보관 시간
+EXPLAIN_PLAN_TTL_SECONDS = int(os.getenv('EXPLAIN_PLAN_TTL_SECONDS', 86400))  # 저장된 실행 계획을 다시 EXPLAIN 하기까지의 시간
+
+# EXPLAIN 입장 제어 (인스턴스별 대기열)
+EXPLAIN_QUEUE_SIZE = int(os.getenv('EXPLAIN_QUEUE_SIZE', 8))  # 인스턴스별 최대 대기 요청 수, 초과 시 429
+EXPLAIN_QUEUE_TIMEOUT = float(os.getenv('EXPLAIN_QUEUE_TIMEOUT', 10))  # 대기열에서 기다리는 최대 시간 (초)
+EXPLAIN_TIMEOUT = float(os.getenv('EXPLAIN_TIMEOUT', 15))  # EXPLAIN 실행 데드라인 (초)
+EXPLAIN_MAX_EXECUTION_TIME = int(os.getenv('EXPLAIN_MAX_EXECUTION_TIME', 10000))  # EXPLAIN 커넥션 max_execution_time (밀리초, SELECT 에만 적용되어 EXPLAIN 은 EXPLAIN_TIMEOUT 초과 시 KILL QUERY 로 중단)
+# 클러스터별 EXPLAIN 전용 복제본 엔드포인트 (JSON, 예: {"prd-order-cluster": "prd-order-cluster.cluster-ro-xxx:3306"})
+EXPLAIN_REPLICA_ENDPOINTS = json.loads(os.getenv('EXPLAIN_REPLICA_ENDPOINTS', '{}'))
@@ -0,0 +1,69 @@
+import os
+import json
+import logging
+from typing import Dict, Any
+from pydantic_settings import BaseSettings
+from configs.mongo_conf import mongo_settings
+
+logger = logging.getLogger(__name__)
+
+# 컬렉션별 기준 시간 필드와 기본 보관 기간(일). 0 이면 무기한 보관
+DEFAULT_RETENTION_DAYS = {
+    mongo_settings.MONGO_SLOW_LOG_COLLECTION: 180,
+    mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION: 365,
+    mongo_settings.MONGO_SLOW_LOG_PLAN_HISTORY_COLLECTION: 365,
+    mongo_settings.MONGO_COM_STATUS_COLLECTION: 365,
+    mongo_settings.MONGO_DISK_USAGE_COLLECTION: 180,
+    mongo_settings.MONGO_RDS_INSTANCE_ALL_STAT_COLLECTION: 365,
+}
+TIME_FIELDS = {
+    mongo_settings.MONGO_SLOW_LOG_COLLECTION: 'start',
+    mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION: 'created_at',
+    mongo_settings.MONGO_SLOW_LOG_PLAN_HISTORY_COLLECTION: 'last_seen',
+    mongo_settings.MONGO_COM_STATUS_COLLECTION: 'timestamp',
+    mongo_settings.MONGO_DISK_USAGE_COLLECTION: 'timestamp',
+    # "%Y-%m-%d %H:%M:%S KST" 문자열이라 TTL 인덱스를 쓸 수 없어 아카이브를 꺼도 아카이버가 직접 삭제
+    mongo_settings.MONGO_RDS_INSTANCE_ALL_STAT_COLLECTION: 'timestamp',
+}
+STRING_TIME_COLLECTIONS = {mongo_settings.MONGO_RDS_INSTANCE_ALL_STAT_COLLECTION}
+
+
+class RetentionSettings(BaseSettings):
+    # 컬렉션별 보관 기간 재정의 (JSON, 예: {"mysql_slow_queries": 90})
+    RETENTION_DAYS: str = os.getenv("RETENTION_DAYS", "{}")
+    ARCHIVE_ENABLED: bool = os.getenv("ARCHIVE_ENABLED", "True").lower() == "true"
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "archives")
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", 1000))
+    ARCHIVE_COMPRESSION_LEVEL: int = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", 10))
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+    def get_retention_policies(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            overrides = json.loads(self.RETENTION_DAYS)
+        except json.JSONDecodeError:
+            raise ValueError("RETENTION_DAYS is not a valid JSON string.")
+        return {
+            collection: {
+                'field': TIME_FIELDS[collection],
+                'days': int(overrides.get(collection, days)),
+                # 아카이브를 켜면 TTL 대신 아카이버가 아카이브된 월만 삭제 (내보내기 전 만료 방지)
+                'ttl': collection not in STRING_TIME_COLLECTIONS and not self.ARCHIVE_ENABLED
+            }
+            for collection, days in DEFAULT_RETENTION_DAYS.items()
+        }
+
+
+retention_settings = RetentionSettings()
+RETENTION_POLICIES = retention_settings.get_retention_policies()
+
+# 아카이버는 월 단위로 실행되고 아카이브된 월 전체가 보관 기간을 넘어야 삭제하므로
+# 보관 기간이 두 달보다 짧으면 설정보다 오래 남음
+MIN_ARCHIVED_RETENTION_DAYS = 62
+if retention_settings.ARCHIVE_ENABLED:
+    for _collection, _policy in RETENTION_POLICIES.items():
+        if 0 < _policy['days'] < MIN_ARCHIVED_RETENTION_DAYS:
+            logger.warning(f"Retention for {_collection} is {_policy['days']} days. "
+                           f"Documents are purged only after their month is archived, so they are kept longer.")
@@ -0,0 +1,179 @@
+import asyncio
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, AsyncIterator
+import pyarrow as pa
+import pyarrow.parquet as pq
+from modules.mongodb_connector import MongoDBConnector
+from configs.mongo_conf import mongo_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10000
+EXPORT_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+SLOW_QUERY_SCHEMA = pa.schema([
+    ("instance", pa.string()),
+    ("db", pa.string()),
+    ("pid", pa.int64()),
+    ("user", pa.string()),
+    ("host", pa.string()),
+    ("time", pa.int64()),
+    ("sql_text", pa.string()),
+    ("start", pa.timestamp("ms", tz="UTC")),
+    ("end", pa.timestamp("ms", tz="UTC")),
+    ("tables", pa.list_(pa.string())),
+    ("digest", pa.string()),
+    ("event_id", pa.string()),
+])
+
+
+class ChunkSink:
+    """
+    pyarrow writer 가 기록한 바이트를 모아 두었다가 호출자가 꺼내 가는 쓰기 전용 파일 객체입니다.
+    HTTP 응답처럼 seek 할 수 없는 대상으로 배치마다 흘려보낼 때 사용합니다.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def build_slow_query_filter(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            instance: Optional[List[str]] = None, db: Optional[str] = None) -> Dict[str, Any]:
+    query = {}
+    if start or end:
+        query["start"] = {}
+        if start:
+            query["start"]["$gte"] = start
+        if end:
+            query["start"]["$lt"] = end
+    if instance:
+        query["instance"] = instance[0] if len(instance) == 1 else {"$in": instance}
+    if db:
+        query["db"] = db
+    return query
+
+
+async def iter_record_batches(cursor, schema: pa.Schema,
+                              batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[pa.RecordBatch]:
+    """Motor 커서의 문서를 batch_size 행 단위 RecordBatch 로 변환합니다."""
+    names = schema.names
+    columns = {name: [] for name in names}
+    rows = 0
+    async for document in cursor:
+        for name in names:
+            columns[name].append(document.get(name))
+        rows += 1
+        if rows >= batch_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=schema)
+            columns = {name: [] for name in names}
+            rows = 0
+    if rows:
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def _open_writer(sink, schema: pa.Schema, export_format: str):
+    if export_format == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    if export_format == "arrow":
+        return pa.ipc.new_stream(sink, schema)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+async def stream_export(cursor, schema: pa.Schema, export_format: str,
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """
+    커서를 Parquet 또는 Arrow IPC 스트림 바이트로 변환해 배치마다 내보냅니다.
+    한 번에 batch_size 행만 메모리에 올라가므로 조회 범위와 무관하게 메모리 사용량이 일정합니다.
+    """
+    sink = ChunkSink()
+    writer = _open_writer(sink, schema, export_format)
+    try:
+        async for batch in iter_record_batches(cursor, schema, batch_size):
+            writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+async def open_slow_query_cursor(query: Dict[str, Any], batch_size: int = DEFAULT_BATCH_SIZE):
+    collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_COLLECTION)
+    projection = {name: 1 for name in SLOW_QUERY_SCHEMA.names}
+    projection["_id"] = 0
+    return collection.find(query, projection).sort("start", 1).batch_size(batch_size)
+
+
+async def export_slow_queries_to_file(path: str, export_format: str, query: Dict[str, Any],
+                                      batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """슬로우 쿼리를 파일로 내보내고 기록한 바이트 수를 반환합니다."""
+    cursor = await open_slow_query_cursor(query, batch_size)
+    written = 0
+    with open(path, "wb") as fh:
+        async for chunk in stream_export(cursor, SLOW_QUERY_SCHEMA, export_format, batch_size):
+            fh.write(chunk)
+            written += len(chunk)
+    return written
+
+
+async def _main(args):
+    start = datetime.strptime(args.start, "%Y-%m-%d") if args.start else None
+    end = datetime.strptime(args.end, "%Y-%m-%d") + timedelta(days=1) if args.end else None
+    query = build_slow_query_filter(start, end, args.instance, args.db)
+
+    await MongoDBConnector.initialize()
+    try:
+        written = await export_slow_queries_to_file(args.output, args.format, query, args.batch_size)
+        print(f"Exported slow queries to {args.output} ({written:,} bytes)")
+    finally:
+        await MongoDBConnector.close()
+
+
+# 사용 예시
+# python -m modules.arrow_export --start 2024-10-01 --end 2024-10-31 --instance orderservice -o slow.parquet
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="슬로우 쿼리 이력을 Parquet/Arrow IPC 파일로 내보냅니다.")
+    parser.add_argument("--start", help="시작일 (YYYY-MM-DD, UTC)")
+    parser.add_argument("--end", help="종료일 (YYYY-MM-DD, UTC, 해당일 포함)")
+    parser.add_argument("--instance", action="append", help="인스턴스 이름 (여러 번 지정 가능)")
+    parser.add_argument("--db", help="데이터베이스 이름")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="parquet")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("-o", "--output", required=True, help="출력 파일 경로")
+    asyncio.run(_main(parser.parse_args()))
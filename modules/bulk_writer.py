@@ -0,0 +1,225 @@
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List
+from pymongo import WriteConcern
+from pymongo.errors import AutoReconnect, BulkWriteError, PyMongoError
+from modules.mongodb_connector import MongoDBConnector
+from modules.metrics import TimingStats
+from configs.mongo_conf import mongo_settings
+
+logger = logging.getLogger(__name__)
+
+DROP_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+DUPLICATE_KEY_ERROR = 11000
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    다시 보내면 성공할 수 있는 배치 전체 실패인지 판단합니다.
+    AutoReconnect 는 NetworkTimeout, ServerSelectionTimeoutError 를 포함합니다.
+    InvalidDocument, DocumentTooLarge 처럼 같은 배치로는 계속 실패하는 오류는 재시도하지 않습니다.
+    """
+    if isinstance(error, AutoReconnect):
+        return True
+    return isinstance(error, PyMongoError) and error.has_error_label("RetryableWriteError")
+
+
+class CollectionQueue:
+    def __init__(self, name: str, queue_size: int, write_concern: Any = None):
+        self.name = name
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.write_concern = WriteConcern(w=write_concern) if write_concern is not None else None
+        self.flush_latency = TimingStats()
+        self.batch_count = 0
+        self.batch_size_total = 0
+        self.batch_size_max = 0
+        self.written = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.errors = 0
+        self.retries = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'queued': self.queue.qsize(),
+            'written': self.written,
+            'duplicates': self.duplicates,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'retries': self.retries,
+            'flush_latency': self.flush_latency.to_dict(),
+            'batch_size': {
+                'count': self.batch_count,
+                'avg': round(self.batch_size_total / self.batch_count, 2) if self.batch_count else 0,
+                'max': self.batch_size_max
+            }
+        }
+
+
+class BulkWriter:
+    """
+    수집기 프로세스 전체가 공유하는 MongoDB 쓰기 서비스입니다.
+    모든 인스턴스/모니터의 문서를 컬렉션별 큐에 모아 크기 또는 시간 조건으로 unordered insert_many 를 실행합니다.
+    """
+
+    def __init__(self, batch_size: int = mongo_settings.BULK_WRITER_BATCH_SIZE,
+                 flush_interval: float = mongo_settings.BULK_WRITER_FLUSH_INTERVAL,
+                 queue_size: int = mongo_settings.BULK_WRITER_QUEUE_SIZE,
+                 drop_policy: str = mongo_settings.BULK_WRITER_DROP_POLICY,
+                 write_concerns: Dict[str, Any] = None,
+                 max_retries: int = mongo_settings.BULK_WRITER_MAX_RETRIES,
+                 retry_backoff: float = mongo_settings.BULK_WRITER_RETRY_BACKOFF):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"BULK_WRITER_DROP_POLICY must be one of {DROP_POLICIES}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.write_concerns = write_concerns if write_concerns is not None else json.loads(
+            mongo_settings.BULK_WRITER_WRITE_CONCERNS)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queues: Dict[str, CollectionQueue] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    async def start(self):
+        self._stopping = False
+        logger.info(f"BulkWriter started (batch_size={self.batch_size}, flush_interval={self.flush_interval}s, "
+                    f"queue_size={self.queue_size}, drop_policy={self.drop_policy})")
+
+    async def stop(self):
+        """큐에 남은 문서를 모두 기록한 뒤 종료합니다."""
+        self._stopping = True
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks = {}
+        logger.info(f"BulkWriter stopped. Stats: {self.get_stats()}")
+
+    def _get_queue(self, collection_name: str) -> CollectionQueue:
+        if collection_name not in self._queues:
+            self._queues[collection_name] = CollectionQueue(
+                collection_name, self.queue_size, self.write_concerns.get(collection_name))
+        if collection_name not in self._tasks or self._tasks[collection_name].done():
+            self._tasks[collection_name] = asyncio.create_task(self._flush_loop(self._queues[collection_name]))
+        return self._queues[collection_name]
+
+    async def write(self, collection_name: str, document: Dict[str, Any]) -> bool:
+        """
+        문서를 쓰기 큐에 넣습니다.
+
+        :return: 큐에 들어갔으면 True, drop 정책에 의해 버려졌으면 False
+        """
+        if self._stopping:
+            raise RuntimeError("BulkWriter is stopping")
+        collection_queue = self._get_queue(collection_name)
+        queue = collection_queue.queue
+
+        if not queue.full():
+            queue.put_nowait(document)
+            return True
+
+        if self.drop_policy == 'block':
+            await queue.put(document)
+            return True
+
+        collection_queue.dropped += 1
+        if self.drop_policy == 'drop_oldest':
+            queue.get_nowait()
+            queue.put_nowait(document)
+            return True
+        return False
+
+    async def _collect_batch(self, collection_queue: CollectionQueue) -> List[Dict[str, Any]]:
+        queue = collection_queue.queue
+        loop = asyncio.get_running_loop()
+        try:
+            batch = [await asyncio.wait_for(queue.get(), self.flush_interval)]
+        except asyncio.TimeoutError:
+            return []
+
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0 or self._stopping:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush_loop(self, collection_queue: CollectionQueue):
+        while True:
+            batch = await self._collect_batch(collection_queue)
+            if batch:
+                await self._flush(collection_queue, batch)
+            elif self._stopping:
+                break
+
+    async def _flush(self, collection_queue: CollectionQueue, batch: List[Dict[str, Any]]):
+        started = time.monotonic()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await self._insert(collection_queue, batch)
+                    return
+                except Exception as e:
+                    if not is_transient_error(e):
+                        # 재시도해도 같은 결과이므로 flush 루프를 막지 않고 바로 실패로 집계
+                        collection_queue.errors += len(batch)
+                        logger.error(f"Failed to flush {len(batch)} documents to {collection_queue.name}, "
+                                     f"not retrying {type(e).__name__}: {e}")
+                        return
+                    if attempt == self.max_retries:
+                        collection_queue.errors += len(batch)
+                        logger.error(f"Failed to flush {len(batch)} documents to {collection_queue.name} "
+                                     f"after {attempt + 1} attempts: {e}")
+                        return
+                    delay = self.retry_backoff * (2 ** attempt)
+                    collection_queue.retries += 1
+                    logger.warning(f"Flush of {len(batch)} documents to {collection_queue.name} failed, "
+                                   f"retrying in {delay:.1f}s: {e}")
+                    await asyncio.sleep(delay)
+        finally:
+            collection_queue.flush_latency.observe(time.monotonic() - started)
+            collection_queue.batch_count += 1
+            collection_queue.batch_size_total += len(batch)
+            collection_queue.batch_size_max = max(collection_queue.batch_size_max, len(batch))
+
+    async def _insert(self, collection_queue: CollectionQueue, batch: List[Dict[str, Any]]):
+        """
+        배치를 unordered insert_many 로 기록합니다. 문서 단위 오류는 여기서 집계하고,
+        배치 전체가 실패한 경우만 예외로 올리고, 그중 일시적 오류(is_transient_error)만 재시도합니다.
+        insert_many 가 문서에 _id 를 채워 두므로 재시도 중 이미 들어간 문서는 중복 키로 걸러집니다.
+        """
+        collection = await MongoDBConnector.get_collection(collection_queue.name)
+        if collection_queue.write_concern is not None:
+            collection = collection.with_options(write_concern=collection_queue.write_concern)
+        try:
+            result = await collection.insert_many(batch, ordered=False)
+            collection_queue.written += len(result.inserted_ids) if result.acknowledged else len(batch)
+        except BulkWriteError as e:
+            # 실패한 문서만 writeErrors 에 들어가고 나머지는 기록됨
+            write_errors = e.details.get('writeErrors', [])
+            failed = [error for error in write_errors if error.get('code') != DUPLICATE_KEY_ERROR]
+            collection_queue.written += e.details.get('nInserted', 0)
+            collection_queue.duplicates += len(write_errors) - len(failed)
+            collection_queue.errors += len(failed)
+            if failed:
+                logger.error(f"Bulk insert into {collection_queue.name} had {len(failed)} failed documents: "
+                             f"{failed[:3]}")
+            if e.details.get('writeConcernErrors'):
+                logger.warning(f"Bulk insert into {collection_queue.name} had write concern errors: "
+                               f"{e.details['writeConcernErrors'][:3]}")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: collection_queue.to_dict() for name, collection_queue in self._queues.items()}
+
+
+bulk_writer = BulkWriter()
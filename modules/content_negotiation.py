@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+import msgpack
+import pyarrow as pa
+from bson import ObjectId
+from fastapi import Request
+from modules import fast_json
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# 클라이언트가 보내는 별칭과 format 쿼리 파라미터 값
+MEDIA_ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.apache.arrow.file": ARROW}
+FORMAT_MEDIA_TYPES = {"json": JSON, "ndjson": NDJSON, "msgpack": MSGPACK, "arrow": ARROW}
+
+
+def _parse_accept(accept: str) -> List[tuple]:
+    entries = []
+    for position, part in enumerate(accept.split(",")):
+        fields = [field.strip() for field in part.split(";")]
+        if not fields[0]:
+            continue
+        quality = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        entries.append((MEDIA_ALIASES.get(fields[0].lower(), fields[0].lower()), quality, position))
+    return entries
+
+
+def negotiate(request: Request, supported: Sequence[str], format: Optional[str] = None) -> str:
+    """
+    format 쿼리 파라미터 또는 Accept 헤더로 응답 형식을 고릅니다.
+    q 값이 같으면 supported 의 앞쪽(서버 선호)을 택하고, 맞는 형식이 없으면 첫 번째 형식으로 응답합니다.
+
+    :param request: 요청
+    :param supported: 지원하는 미디어 타입 (첫 번째가 기본값)
+    :param format: format 쿼리 파라미터 (json, ndjson, msgpack, arrow)
+    :return: 선택된 미디어 타입
+    """
+    if format:
+        media_type = FORMAT_MEDIA_TYPES.get(format)
+        return media_type if media_type in supported else supported[0]
+
+    best, best_rank = supported[0], None
+    for media_type, quality, position in _parse_accept(request.headers.get("accept", "")):
+        if quality <= 0:
+            continue
+        candidates = supported if media_type in ("*/*", "application/*") else \
+            [media_type] if media_type in supported else []
+        for candidate in candidates:
+            rank = (quality, media_type != "*/*", -supported.index(candidate), -position)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = candidate, rank
+    return best
+
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not msgpack serializable")
+
+
+def rows_to_arrow(rows: List[Dict[str, Any]], schema: Optional[pa.Schema] = None) -> bytes:
+    table = pa.Table.from_pylist(rows, schema=schema)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def render(content: Any, media_type: str) -> bytes:
+    """
+    응답 내용을 미디어 타입에 맞게 직렬화합니다. Arrow 는 행(dict) 목록만 지원합니다.
+
+    :param content: 응답 내용
+    :param media_type: JSON, MSGPACK 또는 ARROW
+    :return: 직렬화된 바이트
+    """
+    if media_type == MSGPACK:
+        return msgpack.packb(content, default=_msgpack_default, use_bin_type=True)
+    if media_type == ARROW:
+        return rows_to_arrow(content)
+    return fast_json.dumps(content)
@@ -0,0 +1,203 @@
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+RESOLUTION_PATTERN = re.compile(r"^(\d+)([mhd])$")
+RESOLUTION_UNITS = {'m': ('minute', 60), 'h': ('hour', 3600), 'd': ('day', 86400)}
+# 자동 해상도 후보 (차트 축 눈금과 맞도록 사람이 읽기 쉬운 간격만 사용)
+NICE_RESOLUTIONS = ['1m', '5m', '15m', '30m', '1h', '3h', '6h', '12h', '1d', '7d']
+# LTTB 는 max_points 의 몇 배 해상도로 먼저 버킷팅한 뒤 점을 고름
+LTTB_OVERSAMPLE = 4
+SERIES_TIMEZONE = 'Asia/Seoul'
+
+
+def parse_resolution(resolution: str) -> Tuple[str, int, int]:
+    """
+    '15m', '1h', '1d' 형식의 해상도를 해석합니다.
+
+    :param resolution: 해상도 문자열
+    :return: ($dateTrunc unit, binSize, 버킷 길이(초))
+    """
+    match = RESOLUTION_PATTERN.match(resolution)
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid resolution: {resolution}")
+    bin_size = int(match.group(1))
+    unit, unit_seconds = RESOLUTION_UNITS[match.group(2)]
+    return unit, bin_size, bin_size * unit_seconds
+
+
+def choose_resolution(span_seconds: float, max_points: int) -> Optional[str]:
+    """구간을 max_points 개 이하의 버킷으로 나누는 가장 작은 해상도를 고릅니다. 원본으로 충분하면 None."""
+    target = span_seconds / max_points
+    if target <= 0:
+        return None
+    for resolution in NICE_RESOLUTIONS:
+        if parse_resolution(resolution)[2] >= target:
+            return resolution
+    return NICE_RESOLUTIONS[-1]
+
+
+async def series_span_seconds(collection, match: Dict[str, Any], time_field: str = 'timestamp') -> float:
+    """조건에 맞는 첫 샘플과 마지막 샘플 사이의 길이(초)를 인덱스 조회 두 번으로 구합니다."""
+    first = await collection.find_one(match, {time_field: 1}, sort=[(time_field, 1)])
+    last = await collection.find_one(match, {time_field: 1}, sort=[(time_field, -1)])
+    if not first or not last:
+        return 0
+    return (last[time_field] - first[time_field]).total_seconds()
+
+
+def series_pipeline(match: Dict[str, Any], map_field: str, value_fields: Sequence[str],
+                    names: Optional[List[str]] = None, resolution: Optional[str] = None,
+                    name_key: str = 'name', time_field: str = 'timestamp') -> List[Dict[str, Any]]:
+    """
+    {time_field, map_field: {이름: {값 필드...}}} 형태의 문서를 (timestamp, 이름, 값...) 행으로 펼칩니다.
+    resolution 이 있으면 버킷별 평균을 값으로, 첫 번째 값 필드의 최소/최대와 샘플 수를 함께 반환합니다.
+
+    :param match: $match 조건
+    :param map_field: 이름별 값이 들어 있는 필드 (disk_status, command_status)
+    :param value_fields: 행으로 꺼낼 값 필드
+    :param names: 포함할 이름 목록 (None 이면 전체)
+    :param resolution: 버킷 해상도 ('15m', '1h' 등), None 이면 원본 샘플
+    :param name_key: 결과 행에서 이름을 담을 키
+    :param time_field: 시간 필드
+    :return: 집계 파이프라인
+    """
+    projection = {'_id': 0, time_field: 1}
+    if names:
+        for name in names:
+            projection[f'{map_field}.{name}'] = 1
+    else:
+        projection[map_field] = 1
+
+    pipeline = [
+        {'$match': match},
+        {'$sort': {time_field: 1}},
+        {'$project': projection},
+        {'$project': {
+            'ts': f'${time_field}',
+            'metric': {'$objectToArray': {'$ifNull': [f'${map_field}', {}]}}
+        }},
+        {'$unwind': '$metric'},
+    ]
+
+    if resolution is None:
+        pipeline.append({'$project': {
+            '_id': 0,
+            'timestamp': {'$dateToString': {'format': '%Y-%m-%d %H:%M:%S', 'date': '$ts',
+                                            'timezone': SERIES_TIMEZONE}},
+            name_key: '$metric.k',
+            **{field: {'$ifNull': [f'$metric.v.{field}', 0]} for field in value_fields}
+        }})
+        return pipeline
+
+    unit, bin_size, _ = parse_resolution(resolution)
+    primary = value_fields[0]
+    pipeline += [
+        {'$group': {
+            '_id': {
+                'bucket': {'$dateTrunc': {'date': '$ts', 'unit': unit, 'binSize': bin_size,
+                                          'timezone': SERIES_TIMEZONE}},
+                'name': '$metric.k'
+            },
+            **{field: {'$avg': f'$metric.v.{field}'} for field in value_fields},
+            f'{primary}_min': {'$min': f'$metric.v.{primary}'},
+            f'{primary}_max': {'$max': f'$metric.v.{primary}'},
+            'samples': {'$sum': 1}
+        }},
+        {'$sort': {'_id.bucket': 1, '_id.name': 1}},
+        {'$project': {
+            '_id': 0,
+            'bucket': '$_id.bucket',
+            'timestamp': {'$dateToString': {'format': '%Y-%m-%d %H:%M:%S', 'date': '$_id.bucket',
+                                            'timezone': SERIES_TIMEZONE}},
+            name_key: '$_id.name',
+            **{field: {'$round': [{'$ifNull': [f'${field}', 0]}, 3]} for field in value_fields},
+            f'{primary}_min': 1,
+            f'{primary}_max': 1,
+            'samples': 1
+        }}
+    ]
+    return pipeline
+
+
+def lttb(points: List[Any], threshold: int, x: Callable[[Any], float],
+         y: Callable[[Any], float]) -> List[Any]:
+    """
+    Largest-Triangle-Three-Buckets 로 시계열 모양을 유지하며 threshold 개의 점을 고릅니다.
+
+    :param points: x 오름차순으로 정렬된 점 목록
+    :param threshold: 반환할 점 수
+    :param x: 점의 x 값 (숫자)
+    :param y: 점의 y 값 (숫자)
+    :return: 선택된 점 목록 (원본 객체)
+    """
+    if threshold >= len(points) or threshold < 3:
+        return points
+
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    selected = 0
+
+    for i in range(threshold - 2):
+        # 다음 버킷의 평균점
+        next_start = int(math.floor((i + 1) * bucket_size)) + 1
+        next_end = min(int(math.floor((i + 2) * bucket_size)) + 1, len(points))
+        next_bucket = points[next_start:next_end]
+        avg_x = sum(x(p) for p in next_bucket) / len(next_bucket)
+        avg_y = sum(y(p) for p in next_bucket) / len(next_bucket)
+
+        # 현재 버킷에서 이전 선택점-다음 평균점과 가장 큰 삼각형을 만드는 점 선택
+        start = int(math.floor(i * bucket_size)) + 1
+        end = int(math.floor((i + 1) * bucket_size)) + 1
+        ax, ay = x(points[selected]), y(points[selected])
+        best_area, best = -1.0, start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (y(points[j]) - ay) - (ax - x(points[j])) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, j
+        sampled.append(points[best])
+        selected = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def lttb_rows(rows: List[Dict[str, Any]], max_points: int, name_key: str, value_field: str) -> List[Dict[str, Any]]:
+    """버킷 행을 이름별로 나눠 LTTB 를 적용하고 시간순으로 다시 합칩니다."""
+    series: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        series.setdefault(row[name_key], []).append(row)
+
+    result = []
+    for points in series.values():
+        result.extend(lttb(points, max_points, x=lambda row: row['bucket'].timestamp(),
+                           y=lambda row: row[value_field] or 0))
+    result.sort(key=lambda row: (row['bucket'], row[name_key]))
+    return result
+
+
+async def resolve_resolution(collection, match: Dict[str, Any], resolution: str, max_points: Optional[int],
+                             lttb_enabled: bool = False) -> Optional[str]:
+    """
+    요청 파라미터로 실제 버킷 해상도를 결정합니다.
+
+    :param resolution: 'raw', 'auto' 또는 '15m' 같은 해상도
+    :param max_points: 이름별 최대 점 수 (auto 에서 사용)
+    :param lttb_enabled: LTTB 를 적용할 경우 max_points 의 LTTB_OVERSAMPLE 배로 버킷팅
+    :return: 버킷 해상도, 원본 샘플을 그대로 쓰면 None
+    """
+    if resolution == 'raw':
+        return None
+    if resolution != 'auto':
+        parse_resolution(resolution)
+        return resolution
+    if not max_points:
+        return None
+    span = await series_span_seconds(collection, match)
+    return choose_resolution(span, max_points * LTTB_OVERSAMPLE if lttb_enabled else max_points)
+
+
+def strip_buckets(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    for row in rows:
+        row.pop('bucket', None)
+    return rows
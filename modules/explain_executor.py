@@ -0,0 +1,507 @@
+import re
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlparse
+from pymongo import UpdateOne
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from modules.mongodb_connector import MongoDBConnector
+from modules.mysql_connector import MySQLConnector, build_session_init_command
+from modules.metrics import TimingStats
+from modules.load_instance import load_instances_from_mongodb
+from modules.sql_utils import sql_digest
+from modules.explain_plan import plan_hash, summarize_plan
+from configs.mongo_conf import mongo_settings
+from configs.mysql_conf import (
+    EXPLAIN_POOL_SIZE, EXPLAIN_INSTANCE_CONCURRENCY,
+    EXPLAIN_BATCH_MAX_QUERIES, EXPLAIN_JOB_RETENTION_SECONDS, EXPLAIN_PLAN_TTL_SECONDS,
+    EXPLAIN_QUEUE_SIZE, EXPLAIN_QUEUE_TIMEOUT, EXPLAIN_TIMEOUT, EXPLAIN_MAX_EXECUTION_TIME,
+    EXPLAIN_REPLICA_ENDPOINTS
+)
+
+logger = logging.getLogger(__name__)
+
+COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+
+def remove_sql_comments(sql_text: str) -> str:
+    return COMMENT_PATTERN.sub('', sql_text)
+
+
+def validate_explain_sql(sql_text: str) -> str:
+    """
+    EXPLAIN 할 수 있는 SELECT 쿼리인지 확인합니다.
+
+    :param sql_text: 원본 SQL
+    :return: 주석을 제거한 SQL
+    :raises ValueError: SELECT 가 아니거나 SELECT ... INTO 형태인 경우
+    """
+    query_without_comments = remove_sql_comments(sql_text).strip()
+    if not query_without_comments.lower().startswith("select"):
+        raise ValueError("SELECT 쿼리만 가능합니다.")
+    if "into" in query_without_comments.lower().split("from")[0]:
+        raise ValueError("SELECT ... INTO ... FROM 형태의 프로시저 쿼리는 실행할 수 없습니다.")
+    return query_without_comments
+
+
+class ExplainRejected(Exception):
+    """EXPLAIN 대기열이 가득 찼거나 대기 시간이 초과되어 요청을 받지 않음"""
+
+    def __init__(self, target: str, reason: str):
+        super().__init__(f"EXPLAIN queue for {target} is busy ({reason})")
+        self.target = target
+        self.reason = reason
+
+
+class AdmissionQueue:
+    """
+    EXPLAIN 대상(인스턴스 또는 복제본) 하나의 입장 제어. 동시 실행은 concurrency 개로 제한하고,
+    대기 요청이 queue_size 개를 넘으면 기다리게 하지 않고 바로 거절합니다.
+    """
+
+    def __init__(self, concurrency: int, queue_size: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.running = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_timeouts = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.wait_time = TimingStats()
+        self.run_time = TimingStats()
+
+    @asynccontextmanager
+    async def admit(self, target: str, timeout: float, bounded: bool = True):
+        started = time.monotonic()
+        if not self.semaphore.locked():
+            # 빈 슬롯이 있으면 대기 없이 바로 실행
+            await self.semaphore.acquire()
+        else:
+            if bounded and self.waiting >= self.queue_size:
+                self.rejected += 1
+                raise ExplainRejected(target, "queue full")
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                # 제한 없는 대기(일괄 작업)는 대기 시간 제한도 두지 않음
+                await asyncio.wait_for(self.semaphore.acquire(), timeout if bounded else None)
+            except asyncio.TimeoutError:
+                self.queue_timeouts += 1
+                raise ExplainRejected(target, "queue timeout")
+            finally:
+                self.waiting -= 1
+        self.wait_time.observe(time.monotonic() - started)
+
+        self.running += 1
+        self.admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.running -= 1
+            self.semaphore.release()
+            self.run_time.observe(time.monotonic() - started)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'concurrency': self.concurrency,
+            'queue_size': self.queue_size,
+            'running': self.running,
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'queue_timeouts': self.queue_timeouts,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'queue_wait': self.wait_time.to_dict(),
+            'run_time': self.run_time.to_dict()
+        }
+
+
+def explain_target(instance_info: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    EXPLAIN 을 실행할 대상을 고릅니다. 인스턴스의 cluster_name 에 복제본 엔드포인트가 설정되어 있으면
+    같은 계정으로 복제본에 접속하고, 아니면 인스턴스에 직접 접속합니다.
+
+    :return: (대상 이름, 접속 정보)
+    """
+    cluster_name = instance_info.get('cluster_name')
+    endpoint = EXPLAIN_REPLICA_ENDPOINTS.get(cluster_name) if cluster_name else None
+    if not endpoint:
+        return instance_info['instance_name'], instance_info
+    host, _, port = endpoint.partition(':')
+    target = f"{cluster_name}@replica"
+    return target, {**instance_info, 'instance_name': target, 'host': host,
+                    'port': int(port) if port else instance_info['port']}
+
+
+class ExplainExecutor:
+    """
+    대상별 EXPLAIN 전용 커넥션 풀과 입장 제어 대기열을 관리합니다.
+    풀은 대상을 처음 EXPLAIN 할 때 만들어지므로 비밀번호 복호화도 풀 생성 시 한 번만 일어납니다.
+    """
+
+    def __init__(self, pool_size: int = EXPLAIN_POOL_SIZE, concurrency: int = EXPLAIN_INSTANCE_CONCURRENCY,
+                 queue_size: int = EXPLAIN_QUEUE_SIZE, queue_timeout: float = EXPLAIN_QUEUE_TIMEOUT,
+                 timeout: float = EXPLAIN_TIMEOUT):
+        self.pool_size = pool_size
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.init_command = build_session_init_command(EXPLAIN_MAX_EXECUTION_TIME)
+        self.connectors: Dict[str, MySQLConnector] = {}
+        self.endpoints: Dict[str, Tuple] = {}
+        self.queues: Dict[str, AdmissionQueue] = {}
+        # 풀 생성(접속, 비밀번호 복호화)이 느린 대상이 다른 대상을 막지 않도록 대상별로 잠금
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def _get_connector(self, target: str, connection_info: Dict[str, Any]) -> MySQLConnector:
+        endpoint = (connection_info['host'], connection_info['port'], connection_info['user'],
+                    connection_info['password'])
+        connector = self.connectors.get(target)
+        if connector and self.endpoints.get(target) == endpoint:
+            return connector
+        async with self._locks.setdefault(target, asyncio.Lock()):
+            connector = self.connectors.get(target)
+            if connector and self.endpoints.get(target) == endpoint:
+                return connector
+            if connector:
+                # 접속 정보가 바뀐 경우 기존 풀을 닫고 다시 생성
+                await connector.close_pool()
+            connector = MySQLConnector("slow_query_explain")
+            await connector.create_pool(connection_info, pool_size=self.pool_size, init_command=self.init_command)
+            self.connectors[target] = connector
+            self.endpoints[target] = endpoint
+            return connector
+
+    def _queue(self, target: str) -> AdmissionQueue:
+        if target not in self.queues:
+            self.queues[target] = AdmissionQueue(self.concurrency, self.queue_size)
+        return self.queues[target]
+
+    async def explain(self, instance_info: Dict[str, Any], db: str, sql_text: str,
+                      bounded: bool = True) -> Dict[str, Any]:
+        """
+        대상 풀에서 EXPLAIN FORMAT=JSON 을 실행합니다.
+        대기열이 가득 차면 ExplainRejected, 실행이 EXPLAIN_TIMEOUT 을 넘으면 asyncio.TimeoutError 가 발생합니다.
+        max_execution_time 은 SELECT 문에만 적용되어 EXPLAIN 을 멈추지 못하므로, 데드라인을 넘기면
+        별도 커넥션에서 KILL QUERY 로 서버 측 문장을 중단합니다 (KILL 이 실패하면 서버 스레드는 EXPLAIN 이 끝날 때까지 남음).
+
+        :param instance_info: load_instances_from_mongodb 의 인스턴스 정보
+        :param db: 쿼리가 실행된 데이터베이스
+        :param sql_text: 원본 SQL
+        :param bounded: False 이면 대기열 크기와 대기 시간 제한 없이 순서를 기다림 (자체적으로 동시 요청 수를 제한하는 일괄 작업용)
+        :return: 실행 계획 JSON
+        """
+        validated_sql = validate_explain_sql(sql_text)
+        target, connection_info = explain_target(instance_info)
+        async with self._queue(target).admit(target, self.queue_timeout, bounded):
+            connector = await self._get_connector(target, connection_info)
+            execution_plan = await connector.execute_query_in_database(
+                db, f"EXPLAIN FORMAT=JSON {validated_sql}", timeout=self.timeout, kill_on_timeout=True)
+        if not execution_plan or 'EXPLAIN' not in execution_plan[0]:
+            raise ValueError("EXPLAIN 결과가 예상된 형식이 아닙니다.")
+        return json.loads(execution_plan[0]['EXPLAIN'])
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """대상별 대기열 깊이/거절/타임아웃 및 커넥션 풀 대기 메트릭"""
+        return {
+            target: {
+                **queue.to_dict(),
+                'pool': self.connectors[target].get_pool_stats() if target in self.connectors else {}
+            }
+            for target, queue in self.queues.items()
+        }
+
+    async def close(self) -> None:
+        for target, connector in list(self.connectors.items()):
+            async with self._locks.setdefault(target, asyncio.Lock()):
+                try:
+                    await connector.close_pool()
+                except Exception as e:
+                    logger.error(f"Error closing explain pool for {connector.instance_name}: {e}")
+                self.connectors.pop(target, None)
+                self.endpoints.pop(target, None)
+
+
+explain_executor = ExplainExecutor()
+
+
+def plan_key(document: Dict[str, Any]) -> Dict[str, Any]:
+    """실행 계획 캐시 키 (instance, db, digest), digest 가 없는 과거 문서는 sql_text 로 계산"""
+    return {
+        "instance": document["instance"],
+        "db": document["db"],
+        "digest": document.get("digest") or sql_digest(document["sql_text"])
+    }
+
+
+def plan_write_fields(sql_text: str, explain_result: Dict[str, Any]) -> Dict[str, Any]:
+    """실행 계획 문서에 함께 저장하는 요약(summary)과 정렬된 SQL(formatted_sql)"""
+    return {
+        "summary": summarize_plan(explain_result),
+        "formatted_sql": sqlparse.format(sql_text, reindent=True, keyword_case='upper')
+    }
+
+
+async def backfill_plan_summaries(batch_size: int = 500) -> int:
+    """
+    summary 가 없는 기존 실행 계획 문서를 채웁니다. 반복 실행해도 남은 문서만 처리합니다.
+
+    :param batch_size: bulk_write 한 번에 보낼 문서 수
+    :return: 갱신된 문서 수
+    """
+    collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION)
+    updated = 0
+    batch = []
+    cursor = collection.find({"summary": {"$exists": False}, "explain_result": {"$exists": True}},
+                             {"sql_text": 1, "explain_result": 1}).batch_size(batch_size)
+    async for document in cursor:
+        batch.append(UpdateOne({"_id": document["_id"]},
+                               {"$set": plan_write_fields(document.get("sql_text") or "", document["explain_result"])}))
+        if len(batch) >= batch_size:
+            updated += (await collection.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await collection.bulk_write(batch, ordered=False)).modified_count
+    logger.info(f"Backfilled summaries on {updated} plan documents")
+    return updated
+
+
+def _is_fresh(plan: Optional[Dict[str, Any]], now: datetime, ttl: int) -> bool:
+    if not plan or not plan.get("created_at") or not plan.get("plan_hash"):
+        return False
+    created_at = plan["created_at"]
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return now - created_at < timedelta(seconds=ttl)
+
+
+async def explain_and_save(document: Dict[str, Any], instance_info: Dict[str, Any],
+                           force: bool = False, bounded: bool = True) -> Tuple[Dict[str, Any], bool]:
+    """
+    슬로우 쿼리의 실행 계획을 (instance, db, digest) 단위로 캐시합니다.
+    저장된 계획이 EXPLAIN_PLAN_TTL_SECONDS 이내이면 EXPLAIN 을 다시 실행하지 않고,
+    다시 실행한 계획의 형태(plan_hash)가 이전과 다르면 regression 으로 표시하고 이력을 남깁니다.
+
+    :param document: 슬로우 쿼리 문서
+    :param instance_info: 인스턴스 정보
+    :param force: True 이면 캐시와 무관하게 EXPLAIN 실행
+    :param bounded: ExplainExecutor.explain 의 bounded
+    :return: (실행 계획 문서 (explain_result 제외), 캐시 사용 여부)
+    """
+    key = plan_key(document)
+    now = datetime.now(timezone.utc)
+    mongodb = await MongoDBConnector.get_database()
+    plan_collection = mongodb[mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION]
+    history_collection = mongodb[mongo_settings.MONGO_SLOW_LOG_PLAN_HISTORY_COLLECTION]
+
+    cached = await plan_collection.find_one(key, {"explain_result": 0})
+    if not force and _is_fresh(cached, now, EXPLAIN_PLAN_TTL_SECONDS):
+        return cached, True
+
+    execution_plan = await explain_executor.explain(instance_info, document["db"], document["sql_text"], bounded)
+    new_hash = plan_hash(execution_plan)
+    query_plan_document = {
+        **key,
+        "pid": document["pid"],
+        "event_id": document.get("event_id"),
+        "user": document["user"],
+        "time": document["time"],
+        "sql_text": remove_sql_comments(document["sql_text"]),
+        "explain_result": execution_plan,
+        "plan_hash": new_hash,
+        "created_at": now
+    }
+    # 목록/다운로드에서 매번 계산하지 않도록 요약과 정렬된 SQL 을 저장 시점에 계산
+    query_plan_document.update(plan_write_fields(query_plan_document["sql_text"], execution_plan))
+    update = {"$set": query_plan_document}
+    previous_hash = cached.get("plan_hash") if cached else None
+    if previous_hash and previous_hash != new_hash:
+        # 같은 쿼리 패턴의 실행 계획 형태가 바뀜
+        query_plan_document.update({"regression": True, "previous_plan_hash": previous_hash, "plan_changed_at": now})
+        update["$inc"] = {"plan_changes": 1}
+        logger.warning(f"Plan change detected for {key['instance']}.{key['db']} digest={key['digest']}: "
+                       f"{previous_hash[:12]} -> {new_hash[:12]}")
+
+    await plan_collection.update_one(key, update, upsert=True)
+    await history_collection.update_one(
+        {**key, "plan_hash": new_hash},
+        {
+            "$set": {"last_seen": now, "pid": document["pid"], "event_id": document.get("event_id")},
+            "$setOnInsert": {"first_seen": now, "sql_text": query_plan_document["sql_text"],
+                             "explain_result": execution_plan}
+        },
+        upsert=True
+    )
+    query_plan_document.pop("explain_result")
+    return query_plan_document, False
+
+
+@dataclass
+class ExplainJob:
+    job_id: str
+    start: datetime
+    end: datetime
+    top_n: int
+    instances: Optional[List[str]] = None
+    status: str = JOB_PENDING
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'top_n': self.top_n,
+            'instances': self.instances,
+            'total': self.total,
+            'done': self.succeeded + self.failed,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'results': self.results,
+            'error': self.error,
+            'elapsed': round((self.finished_at or time.time()) - self.created_at, 3)
+        }
+
+
+explain_jobs: Dict[str, ExplainJob] = {}
+_job_tasks: Dict[str, asyncio.Task] = {}
+
+
+def _prune_jobs() -> None:
+    expire_before = time.time() - EXPLAIN_JOB_RETENTION_SECONDS
+    for job_id in [job_id for job_id, job in explain_jobs.items()
+                   if job.finished_at and job.finished_at < expire_before]:
+        del explain_jobs[job_id]
+
+
+async def find_top_slow_queries(start: datetime, end: datetime, top_n: int,
+                                instances: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    기간 내 실행 시간이 가장 긴 슬로우 쿼리를 쿼리 패턴(digest)별 하나씩 top_n 개 조회합니다.
+    digest 가 없는 과거 문서는 각각 별개의 패턴으로 취급합니다.
+    """
+    match = {"start": {"$gte": start, "$lt": end}}
+    if instances:
+        match["instance"] = {"$in": instances}
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"time": -1}},
+        {"$group": {"_id": {"$ifNull": ["$digest", "$_id"]}, "doc": {"$first": "$$ROOT"}}},
+        {"$replaceRoot": {"newRoot": "$doc"}},
+        {"$sort": {"time": -1}},
+        {"$limit": top_n},
+        {"$project": {"_id": 0, "instance": 1, "db": 1, "pid": 1, "user": 1, "time": 1, "sql_text": 1, "digest": 1,
+                      "event_id": 1}}
+    ]
+    collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_COLLECTION)
+    return await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=top_n)
+
+
+async def _explain_one(job: ExplainJob, document: Dict[str, Any], instance_info: Optional[Dict[str, Any]]) -> None:
+    result = {'event_id': document.get('event_id'), 'pid': document['pid'], 'instance': document['instance'],
+              'db': document['db'], 'time': document['time']}
+    try:
+        if instance_info is None:
+            raise ValueError("instance_name에 해당하는 RDS 인스턴스 정보를 찾을 수 없습니다.")
+        plan, cached = await explain_and_save(document, instance_info, bounded=False)
+        result['status'] = 'ok'
+        result['cached'] = cached
+        result['regression'] = bool(plan.get('regression'))
+        job.succeeded += 1
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e) or type(e).__name__
+        job.failed += 1
+    job.results.append(result)
+
+
+async def _run_job(job: ExplainJob) -> None:
+    job.status = JOB_RUNNING
+    try:
+        documents = await find_top_slow_queries(job.start, job.end, job.top_n, job.instances)
+        job.total = len(documents)
+        instances = {item['instance_name']: item for item in await load_instances_from_mongodb()}
+        by_instance: Dict[str, List[Dict[str, Any]]] = {}
+        for document in documents:
+            by_instance.setdefault(document['instance'], []).append(document)
+
+        async def worker(pending: List[Dict[str, Any]]) -> None:
+            while pending:
+                document = pending.pop(0)
+                await _explain_one(job, document, instances.get(document['instance']))
+
+        # 인스턴스당 최대 EXPLAIN_INSTANCE_CONCURRENCY 개의 워커만 대기열에 들어가므로
+        # 일괄 작업이 대기열을 채워 화면의 단건 EXPLAIN 이 거절되지 않음
+        await asyncio.gather(*(worker(pending)
+                               for pending in by_instance.values()
+                               for _ in range(min(EXPLAIN_INSTANCE_CONCURRENCY, len(pending)))))
+        job.status = JOB_COMPLETED
+        logger.info(f"Explain job {job.job_id} finished: {job.succeeded} succeeded, {job.failed} failed")
+    except asyncio.CancelledError:
+        job.status = JOB_FAILED
+        job.error = "cancelled"
+        raise
+    except Exception as e:
+        job.status = JOB_FAILED
+        job.error = str(e)
+        logger.error(f"Explain job {job.job_id} failed: {e}")
+    finally:
+        job.finished_at = time.time()
+        _job_tasks.pop(job.job_id, None)
+
+
+def start_explain_job(start: datetime, end: datetime, top_n: int,
+                      instances: Optional[List[str]] = None) -> ExplainJob:
+    """
+    기간 내 상위 top_n 슬로우 쿼리를 모든(또는 지정한) 인스턴스에서 동시에 EXPLAIN 하는 작업을 시작합니다.
+
+    :return: 진행 상황을 조회할 작업 (job_id 로 get_explain_job 조회)
+    """
+    _prune_jobs()
+    job = ExplainJob(job_id=uuid.uuid4().hex, start=start, end=end,
+                     top_n=min(top_n, EXPLAIN_BATCH_MAX_QUERIES), instances=instances)
+    explain_jobs[job.job_id] = job
+    _job_tasks[job.job_id] = asyncio.create_task(_run_job(job))
+    return job
+
+
+def get_explain_job(job_id: str) -> Optional[ExplainJob]:
+    return explain_jobs.get(job_id)
+
+
+async def shutdown() -> None:
+    for task in list(_job_tasks.values()):
+        task.cancel()
+    await asyncio.gather(*_job_tasks.values(), return_exceptions=True)
+    await explain_executor.close()
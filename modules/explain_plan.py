@@ -0,0 +1,83 @@
+import json
+import hashlib
+from typing import Any, Dict
+
+# 실행 계획의 형태를 결정하는 항목, 비용/행 수 추정치나 리터럴이 들어가는 조건식은 제외
+STRUCTURAL_KEYS = {
+    'select_id', 'table_name', 'access_type', 'key', 'used_key_parts', 'ref',
+    'using_index', 'using_index_for_group_by', 'using_index_for_skip_scan', 'using_filesort',
+    'using_temporary_table', 'using_join_buffer', 'using_MRR', 'dependent', 'cacheable',
+    'materialized_from_subquery', 'using_where', 'distinct', 'first_match', 'loose_scan',
+}
+
+
+def plan_shape(node: Any) -> Any:
+    """
+    EXPLAIN FORMAT=JSON 결과에서 구조적인 항목만 남긴 트리를 만듭니다.
+    통계에 따라 바뀌는 비용/행 수와 조건식을 빼므로, 같은 쿼리 패턴의 실행 계획이 같으면 결과도 같습니다.
+
+    :param node: EXPLAIN JSON (또는 그 하위 노드)
+    :return: 구조 항목만 남긴 dict/list (남는 항목이 없으면 None)
+    """
+    if isinstance(node, dict):
+        shape = {}
+        for key, value in node.items():
+            if key in STRUCTURAL_KEYS:
+                shape[key] = value
+            elif isinstance(value, (dict, list)):
+                child = plan_shape(value)
+                if child:
+                    shape[key] = child
+        return shape or None
+    if isinstance(node, list):
+        shape = [child for child in (plan_shape(item) for item in node) if child]
+        return shape or None
+    return None
+
+
+def plan_hash(explain_result: Dict[str, Any]) -> str:
+    """실행 계획 형태(plan_shape)의 sha256 해시"""
+    shape = plan_shape(explain_result)
+    return hashlib.sha256(json.dumps(shape, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _table_nodes(node: Any):
+    if isinstance(node, dict):
+        if 'table_name' in node:
+            yield node
+        for value in node.values():
+            yield from _table_nodes(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _table_nodes(item)
+
+
+def _has_flag(node: Any, flag: str) -> bool:
+    if isinstance(node, dict):
+        return bool(node.get(flag)) or any(_has_flag(value, flag) for value in node.values())
+    if isinstance(node, list):
+        return any(_has_flag(item, flag) for item in node)
+    return False
+
+
+def summarize_plan(explain_result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    목록 화면용 실행 계획 요약을 만듭니다. 실행 계획 저장 시 한 번 계산해 함께 저장합니다.
+
+    :param explain_result: EXPLAIN FORMAT=JSON 결과
+    :return: 접근 방식, 풀 스캔 테이블, filesort/임시 테이블 사용 여부, 검사 행 수 추정치, 쿼리 비용
+    """
+    tables = list(_table_nodes(explain_result))
+    access_types = sorted({table.get('access_type') for table in tables if table.get('access_type')})
+    full_scans = sorted({table['table_name'] for table in tables if table.get('access_type') == 'ALL'})
+    rows_examined = sum(int(table.get('rows_examined_per_scan') or 0) for table in tables)
+    query_cost = (explain_result.get('query_block') or {}).get('cost_info', {}).get('query_cost')
+    return {
+        'table_count': len(tables),
+        'access_types': access_types,
+        'full_scans': full_scans,
+        'using_filesort': _has_flag(explain_result, 'using_filesort'),
+        'using_temporary': _has_flag(explain_result, 'using_temporary_table'),
+        'rows_examined': rows_examined,
+        'query_cost': float(query_cost) if query_cost is not None else None
+    }
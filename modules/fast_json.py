@@ -0,0 +1,104 @@
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+import orjson
+from bson import ObjectId, Decimal128
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    # orjson 이 직접 처리하지 못하는 MongoDB 타입 (datetime 은 orjson 이 RFC 3339 로 직렬화)
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return float(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return jsonable_encoder(obj)
+
+
+def dumps(content: Any) -> bytes:
+    """MongoDB 문서를 pydantic 검증/jsonable_encoder 없이 바로 JSON 바이트로 직렬화합니다."""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    신뢰할 수 있는 MongoDB 문서를 orjson 으로 직렬화하는 응답입니다.
+    response_model 검증을 거치지 않으므로 엔드포인트가 반환 형태를 직접 책임져야 합니다.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _sample_rows(count: int) -> Dict[str, List[Dict[str, Any]]]:
+    now = datetime.utcnow()
+    return {
+        "/slow_queries": [{
+            "_id": ObjectId(), "instance": "orderservice-prd-1", "pid": 100000 + i, "user": "app_user",
+            "host": "10.0.0.12:53122", "db": "orders", "time": 3 + i % 20,
+            "sql_text": "SELECT o.id, o.status, o.amount FROM orders o JOIN order_items i ON i.order_id = o.id "
+                        f"WHERE o.store_id = {i} AND o.created_at >= '2024-10-01' ORDER BY o.id DESC LIMIT 100",
+            "start": now - timedelta(seconds=i * 30), "end": now - timedelta(seconds=i * 30 - 5)
+        } for i in range(count)],
+        "/plans/": [{
+            "_id": ObjectId(), "pid": 100000 + i, "instance": "orderservice-prd-1", "db": "orders",
+            "user": "app_user", "time": 3 + i % 20,
+            "sql_text": f"SELECT * FROM orders WHERE store_id = {i} ORDER BY id DESC LIMIT 100",
+            "created_at": now - timedelta(minutes=i)
+        } for i in range(count)],
+        "/disk_usage": [{
+            "timestamp": (now - timedelta(minutes=15 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+            "name": ("Binlog_cache_use", "Created_tmp_disk_tables", "Created_tmp_files")[i % 3],
+            "total": 123456789 + i, "avgForHours": 1234.567, "avgForSeconds": 0.343
+        } for i in range(count)],
+        "/slow_query_stats": [{
+            "instance": f"orderservice-prd-{i % 8}", "db": f"db_{i % 40}", "user": f"user_{i % 15}",
+            "count": 100 + i, "max_time": 30 + i % 50, "total_time": 4000 + i, "avg_time": 12.345
+        } for i in range(count)],
+    }
+
+
+def _bench(fn, rounds: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def run_benchmark(rows: int = 1000, rounds: int = 50, models: Optional[Dict[str, Any]] = None) -> None:
+    """
+    엔드포인트별 응답 형태로 기본 경로(pydantic 검증 + jsonable_encoder + json.dumps)와 orjson 경로를 비교합니다.
+
+    :param rows: 응답 행 수
+    :param rounds: 반복 횟수
+    :param models: 엔드포인트별 response_model (있으면 기본 경로에 검증 비용 포함)
+    """
+    models = models or {}
+    print(f"{'endpoint':<20}{'default ms':>12}{'orjson ms':>12}{'speedup':>10}")
+    for endpoint, data in _sample_rows(rows).items():
+        model = models.get(endpoint)
+
+        def default_path():
+            items = [model(**row).model_dump() for row in data] if model else data
+            return json.dumps(jsonable_encoder(items), ensure_ascii=False).encode("utf-8")
+
+        default_ms = _bench(default_path, rounds)
+        fast_ms = _bench(lambda: dumps(data), rounds)
+        print(f"{endpoint:<20}{default_ms:>12.3f}{fast_ms:>12.3f}{default_ms / fast_ms:>9.1f}x")
+
+
+# 사용 예시
+# python -m modules.fast_json
+if __name__ == "__main__":
+    from apis.routes.slow_query import SlowQueryItem
+    run_benchmark(models={"/slow_queries": SlowQueryItem})
@@ -0,0 +1,256 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from modules import fast_json
+from modules.mongodb_connector import MongoDBConnector, change_streams_unsupported
+from configs.app_conf import app_settings
+
+logger = logging.getLogger(__name__)
+
+# 연결을 끊을 때 구독자 큐에 넣는 표시, 마지막으로 보낼 이벤트는 Subscriber.close_event
+_CLOSE = None
+SLOW_CONSUMER_EVENT = b"event: disconnect\ndata: slow consumer\n\n"
+UNSUPPORTED_EVENT = b"event: error\ndata: change streams are not supported by this MongoDB deployment\n\n"
+
+
+class SubscriberLimitReached(Exception):
+    """구독자 수가 LIVE_STREAM_MAX_SUBSCRIBERS 에 도달함"""
+
+
+class LiveStreamUnavailable(Exception):
+    """MongoDB 배포가 변경 스트림을 지원하지 않아(standalone 등) 실시간 전달을 할 수 없음"""
+
+
+class Subscriber:
+    def __init__(self, filters: Dict[str, Set[Any]], buffer_size: int, catching_up: bool = False):
+        self.filters = filters
+        # (event_id, SSE 바이트) 또는 _CLOSE
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.close_event = SLOW_CONSUMER_EVENT
+        # Last-Event-ID 이후 이벤트를 다시 보내는 동안 들어온 실시간 이벤트 (버퍼 상한 대신 backlog 상한 적용)
+        self.catching_up = catching_up
+        self.backlog: List[Tuple[Optional[str], bytes]] = []
+
+    def matches(self, document: Dict[str, Any]) -> bool:
+        return all(document.get(field) in values for field, values in self.filters.items())
+
+
+class ChangeStreamBroadcaster:
+    """
+    컬렉션 하나의 insert 변경 스트림을 여러 구독자에게 나눠주는 팬아웃입니다.
+    구독자 수와 무관하게 변경 스트림은 하나만 열리고, 이벤트는 한 번만 직렬화됩니다.
+    첫 구독자가 들어올 때 변경 스트림을 열고 마지막 구독자가 나가면 닫습니다.
+    구독자 버퍼가 가득 차면(느린 소비자) 다른 구독자를 막지 않도록 해당 구독자의 연결을 끊습니다.
+    재연결 catch-up 중에는 실시간 이벤트를 catchup_limit + buffer_size 까지 따로 쌓아 두고 이후에 보냅니다.
+    변경 스트림을 지원하지 않는 배포에서는 구독자에게 error 이벤트를 보내고 이후 구독을 거절합니다.
+    """
+
+    def __init__(self, collection_name: str, render: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 fields: Iterable[str], event_id_field: Optional[str] = None,
+                 buffer_size: int = app_settings.LIVE_STREAM_BUFFER_SIZE,
+                 max_subscribers: int = app_settings.LIVE_STREAM_MAX_SUBSCRIBERS,
+                 heartbeat: float = app_settings.LIVE_STREAM_HEARTBEAT,
+                 catchup_limit: int = app_settings.LIVE_STREAM_CATCHUP_LIMIT):
+        self.collection_name = collection_name
+        self.render = render
+        self.fields = list(fields)
+        self.event_id_field = event_id_field
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.catchup_limit = catchup_limit
+        # 변경 스트림 미지원 사유, 설정되면 구독을 받지 않음
+        self.unavailable: Optional[str] = None
+        self.subscribers: Set[Subscriber] = set()
+        self._watch_task: Optional[asyncio.Task] = None
+        self.stats = {'events': 0, 'delivered': 0, 'slow_disconnects': 0, 'rejected': 0, 'errors': 0,
+                      'caught_up': 0}
+
+    def check_capacity(self) -> None:
+        """
+        새 구독을 받을 수 있는지 확인합니다. 라우트가 응답 시작 전에 호출해 503 을 돌려줄 수 있도록
+        구독 등록(events 생성기 시작 시)과 분리되어 있습니다.
+        """
+        if self.unavailable:
+            raise LiveStreamUnavailable(self.unavailable)
+        if len(self.subscribers) >= self.max_subscribers:
+            self.stats['rejected'] += 1
+            raise SubscriberLimitReached(f"{self.collection_name} live stream has {self.max_subscribers} subscribers")
+
+    def subscribe(self, filters: Dict[str, Set[Any]], catching_up: bool = False) -> Subscriber:
+        self.check_capacity()
+        subscriber = Subscriber({field: values for field, values in filters.items() if values}, self.buffer_size,
+                                catching_up)
+        self.subscribers.add(subscriber)
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+        if not self.subscribers and self._watch_task:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def stop(self) -> None:
+        for subscriber in list(self.subscribers):
+            self._disconnect(subscriber)
+        self.subscribers.clear()
+        if self._watch_task:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    def _disconnect(self, subscriber: Subscriber, close_event: bytes = SLOW_CONSUMER_EVENT) -> None:
+        self.subscribers.discard(subscriber)
+        # 남은 이벤트를 버리고 종료 표시만 남김
+        subscriber.catching_up = False
+        subscriber.backlog = []
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.close_event = close_event
+        subscriber.queue.put_nowait(_CLOSE)
+
+    def _payload(self, document: Dict[str, Any]) -> Tuple[Optional[str], bytes]:
+        event_id = document.get(self.event_id_field) if self.event_id_field else None
+        return event_id, (f"id: {event_id}\n".encode() if event_id else b"") + \
+            b"event: slow_query\ndata: " + fast_json.dumps(self.render(document)) + b"\n\n"
+
+    def publish(self, document: Dict[str, Any]) -> None:
+        """변경 문서를 조건에 맞는 구독자 버퍼에 넣습니다."""
+        self.stats['events'] += 1
+        payload = None
+        for subscriber in list(self.subscribers):
+            if not subscriber.matches(document):
+                continue
+            if payload is None:
+                # 구독자 수와 무관하게 한 번만 직렬화
+                payload = self._payload(document)
+            if subscriber.catching_up:
+                if len(subscriber.backlog) < self.catchup_limit + self.buffer_size:
+                    subscriber.backlog.append(payload)
+                    self.stats['delivered'] += 1
+                else:
+                    self.stats['slow_disconnects'] += 1
+                    self._disconnect(subscriber)
+                continue
+            try:
+                subscriber.queue.put_nowait(payload)
+                self.stats['delivered'] += 1
+            except asyncio.QueueFull:
+                self.stats['slow_disconnects'] += 1
+                self._disconnect(subscriber)
+
+    async def _watch(self) -> None:
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": {"operationType": "insert"}},
+            # 전달에 필요한 필드만 변경 이벤트에 담음
+            {"$project": {"operationType": 1, **{f"fullDocument.{field}": 1 for field in self.fields}}}
+        ]
+        resume_token = None
+        while True:
+            try:
+                collection = await MongoDBConnector.get_collection(self.collection_name)
+                async with collection.watch(pipeline, resume_after=resume_token) as stream:
+                    logger.info(f"Live stream watching {self.collection_name}")
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.publish(change.get("fullDocument") or {})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                if change_streams_unsupported(e):
+                    # 재시도해도 열리지 않으므로 구독자에게 알리고 이후 구독은 503 으로 거절
+                    logger.error(f"Live stream on {self.collection_name} disabled, change streams are not supported: {e}")
+                    self.unavailable = f"Change streams are not supported: {e}"
+                    for subscriber in list(self.subscribers):
+                        self._disconnect(subscriber, UNSUPPORTED_EVENT)
+                    return
+                logger.warning(f"Live stream on {self.collection_name} stopped, retrying in 5s: {e}")
+                await asyncio.sleep(5)
+
+    async def _catch_up(self, subscriber: Subscriber, last_event_id: str) -> AsyncIterator[Tuple[str, bytes]]:
+        """
+        Last-Event-ID 이후 저장된 문서를 _id 순으로 최대 catchup_limit 개 돌려줍니다.
+        _id 는 수집기(클라이언트)가 만들므로 순서는 근사치이고, 마지막 이벤트 문서가 보관 기간으로 지워졌거나
+        catchup_limit 을 넘게 놓친 경우에는 그만큼 빠진 채로 실시간 전달을 이어갑니다.
+        """
+        collection = await MongoDBConnector.get_collection(self.collection_name)
+        anchor = await collection.find_one({self.event_id_field: last_event_id}, {"_id": 1})
+        if anchor is None:
+            logger.info(f"Live stream catch-up skipped, event {last_event_id} not found in {self.collection_name}")
+            return
+        query: Dict[str, Any] = {"_id": {"$gt": anchor["_id"]}}
+        query.update({field: {"$in": list(values)} for field, values in subscriber.filters.items()})
+        cursor = collection.find(query, {field: 1 for field in self.fields}).sort("_id", 1).limit(self.catchup_limit)
+        async for document in cursor:
+            self.stats['caught_up'] += 1
+            yield self._payload(document)
+
+    async def events(self, filters: Dict[str, Set[Any]], last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        구독을 등록하고 구독자 버퍼를 SSE 바이트로 내보냅니다. 구독은 생성기가 시작될 때(응답 전송 시작) 등록하고
+        연결이 끊기면(생성기 종료) 해제하므로, 응답이 시작되기 전에 끊긴 클라이언트는 구독자 자리를 차지하지 않습니다.
+        재연결한 클라이언트가 Last-Event-ID 를 보내면 그 이후 저장된 이벤트를 먼저 보내고,
+        그동안 쌓인 실시간 이벤트 중 이미 보낸 것은 건너뜁니다.
+
+        :param filters: 필드별 허용 값 (빈 집합은 조건 없음)
+        :param last_event_id: 클라이언트가 마지막으로 받은 이벤트 id (Last-Event-ID 헤더)
+        """
+        catching_up = bool(last_event_id and self.event_id_field)
+        try:
+            subscriber = self.subscribe(filters, catching_up)
+        except (SubscriberLimitReached, LiveStreamUnavailable) as e:
+            # 라우트의 check_capacity 이후 응답이 시작되기 전에 자리가 찬 경우
+            yield f"event: error\ndata: {e}\n\n".encode()
+            return
+        try:
+            yield f"retry: {int(self.heartbeat * 1000)}\n\n".encode()
+            sent: Set[str] = set()
+            if catching_up:
+                try:
+                    async for event_id, payload in self._catch_up(subscriber, last_event_id):
+                        if subscriber not in self.subscribers:
+                            break
+                        sent.add(event_id)
+                        yield payload
+                except Exception as e:
+                    logger.warning(f"Live stream catch-up from {last_event_id} failed: {e}")
+                # catch-up 중 쌓인 실시간 이벤트를 비울 때까지 보낸 뒤 일반 버퍼로 전환 (전환 사이에 await 없음)
+                while subscriber.catching_up:
+                    backlog, subscriber.backlog = subscriber.backlog, []
+                    if not backlog:
+                        subscriber.catching_up = False
+                        break
+                    for event_id, payload in backlog:
+                        if event_id not in sent:
+                            yield payload
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    # 프록시가 유휴 연결을 끊지 않도록 주석 전송
+                    yield b": keepalive\n\n"
+                    continue
+                if item is _CLOSE:
+                    yield subscriber.close_event
+                    return
+                event_id, payload = item
+                if event_id in sent:
+                    continue
+                yield payload
+        finally:
+            self.unsubscribe(subscriber)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'subscribers': len(self.subscribers),
+            'watching': self._watch_task is not None and not self._watch_task.done(),
+            'unavailable': self.unavailable,
+            'buffered': sum(subscriber.queue.qsize() + len(subscriber.backlog) for subscriber in self.subscribers),
+            **self.stats
+        }
@@ -42,7 +42,8 @@ async def load_instances_from_mongodb():
                     'user': instance['user'],
                     'password': instance['password'],
                     'db': instance.get('db', ''),
-                    'account': instance.get('account', '')
+                    'account': instance.get('account', ''),
+                    'cluster_name': instance.get('cluster_name')
                 }
                 cached_instances.append(processed_instance)
 
@@ -1,37 +1,79 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from configs.mongo_conf import MONGODB_URI, MONGODB_DB_NAME
+from configs.mongo_conf import MONGODB_URI, MONGODB_DB_NAME, mongo_settings
+from modules.mongodb_monitoring import PoolStatsListener, CommandStatsListener, current_route, EXPLAIN_ROUTE
+from datetime import datetime, timezone
+from typing import Dict, Any
 import logging
 import asyncio
 
 logger = logging.getLogger(__name__)
 
+# 변경 스트림을 지원하지 않는 배포(standalone 등)에서 watch 가 돌려주는 오류 코드
+CHANGE_STREAM_UNSUPPORTED_CODES = {20, 40573}
+
+
+def change_streams_unsupported(error: Exception) -> bool:
+    """watch 실패가 재시도해도 소용없는 '변경 스트림 미지원' 오류인지 확인합니다."""
+    return getattr(error, 'code', None) in CHANGE_STREAM_UNSUPPORTED_CODES or \
+        'only supported on replica sets' in str(error)
+
 
 class MongoDBConnector:
     _client = None
     _db = None
+    _collections: Dict[str, Any] = {}
+    _healthy = False
+    _last_heartbeat = None
+    _heartbeat_task = None
+    _explain_task = None
+    pool_listener = PoolStatsListener()
+    command_listener = CommandStatsListener(sample_rate=mongo_settings.MONGO_EXPLAIN_SAMPLE_RATE)
 
     @classmethod
     async def initialize(cls):
         if cls._client is None:
             await cls._connect()
+        cls._start_heartbeat()
+        if cls.command_listener.sample_rate > 0 and (cls._explain_task is None or cls._explain_task.done()):
+            cls._explain_task = asyncio.create_task(cls._explain_sampler())
 
     @classmethod
     async def get_database(cls):
-        if cls._client is None or not await cls._is_connected():
+        # 매 호출마다 ping 하지 않고, 연결 상태는 백그라운드 하트비트가 관리
+        if cls._client is None:
             await cls._connect()
         return cls._db
 
+    @classmethod
+    async def get_collection(cls, name: str):
+        if name not in cls._collections:
+            db = await cls.get_database()
+            cls._collections[name] = db[name]
+        return cls._collections[name]
+
     @classmethod
     async def reconnect(cls):
-        await cls.close()
+        cls._disconnect()
         await cls._connect()
 
     @classmethod
     async def close(cls):
+        if cls._heartbeat_task:
+            cls._heartbeat_task.cancel()
+            cls._heartbeat_task = None
+        if cls._explain_task:
+            cls._explain_task.cancel()
+            cls._explain_task = None
+        cls._disconnect()
+
+    @classmethod
+    def _disconnect(cls):
         if cls._client:
             cls._client.close()
         cls._client = None
         cls._db = None
+        cls._collections = {}
+        cls._healthy = False
 
     @classmethod
     async def _connect(cls):
@@ -42,23 +84,96 @@ class MongoDBConnector:
                 tlsAllowInvalidCertificates=True,
                 tlsAllowInvalidHostnames=True,
                 directConnection=False,
-                serverSelectionTimeoutMS=5000
+                maxPoolSize=mongo_settings.MONGODB_MAX_POOL_SIZE,
+                minPoolSize=mongo_settings.MONGODB_MIN_POOL_SIZE,
+                compressors=mongo_settings.MONGODB_COMPRESSORS,
+                serverSelectionTimeoutMS=mongo_settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                connectTimeoutMS=mongo_settings.MONGODB_CONNECT_TIMEOUT_MS,
+                socketTimeoutMS=mongo_settings.MONGODB_SOCKET_TIMEOUT_MS,
+                event_listeners=[cls.pool_listener, cls.command_listener]
             )
             cls._db = cls._client[MONGODB_DB_NAME]
+            cls._collections = {}
+            # ping 실패를 삼키지 않고 호출자에게 그대로 전달
             await cls._client.admin.command('ping')
+            cls._healthy = True
+            cls._last_heartbeat = datetime.now(timezone.utc)
             logger.info("MongoDB에 성공적으로 연결되었습니다.")
         except Exception as e:
-            cls._client = None
-            cls._db = None
             logger.error(f"MongoDB 연결에 실패했습니다: {e}")
+            cls._disconnect()
+            raise
 
     @classmethod
-    async def _is_connected(cls):
+    async def ping(cls) -> bool:
+        """admin ping 을 한 번 실행하고 캐시된 헬스 상태를 갱신합니다."""
+        if cls._client is None:
+            cls._healthy = False
+            return False
         try:
             await cls._client.admin.command('ping')
-            return True
-        except Exception:
-            return False
+            cls._healthy = True
+        except Exception as e:
+            if cls._healthy:
+                logger.error(f"MongoDB ping 실패: {e}")
+            cls._healthy = False
+        cls._last_heartbeat = datetime.now(timezone.utc)
+        return cls._healthy
+
+    @classmethod
+    def is_healthy(cls) -> bool:
+        return cls._client is not None and cls._healthy
+
+    @classmethod
+    def _start_heartbeat(cls):
+        if cls._heartbeat_task is None or cls._heartbeat_task.done():
+            cls._heartbeat_task = asyncio.create_task(cls._heartbeat())
+
+    @classmethod
+    async def _heartbeat(cls):
+        # 헬스 상태만 기록하고 재연결은 드라이버에 맡김
+        # 공유 클라이언트를 닫으면 캐시된 컬렉션 핸들이 InvalidOperation 으로 깨지므로 교체하지 않음
+        while True:
+            await asyncio.sleep(mongo_settings.MONGODB_HEARTBEAT_INTERVAL)
+            try:
+                if cls._client is None:
+                    await cls._connect()
+                elif not await cls.ping():
+                    logger.warning("MongoDB heartbeat failed, waiting for the driver to reconnect")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in MongoDB heartbeat: {e}")
+
+    @classmethod
+    async def _explain_sampler(cls):
+        """명령 리스너가 샘플링한 읽기 명령을 executionStats 로 explain 합니다."""
+        current_route.set(EXPLAIN_ROUTE)
+        while True:
+            await asyncio.sleep(mongo_settings.MONGO_EXPLAIN_INTERVAL)
+            for key, database_name, command in cls.command_listener.pop_explain_jobs():
+                if cls._client is None:
+                    break
+                try:
+                    explain = await cls._client[database_name].command(
+                        {'explain': command, 'verbosity': 'executionStats'})
+                    cls.command_listener.record_explain(key, explain)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.debug(f"Failed to explain sampled {key[1]} on {key[2]}: {e}")
+
+    @classmethod
+    def get_pool_stats(cls) -> Dict[str, Any]:
+        return {
+            'healthy': cls.is_healthy(),
+            'last_heartbeat': cls._last_heartbeat.isoformat() if cls._last_heartbeat else None,
+            'max_pool_size': mongo_settings.MONGODB_MAX_POOL_SIZE,
+            'min_pool_size': mongo_settings.MONGODB_MIN_POOL_SIZE,
+            'compressors': mongo_settings.MONGODB_COMPRESSORS,
+            'cached_collections': sorted(cls._collections),
+            'servers': cls.pool_listener.snapshot()
+        }
 
 
 # 사용 예시
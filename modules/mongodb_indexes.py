@@ -0,0 +1,229 @@
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from typing import Dict, List, Any
+from configs.mongo_conf import mongo_settings
+from configs.retention_conf import RETENTION_POLICIES
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_NOT_FOUND = 27
+
+# 카탈로그에서 빠져 더 이상 쓰지 않는 인덱스, ensure_indexes 가 있으면 삭제
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    # sql_text_text: 토큰 단위로만 일치해 부분 문자열 검색에 맞지 않던 텍스트 인덱스 (sql_prefixes_start_desc 로 대체)
+    # instance_pid_start_unique: start 가 정확히 같아야만 중복으로 판정 (instance_pid_digest_slots_unique 로 대체)
+    mongo_settings.MONGO_SLOW_LOG_COLLECTION: ["sql_text_text", "instance_pid_start_unique"],
+}
+
+
+def _time_index(collection_name: str, name: str) -> IndexModel:
+    """
+    보관 기간 기준 시간 필드 인덱스. 아카이브를 끈 경우에만 TTL 인덱스를 만들고,
+    아카이브를 켜면 일반 인덱스를 만들어 아카이버가 아카이브된 월만 삭제하게 합니다.
+    설정에 따라 반대쪽 이름의 인덱스(같은 키)는 RETIRED_INDEXES 에 넣어 삭제합니다.
+    """
+    policy = RETENTION_POLICIES[collection_name]
+    if policy['ttl'] and policy['days'] > 0:
+        RETIRED_INDEXES.setdefault(collection_name, []).append(name)
+        return IndexModel([(policy['field'], ASCENDING)], name=f"{name}_ttl",
+                          expireAfterSeconds=policy['days'] * 86400)
+    RETIRED_INDEXES.setdefault(collection_name, []).append(f"{name}_ttl")
+    return IndexModel([(policy['field'], ASCENDING)], name=name)
+
+
+# 컬렉션별 인덱스 카탈로그 (코드가 기대하는 인덱스의 단일 정의)
+INDEX_CATALOG: Dict[str, List[IndexModel]] = {
+    mongo_settings.MONGO_GET_SLOW_MYSQL_INSTANCE_COLLECTION: [
+        IndexModel([("instance_name", ASCENDING)], name="instance_name_unique", unique=True),
+    ],
+    mongo_settings.MONGO_SLOW_LOG_COLLECTION: [
+        # 슬로우 쿼리 이벤트 식별자, 중복 수집기가 같은 이벤트를 두 번 기록하지 않도록 보장
+        # start_slots 는 start 가 1초 이내로 다른 추정치끼리 겹치는 두 칸 (sql_utils.event_start_slots)
+        IndexModel([("instance", ASCENDING), ("pid", ASCENDING), ("digest", ASCENDING), ("start_slots", ASCENDING)],
+                   name="instance_pid_digest_slots_unique", unique=True,
+                   partialFilterExpression={"start_slots": {"$exists": True}}),
+        # /slow_queries 정렬 및 통계 기간 조회 (아카이브를 끈 경우 보관 기간 TTL 겸용)
+        _time_index(mongo_settings.MONGO_SLOW_LOG_COLLECTION, "start"),
+        # /slow_queries keyset 페이지네이션 (start, _id) 정렬
+        IndexModel([("start", DESCENDING), ("_id", DESCENDING)], name="start_id_desc"),
+        # /slow_queries 인스턴스 필터 + keyset 정렬
+        IndexModel([("instance", ASCENDING), ("start", DESCENDING), ("_id", DESCENDING)],
+                   name="instance_start_id_desc"),
+        # /explain 의 pid 조회
+        IndexModel([("pid", ASCENDING)], name="pid"),
+        # /explain, /download 의 이벤트 ID 조회 (event_id 가 없는 과거 문서는 제외)
+        IndexModel([("event_id", ASCENDING)], name="event_id_unique", unique=True,
+                   partialFilterExpression={"event_id": {"$exists": True}}),
+        # 테이블/쿼리 패턴 검색 (최신순)
+        IndexModel([("tables", ASCENDING), ("start", DESCENDING)], name="tables_start_desc"),
+        IndexModel([("digest", ASCENDING), ("start", DESCENDING)], name="digest_start_desc"),
+        # sql_text 부분 문자열 검색 후보 (식별자 접두어 multikey + 최신순)
+        IndexModel([("sql_prefixes", ASCENDING), ("start", DESCENDING)], name="sql_prefixes_start_desc"),
+        # 접두어가 상한에 걸려 잘린 문서 (검색 시 접두어 대신 정규식으로 확인하는 소수의 문서)
+        IndexModel([("start", DESCENDING)], name="sql_prefixes_truncated_start_desc",
+                   partialFilterExpression={"sql_prefixes_truncated": True}),
+    ],
+    mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION: [
+        IndexModel([("pid", ASCENDING)], name="pid"),
+        IndexModel([("event_id", ASCENDING)], name="event_id"),
+        _time_index(mongo_settings.MONGO_SLOW_LOG_PLAN_COLLECTION, "created_at"),
+        # 쿼리 패턴별 실행 계획 캐시 키 (digest 가 없는 과거 pid 단위 문서는 제외)
+        IndexModel([("instance", ASCENDING), ("db", ASCENDING), ("digest", ASCENDING)],
+                   name="instance_db_digest_unique", unique=True,
+                   partialFilterExpression={"digest": {"$exists": True}}),
+        # /plans/ 인스턴스/DB 필터 + keyset(_id) 페이지네이션
+        IndexModel([("instance", ASCENDING), ("db", ASCENDING), ("_id", DESCENDING)], name="instance_db_id_desc"),
+        # 실행 계획 변경 목록
+        IndexModel([("regression", ASCENDING), ("plan_changed_at", DESCENDING)], name="regression_changed_desc"),
+    ],
+    mongo_settings.MONGO_SLOW_LOG_PLAN_HISTORY_COLLECTION: [
+        IndexModel([("instance", ASCENDING), ("db", ASCENDING), ("digest", ASCENDING), ("plan_hash", ASCENDING)],
+                   name="instance_db_digest_plan_hash_unique", unique=True),
+        _time_index(mongo_settings.MONGO_SLOW_LOG_PLAN_HISTORY_COLLECTION, "last_seen"),
+    ],
+    mongo_settings.MONGO_COM_STATUS_COLLECTION: [
+        IndexModel([("instance_name", ASCENDING), ("timestamp", DESCENDING)], name="instance_name_timestamp_desc"),
+        _time_index(mongo_settings.MONGO_COM_STATUS_COLLECTION, "timestamp"),
+    ],
+    mongo_settings.MONGO_DISK_USAGE_COLLECTION: [
+        IndexModel([("instance_name", ASCENDING), ("timestamp", ASCENDING)], name="instance_name_timestamp"),
+        _time_index(mongo_settings.MONGO_DISK_USAGE_COLLECTION, "timestamp"),
+    ],
+    mongo_settings.MONGO_RDS_INSTANCE_ALL_STAT_COLLECTION: [
+        IndexModel([("timestamp", ASCENDING)], name="timestamp"),
+    ],
+    mongo_settings.MONGO_SAVE_PROME_COLLECTION: [
+        IndexModel([("date", ASCENDING)], name="date"),
+    ],
+    mongo_settings.MONGO_SLOW_LOG_ROLLUP_COLLECTION: [
+        # /slow_query_stats 기간 조회
+        IndexModel([("hour", ASCENDING)], name="hour"),
+    ],
+}
+
+
+# 드리프트 리포트에서 비교할 인덱스 옵션
+COMPARED_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds')
+
+
+def _key_of(spec) -> List[List[Any]]:
+    return [[field, direction] for field, direction in spec.items()]
+
+
+def _existing_key_of(info: Dict[str, Any]) -> List[List[Any]]:
+    # 텍스트 인덱스는 서버에서 _fts/_ftsx 키로 저장되므로 weights 로 카탈로그 형태를 복원
+    if any(field == '_fts' for field, _ in info['key']):
+        return [[field, 'text'] for field in info.get('weights', {})]
+    return [[field, direction] for field, direction in info['key']]
+
+
+def _options_of(spec: Dict[str, Any]) -> Dict[str, Any]:
+    return {option: spec[option] for option in COMPARED_OPTIONS if spec.get(option)}
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """
+    카탈로그의 인덱스를 생성합니다. 이미 같은 인덱스가 있으면 아무 작업도 하지 않으므로 반복 실행해도 안전합니다.
+
+    :param db: Motor 데이터베이스
+    :return: 컬렉션별 생성(또는 확인)된 인덱스 이름 목록
+    """
+    # 같은 키를 다른 이름/옵션으로 만들 수 있도록 더 이상 쓰지 않는 인덱스를 먼저 삭제
+    for collection_name, names in RETIRED_INDEXES.items():
+        for name in names:
+            try:
+                await db[collection_name].drop_index(name)
+                logger.info(f"Dropped retired index {collection_name}.{name}")
+            except OperationFailure as e:
+                if e.code != INDEX_NOT_FOUND:
+                    logger.warning(f"Could not drop retired index {collection_name}.{name}: {e}")
+            except Exception as e:
+                logger.error(f"Error dropping retired index {collection_name}.{name}: {e}")
+    applied = {}
+    for collection_name, models in INDEX_CATALOG.items():
+        collection = db[collection_name]
+        applied[collection_name] = []
+        for model in models:
+            name = model.document['name']
+            try:
+                await collection.create_indexes([model])
+                applied[collection_name].append(name)
+            except OperationFailure as e:
+                if e.code == INDEX_OPTIONS_CONFLICT and 'expireAfterSeconds' in model.document:
+                    # 보관 기간이 바뀐 TTL 인덱스는 재생성 없이 collMod 로 갱신
+                    try:
+                        await db.command('collMod', collection_name, index={
+                            'keyPattern': model.document['key'],
+                            'expireAfterSeconds': model.document['expireAfterSeconds']
+                        })
+                        applied[collection_name].append(name)
+                        logger.info(f"Updated TTL of {collection_name}.{name} to {model.document['expireAfterSeconds']}s")
+                    except Exception as mod_err:
+                        logger.warning(f"Could not update TTL of {collection_name}.{name}: {mod_err}")
+                    continue
+                # 같은 키의 인덱스가 다른 이름/옵션으로 이미 있는 경우 등
+                logger.warning(f"Could not create index {collection_name}.{name}: {e}")
+            except Exception as e:
+                logger.error(f"Error creating index {collection_name}.{name}: {e}")
+    logger.info(f"Ensured MongoDB indexes: {applied}")
+    return applied
+
+
+async def get_index_drift_report(db) -> Dict[str, Dict[str, Any]]:
+    """
+    카탈로그와 실제 인덱스를 비교하고 $indexStats 로 사용되지 않는 인덱스를 찾습니다.
+
+    :param db: Motor 데이터베이스
+    :return: 컬렉션별 missing / mismatched / unmanaged / unused 인덱스 목록
+    """
+    report = {}
+    for collection_name, models in INDEX_CATALOG.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        stats = await collection.aggregate([{"$indexStats": {}}]).to_list(length=None)
+
+        existing_keys = {name: _existing_key_of(info) for name, info in existing.items()}
+        catalog_keys = {model.document['name']: _key_of(model.document['key']) for model in models}
+
+        missing = [
+            {'name': name, 'key': key}
+            for name, key in catalog_keys.items()
+            if key not in existing_keys.values()
+        ]
+        # 키는 같지만 unique/TTL 등 옵션이 카탈로그와 다른 인덱스
+        mismatched = [
+            {
+                'name': existing_name,
+                'key': key,
+                'expected': _options_of(model.document),
+                'actual': _options_of(existing[existing_name])
+            }
+            for model in models
+            for existing_name, key in existing_keys.items()
+            if key == _key_of(model.document['key'])
+            and _options_of(model.document) != _options_of(existing[existing_name])
+        ]
+        unmanaged = [
+            {'name': name, 'key': key}
+            for name, key in existing_keys.items()
+            if name != '_id_' and key not in catalog_keys.values()
+        ]
+        unused = [
+            {
+                'name': stat['name'],
+                'key': _key_of(stat['key']),
+                'since': stat.get('accesses', {}).get('since')
+            }
+            for stat in stats
+            if stat['name'] != '_id_' and stat.get('accesses', {}).get('ops', 0) == 0
+        ]
+        report[collection_name] = {
+            'missing': missing,
+            'mismatched': mismatched,
+            'unmanaged': unmanaged,
+            'unused': unused,
+            'usage': {stat['name']: stat.get('accesses', {}).get('ops', 0) for stat in stats}
+        }
+    return report
@@ -0,0 +1,271 @@
+import time
+import random
+import threading
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+from pymongo import monitoring
+
+# 명령을 발생시킨 FastAPI 라우트 ("GET /api/v1/slow_query_stats"), 요청 밖에서는 background
+current_route: ContextVar[str] = ContextVar("mongo_current_route", default="background")
+EXPLAIN_ROUTE = "explain-sampler"
+
+# 집계에서 제외할 드라이버/세션 관리 명령
+IGNORED_COMMANDS = {'ping', 'hello', 'ismaster', 'isMaster', 'endSessions', 'saslStart', 'saslContinue',
+                    'buildInfo', 'killCursors', 'explain'}
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct'}
+# explain 으로 감쌀 때 제거해야 하는 명령 필드
+NON_EXPLAIN_FIELDS = {'lsid', 'txnNumber', '$db', '$clusterTime', '$readPreference', 'readConcern',
+                      'writeConcern', 'apiVersion', 'apiStrict', 'apiDeprecationErrors'}
+MAX_TRACKED_CURSORS = 10000
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    pymongo 커넥션 풀 이벤트를 서버 주소별로 집계합니다.
+    이벤트는 드라이버의 여러 스레드에서 호출되므로 락으로 보호합니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _server(self, address) -> Dict[str, Any]:
+        key = f"{address[0]}:{address[1]}"
+        if key not in self._stats:
+            self._stats[key] = {
+                'open_connections': 0,
+                'checked_out': 0,
+                'created_total': 0,
+                'closed_total': 0,
+                'checkout_failed_total': 0,
+                'pool_cleared_total': 0,
+                'checkout_wait_max_ms': 0.0,
+                'checkout_wait_total_ms': 0.0,
+                'checkouts_total': 0
+            }
+        return self._stats[key]
+
+    def pool_created(self, event):
+        with self._lock:
+            self._server(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._server(event.address)['pool_cleared_total'] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            stats = self._server(event.address)
+            stats['open_connections'] += 1
+            stats['created_total'] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            stats = self._server(event.address)
+            stats['open_connections'] = max(stats['open_connections'] - 1, 0)
+            stats['closed_total'] += 1
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.monotonic()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._server(event.address)['checkout_failed_total'] += 1
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, 'checkout_started', None)
+        wait_ms = (time.monotonic() - started) * 1000 if started else 0.0
+        with self._lock:
+            stats = self._server(event.address)
+            stats['checked_out'] += 1
+            stats['checkouts_total'] += 1
+            stats['checkout_wait_total_ms'] += wait_ms
+            stats['checkout_wait_max_ms'] = max(stats['checkout_wait_max_ms'], wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            stats = self._server(event.address)
+            stats['checked_out'] = max(stats['checked_out'] - 1, 0)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for server, stats in self._stats.items():
+                server_stats = dict(stats)
+                server_stats['checkout_wait_avg_ms'] = round(
+                    stats['checkout_wait_total_ms'] / stats['checkouts_total'], 3) if stats['checkouts_total'] else 0
+                server_stats['checkout_wait_total_ms'] = round(stats['checkout_wait_total_ms'], 3)
+                server_stats['checkout_wait_max_ms'] = round(stats['checkout_wait_max_ms'], 3)
+                result[server] = server_stats
+            return result
+
+
+def _explain_summary(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """explain(executionStats) 결과에서 검사 문서/키 수와 승리 플랜 단계를 추출합니다."""
+    summary = {'docs_examined': 0, 'keys_examined': 0, 'returned': 0, 'stages': []}
+
+    def walk(node):
+        if isinstance(node, dict):
+            if 'totalDocsExamined' in node:
+                summary['docs_examined'] += node.get('totalDocsExamined', 0)
+                summary['keys_examined'] += node.get('totalKeysExamined', 0)
+                summary['returned'] += node.get('nReturned', 0)
+            stage = node.get('stage')
+            if isinstance(stage, str):
+                summary['stages'].append(f"{stage}({node['indexName']})" if 'indexName' in node else stage)
+            for key, value in node.items():
+                # 거부된 플랜과 실행 통계의 단계 트리는 승리 플랜과 중복되므로 제외
+                if key not in ('rejectedPlans', 'executionStages', 'allPlansExecution'):
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return summary
+
+
+class CommandStatsListener(monitoring.CommandListener):
+    """
+    MongoDB 명령을 (라우트, 명령, 컬렉션) 단위로 집계합니다.
+    getMore 는 커서를 연 find/aggregate 에 합산하고, 일부 읽기 명령은 explain 대기열에 넣어
+    백그라운드 샘플러가 docsExamined/keysExamined 를 측정하도록 합니다.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, max_pending_explains: int = 100):
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, int], Tuple[Tuple[str, str, str], Any]] = {}
+        self._cursors: OrderedDict = OrderedDict()
+        self._stats: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._explain_queue: deque = deque(maxlen=max_pending_explains)
+
+    def _entry(self, key: Tuple[str, str, str]) -> Dict[str, Any]:
+        if key not in self._stats:
+            self._stats[key] = {
+                'count': 0, 'failures': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'docs_returned': 0,
+                'explain_samples': 0, 'docs_examined': 0, 'keys_examined': 0, 'explain_returned': 0,
+                'collscan_samples': 0, 'last_plan': None
+            }
+        return self._stats[key]
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        command = event.command
+        getmore_id = command.get('getMore') if event.command_name == 'getMore' else None
+        if getmore_id is not None:
+            with self._lock:
+                key = self._cursors.get(getmore_id)
+            if key is None:
+                key = (current_route.get(), 'getMore', str(command.get('collection', '')))
+        else:
+            target = command.get(event.command_name)
+            key = (current_route.get(), event.command_name, target if isinstance(target, str) else '')
+
+        explain_command = None
+        if (event.command_name in EXPLAINABLE_COMMANDS and self.sample_rate > 0
+                and key[0] != EXPLAIN_ROUTE and random.random() < self.sample_rate):
+            explain_command = self._explainable(event.command_name, command)
+
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (key, getmore_id)
+            if explain_command is not None:
+                self._explain_queue.append((key, event.database_name, explain_command))
+
+    @staticmethod
+    def _explainable(command_name: str, command: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # 쓰기 단계가 있는 파이프라인은 explain 하지 않음
+        if command_name == 'aggregate' and any(
+                '$merge' in stage or '$out' in stage for stage in command.get('pipeline', [])):
+            return None
+        return {field: value for field, value in command.items() if field not in NON_EXPLAIN_FIELDS}
+
+    def succeeded(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+            if pending is None:
+                return
+            key, getmore_id = pending
+            reply = event.reply
+            docs = 0
+            cursor = reply.get('cursor')
+            if isinstance(cursor, dict):
+                docs = len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+                cursor_id = cursor.get('id', 0)
+                if cursor_id:
+                    self._cursors[cursor_id] = key
+                    if len(self._cursors) > MAX_TRACKED_CURSORS:
+                        self._cursors.popitem(last=False)
+                elif getmore_id is not None:
+                    self._cursors.pop(getmore_id, None)
+            elif event.command_name == 'count':
+                docs = reply.get('n', 0)
+
+            duration_ms = event.duration_micros / 1000
+            stats = self._entry(key)
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['docs_returned'] += docs
+
+    def failed(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+            if pending is None:
+                return
+            stats = self._entry(pending[0])
+            stats['count'] += 1
+            stats['failures'] += 1
+            stats['total_ms'] += event.duration_micros / 1000
+
+    def pop_explain_jobs(self, limit: int = 10) -> List[Tuple[Tuple[str, str, str], str, Dict[str, Any]]]:
+        with self._lock:
+            jobs = []
+            while self._explain_queue and len(jobs) < limit:
+                jobs.append(self._explain_queue.popleft())
+            return jobs
+
+    def record_explain(self, key: Tuple[str, str, str], explain: Dict[str, Any]) -> None:
+        summary = _explain_summary(explain)
+        with self._lock:
+            stats = self._entry(key)
+            stats['explain_samples'] += 1
+            stats['docs_examined'] += summary['docs_examined']
+            stats['keys_examined'] += summary['keys_examined']
+            stats['explain_returned'] += summary['returned']
+            if any(stage.startswith('COLLSCAN') for stage in summary['stages']):
+                stats['collscan_samples'] += 1
+            stats['last_plan'] = ' <- '.join(summary['stages'])
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+            self._explain_queue.clear()
+
+    def snapshot(self, sort_by: str = 'total_ms', limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = []
+            for (route, command_name, collection), stats in self._stats.items():
+                row = {'route': route, 'command': command_name, 'collection': collection}
+                row.update(stats)
+                row['total_ms'] = round(stats['total_ms'], 3)
+                row['max_ms'] = round(stats['max_ms'], 3)
+                row['avg_ms'] = round(stats['total_ms'] / stats['count'], 3) if stats['count'] else 0
+                # 반환 문서 1건당 검사한 문서 수, 클수록 인덱스가 조건을 거르지 못함
+                row['docs_examined_per_returned'] = round(
+                    stats['docs_examined'] / max(stats['explain_returned'], 1), 2) if stats['explain_samples'] else None
+                rows.append(row)
+        rows.sort(key=lambda row: row.get(sort_by) or 0, reverse=True)
+        return rows[:limit] if limit else rows
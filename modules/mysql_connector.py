@@ -1,8 +1,20 @@
+import time
+import asyncio
 import asyncmy
 import asyncmy.cursors
 from asyncmy import create_pool
-from typing import Dict, Any, List, Tuple
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
 from modules.crypto_utils import decrypt_password
+from modules.metrics import TimingStats
+from configs.mysql_conf import (
+    MYSQL_CONNECTION_TIMEOUT,
+    MYSQL_SAMPLER_POOL_SIZE, MYSQL_BATCH_POOL_SIZE,
+    MYSQL_SAMPLER_ACQUIRE_TIMEOUT, MYSQL_BATCH_ACQUIRE_TIMEOUT,
+    MYSQL_SESSION_MAX_EXECUTION_TIME, MYSQL_SESSION_LOCK_WAIT_TIMEOUT,
+    MYSQL_SESSION_READ_ONLY, MYSQL_SESSION_ISOLATION, MYSQL_SESSION_SQL_MODE,
+    MYSQL_QUERY_TIMEOUT, MYSQL_STREAM_BATCH_SIZE
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,58 +22,323 @@ logger = logging.getLogger(__name__)
 # 기본 설정값
 DEFAULT_POOL_SIZE = 1
 
+# 워크로드 구분
+WORKLOAD_SAMPLER = 'sampler'
+WORKLOAD_BATCH = 'batch'
+
+DEFAULT_POOL_SIZES = {
+    WORKLOAD_SAMPLER: MYSQL_SAMPLER_POOL_SIZE,
+    WORKLOAD_BATCH: MYSQL_BATCH_POOL_SIZE
+}
+ACQUIRE_TIMEOUTS = {
+    WORKLOAD_SAMPLER: MYSQL_SAMPLER_ACQUIRE_TIMEOUT,
+    WORKLOAD_BATCH: MYSQL_BATCH_ACQUIRE_TIMEOUT
+}
+
+
+def build_session_init_command(max_execution_time: int = MYSQL_SESSION_MAX_EXECUTION_TIME) -> str:
+    """
+    모니터링 커넥션에 적용할 세션 가드레일 SET 문을 생성합니다.
+
+    :param max_execution_time: 세션 max_execution_time (밀리초, 0이면 미적용)
+    :return: 커넥션 생성 시 실행할 SET SESSION 문 (적용할 항목이 없으면 None)
+    """
+    assignments = []
+    if max_execution_time > 0:
+        assignments.append(f"max_execution_time = {max_execution_time}")
+    if MYSQL_SESSION_LOCK_WAIT_TIMEOUT > 0:
+        assignments.append(f"lock_wait_timeout = {MYSQL_SESSION_LOCK_WAIT_TIMEOUT}")
+    if MYSQL_SESSION_READ_ONLY:
+        assignments.append("transaction_read_only = ON")
+    if MYSQL_SESSION_ISOLATION:
+        assignments.append(f"transaction_isolation = '{MYSQL_SESSION_ISOLATION}'")
+    if MYSQL_SESSION_SQL_MODE:
+        assignments.append(f"sql_mode = '{MYSQL_SESSION_SQL_MODE}'")
+    return f"SET SESSION {', '.join(assignments)}" if assignments else None
+
+
+SESSION_INIT_COMMAND = build_session_init_command()
+
+
 class MySQLConnector:
     def __init__(self, collector_name: str):
         self.collector_name = collector_name
-        self.pool: Any = None
+        self.pools: Dict[str, Any] = {}
+        self.pool_wait_stats: Dict[str, TimingStats] = {}
+        self.pool_acquire_timeouts: Dict[str, int] = {}
+        # 워크로드별 접속 정보, 타임아웃된 문장을 풀 밖의 커넥션으로 KILL QUERY 할 때 사용
+        self.connect_params: Dict[str, Dict[str, Any]] = {}
         self.instance_name: str = None
 
-    async def create_pool(self, instance_info: Dict[str, Any], pool_size: int = DEFAULT_POOL_SIZE) -> None:
+    @property
+    def pool(self) -> Any:
+        return self.pools.get(WORKLOAD_BATCH) or next(iter(self.pools.values()), None)
+
+    async def create_pool(self, instance_info: Dict[str, Any], pool_size: int = DEFAULT_POOL_SIZE,
+                          workload: str = WORKLOAD_BATCH, init_command: str = None) -> None:
         """Create a connection pool for a MySQL instance."""
         try:
             decrypted_password = decrypt_password(instance_info['password'])
-            self.pool = await create_pool(
-                host=instance_info['host'],
-                port=instance_info['port'],
-                user=instance_info['user'],
-                password=decrypted_password,
-                db=instance_info['db'],
-                maxsize=pool_size
+            connect_params = {
+                'host': instance_info['host'],
+                'port': instance_info['port'],
+                'user': instance_info['user'],
+                'password': decrypted_password,
+                'db': instance_info['db'],
+                'connect_timeout': MYSQL_CONNECTION_TIMEOUT
+            }
+            self.pools[workload] = await create_pool(
+                maxsize=pool_size,
+                init_command=init_command or SESSION_INIT_COMMAND,
+                **connect_params
             )
+            self.connect_params[workload] = connect_params
+            self.pool_wait_stats.setdefault(workload, TimingStats())
+            self.pool_acquire_timeouts.setdefault(workload, 0)
             self.instance_name = instance_info['instance_name']
-            logger.info(f"Created MySQL connection pool for {self.collector_name} - {self.instance_name} with max size {pool_size}")
+            logger.info(f"Created MySQL {workload} connection pool for {self.collector_name} - {self.instance_name} with max size {pool_size}")
         except Exception as e:
-            logger.error(f"Error creating MySQL connection pool for {self.collector_name} - {instance_info['instance_name']}: {str(e)}")
+            logger.error(f"Error creating MySQL {workload} connection pool for {self.collector_name} - {instance_info['instance_name']}: {str(e)}")
             raise
 
-    async def execute_query(self, query: str, params: Tuple = None) -> List[Dict[str, Any]]:
-        """Execute a query on the MySQL instance."""
-        if not self.pool:
+    async def create_pools(self, instance_info: Dict[str, Any], pool_sizes: Dict[str, int] = None) -> None:
+        """Create one connection pool per workload so sampling never waits behind batch queries."""
+        for workload, pool_size in (pool_sizes or DEFAULT_POOL_SIZES).items():
+            await self.create_pool(instance_info, pool_size=pool_size, workload=workload)
+
+    def _get_pool(self, workload: str) -> Any:
+        pool = self.pools.get(workload) or self.pool
+        if not pool:
             raise ValueError(f"No connection pool found for {self.collector_name}")
+        return pool
+
+    @asynccontextmanager
+    async def _acquire(self, workload: str):
+        """워크로드 풀에서 커넥션을 획득하며 대기 시간을 기록하고 타임아웃을 적용합니다."""
+        pool = self._get_pool(workload)
+        acquire_ctx = pool.acquire()
+        started = time.monotonic()
+        try:
+            conn = await asyncio.wait_for(acquire_ctx.__aenter__(), ACQUIRE_TIMEOUTS.get(workload, MYSQL_BATCH_ACQUIRE_TIMEOUT))
+        except asyncio.TimeoutError:
+            self.pool_acquire_timeouts[workload] = self.pool_acquire_timeouts.get(workload, 0) + 1
+            logger.warning(f"Timed out acquiring {workload} connection for {self.collector_name} - {self.instance_name}")
+            raise
+        finally:
+            self.pool_wait_stats.setdefault(workload, TimingStats()).observe(time.monotonic() - started)
+
+        try:
+            yield conn
+        finally:
+            await acquire_ctx.__aexit__(None, None, None)
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return pool wait time metrics per workload."""
+        return {
+            workload: {
+                'pool_wait': stats.to_dict(),
+                'acquire_timeouts': self.pool_acquire_timeouts.get(workload, 0)
+            }
+            for workload, stats in self.pool_wait_stats.items()
+        }
+
+    @staticmethod
+    async def _run_with_deadline(conn: Any, coroutine, timeout: float = MYSQL_QUERY_TIMEOUT) -> Any:
+        """
+        쿼리 코루틴에 asyncio 데드라인을 적용합니다.
+        타임아웃 시 응답을 읽다 만 커넥션은 재사용할 수 없으므로 닫아서 풀이 폐기하도록 합니다.
+        """
+        try:
+            return await asyncio.wait_for(coroutine, timeout)
+        except asyncio.TimeoutError:
+            conn.close()
+            raise
+
+    @staticmethod
+    async def _fetch_all(conn: Any, query: str, params: Tuple = None, cursor_class: Any = asyncmy.cursors.DictCursor) -> List[Any]:
+        async with conn.cursor(cursor_class) as cursor:
+            if params:
+                await cursor.execute(query, params)
+            else:
+                await cursor.execute(query)
+            return await cursor.fetchall()
+
+    async def execute_query(self, query: str, params: Tuple = None, workload: str = WORKLOAD_BATCH,
+                            timeout: float = MYSQL_QUERY_TIMEOUT) -> List[Dict[str, Any]]:
+        """Execute a query on the MySQL instance."""
+        try:
+            async with self._acquire(workload) as conn:
+                return await self._run_with_deadline(conn, self._fetch_all(conn, query, params), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Query timed out after {timeout}s for {self.collector_name} - {self.instance_name}")
+            logger.error(f"Query: {query}")
+            raise
+        except Exception as e:
+            logger.error(f"Error executing query for {self.collector_name} - {self.instance_name}: {str(e)}")
+            logger.error(f"Query: {query}")
+            logger.error(f"Params: {params}")
+            raise
+
+    async def execute_query_in_database(self, database: str, query: str, params: Tuple = None,
+                                        workload: str = WORKLOAD_BATCH,
+                                        timeout: float = MYSQL_QUERY_TIMEOUT,
+                                        kill_on_timeout: bool = False) -> List[Dict[str, Any]]:
+        """
+        풀 커넥션의 기본 데이터베이스를 바꾼 뒤 쿼리를 실행합니다.
+        인스턴스 하나의 풀을 여러 데이터베이스 쿼리(EXPLAIN 등)에 재사용할 때 사용합니다.
+
+        :param database: 쿼리를 실행할 데이터베이스
+        :param kill_on_timeout: 데드라인 초과 시 서버에서 실행 중인 문장을 KILL QUERY 로 중단
+        """
+        try:
+            async with self._acquire(workload) as conn:
+                thread_id = self._thread_id(conn)
+                try:
+                    if database:
+                        await self._run_with_deadline(conn, conn.select_db(database), timeout)
+                    return await self._run_with_deadline(conn, self._fetch_all(conn, query, params), timeout)
+                except asyncio.TimeoutError:
+                    if kill_on_timeout:
+                        await self.kill_query(thread_id, query, workload)
+                    raise
+        except asyncio.TimeoutError:
+            logger.error(f"Query timed out after {timeout}s for {self.collector_name} - {self.instance_name}")
+            logger.error(f"Query: {query}")
+            raise
+        except Exception as e:
+            logger.error(f"Error executing query for {self.collector_name} - {self.instance_name}: {str(e)}")
+            logger.error(f"Query: {query}")
+            raise
 
+    @staticmethod
+    def _thread_id(conn: Any) -> Optional[int]:
+        # asyncmy 는 핸드셰이크의 connection id 를 (id,) 튜플로 보관
+        thread_id = getattr(conn, 'server_thread_id', None)
+        if isinstance(thread_id, tuple):
+            thread_id = thread_id[0] if thread_id else None
+        return thread_id
+
+    async def kill_query(self, thread_id: Optional[int], query: str, workload: str = WORKLOAD_BATCH) -> bool:
+        """
+        다른 커넥션에서 KILL QUERY 를 실행해 서버에서 계속 실행 중인 문장을 중단합니다.
+        _run_with_deadline 은 클라이언트 커넥션만 닫으므로 서버 스레드는 문장이 끝날 때까지 남습니다.
+        풀 커넥션이 모두 사용 중일 수 있으므로 풀을 거치지 않고 새 커넥션을 열고,
+        reader 엔드포인트처럼 다른 서버로 연결될 수 있으므로 PROCESSLIST 의 INFO 가 같은 문장일 때만 KILL 합니다.
+
+        :param thread_id: 타임아웃된 커넥션의 connection id
+        :param query: 타임아웃된 문장
+        :return: KILL QUERY 를 실행했으면 True
+        """
+        connect_params = self.connect_params.get(workload)
+        if thread_id is None or not connect_params:
+            return False
         try:
-            async with self.pool.acquire() as conn:
-                async with conn.cursor(asyncmy.cursors.DictCursor) as cursor:
-                    if params:
-                        await cursor.execute(query, params)
-                    else:
-                        await cursor.execute(query)
-                    return await cursor.fetchall()
+            async with await asyncmy.connect(**connect_params) as connection:
+                async with connection.cursor() as cursor:
+                    await asyncio.wait_for(cursor.execute(
+                        "SELECT `INFO` FROM `information_schema`.`PROCESSLIST` WHERE `ID` = %s", (thread_id,)),
+                        MYSQL_CONNECTION_TIMEOUT)
+                    row = await cursor.fetchone()
+                    if not row or row[0] != query:
+                        return False
+                    await asyncio.wait_for(cursor.execute("KILL QUERY %s", (thread_id,)), MYSQL_CONNECTION_TIMEOUT)
+            logger.warning(f"Killed timed out query on connection {thread_id} for {self.collector_name} - {self.instance_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to kill query on connection {thread_id} for {self.collector_name} - {self.instance_name}: {str(e)}")
+            return False
+
+    @staticmethod
+    async def _fetch_raw(conn: Any, query: str, params: Tuple = None) -> Tuple[Dict[str, int], List[Tuple]]:
+        async with conn.cursor(asyncmy.cursors.Cursor) as cursor:
+            if params:
+                await cursor.execute(query, params)
+            else:
+                await cursor.execute(query)
+            rows = await cursor.fetchall()
+            columns = {column[0]: index for index, column in enumerate(cursor.description or ())}
+            return columns, rows
+
+    async def execute_query_raw(self, query: str, params: Tuple = None, workload: str = WORKLOAD_BATCH,
+                                timeout: float = MYSQL_QUERY_TIMEOUT) -> Tuple[Dict[str, int], List[Tuple]]:
+        """
+        DictCursor 없이 쿼리를 실행하고 튜플 행을 그대로 반환합니다.
+        행마다 dict 를 만들지 않으므로 1초 주기로 실행되는 수집 쿼리에 사용합니다.
+
+        :return: (컬럼명 -> 튜플 인덱스 맵, 튜플 행 목록)
+        """
+        try:
+            async with self._acquire(workload) as conn:
+                return await self._run_with_deadline(conn, self._fetch_raw(conn, query, params), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Query timed out after {timeout}s for {self.collector_name} - {self.instance_name}")
+            logger.error(f"Query: {query}")
+            raise
         except Exception as e:
             logger.error(f"Error executing query for {self.collector_name} - {self.instance_name}: {str(e)}")
             logger.error(f"Query: {query}")
             logger.error(f"Params: {params}")
             raise
 
+    async def execute_query_columnar(self, query: str, params: Tuple = None, workload: str = WORKLOAD_BATCH,
+                                     timeout: float = MYSQL_QUERY_TIMEOUT) -> Dict[str, List[Any]]:
+        """
+        쿼리 결과를 컬럼별 리스트로 반환합니다.
+
+        :return: 컬럼명 -> 값 리스트
+        """
+        columns, rows = await self.execute_query_raw(query, params, workload, timeout)
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        return {name: list(values[index]) for name, index in columns.items()}
+
+    async def stream_query(self, query: str, params: Tuple = None, batch_size: int = MYSQL_STREAM_BATCH_SIZE,
+                           workload: str = WORKLOAD_BATCH, timeout: float = MYSQL_QUERY_TIMEOUT,
+                           dict_rows: bool = True) -> AsyncIterator[List[Any]]:
+        """
+        언버퍼드(SS) 커서로 쿼리를 실행하고 결과를 batch_size 단위로 넘겨주는 비동기 이터레이터입니다.
+        소비자가 다음 배치를 요청할 때만 서버에서 행을 읽으므로 결과 크기와 무관하게 메모리 사용량이 일정합니다.
+        세션의 max_execution_time 은 스트리밍 시간까지 포함하므로, 긴 스캔은 쿼리에
+        /*+ MAX_EXECUTION_TIME(n) */ 힌트를 지정해야 합니다.
+
+        :param batch_size: 한 번에 가져올 행 수
+        :param timeout: 실행 및 배치 한 번을 가져올 때마다 적용할 데드라인 (초)
+        :param dict_rows: True 이면 dict 행, False 이면 튜플 행
+        """
+        cursor_class = asyncmy.cursors.SSDictCursor if dict_rows else asyncmy.cursors.SSCursor
+        async with self._acquire(workload) as conn:
+            cursor = conn.cursor(cursor_class)
+            exhausted = False
+            try:
+                await self._run_with_deadline(conn, cursor.execute(query, params), timeout)
+                while True:
+                    rows = await self._run_with_deadline(conn, cursor.fetchmany(batch_size), timeout)
+                    if not rows:
+                        exhausted = True
+                        break
+                    yield rows
+            except Exception as e:
+                logger.error(f"Error streaming query for {self.collector_name} - {self.instance_name}: {str(e)}")
+                logger.error(f"Query: {query}")
+                raise
+            finally:
+                if exhausted:
+                    await cursor.close()
+                else:
+                    # 남은 행을 끝까지 읽지 않도록 커넥션을 닫아 풀에서 폐기
+                    conn.close()
+
     async def close_pool(self) -> None:
-        """Close the connection pool."""
-        if not self.pool:
+        """Close the connection pools."""
+        if not self.pools:
             logger.warning(f"No connection pool found for {self.collector_name}")
             return
 
         try:
-            self.pool.close()
-            await self.pool.wait_closed()
+            for workload, pool in list(self.pools.items()):
+                pool.close()
+                await pool.wait_closed()
+                del self.pools[workload]
+                self.connect_params.pop(workload, None)
             logger.info(f"Closed MySQL connection pool for {self.collector_name} - {self.instance_name}")
         except Exception as e:
             logger.error(f"Error closing MySQL connection pool for {self.collector_name} - {self.instance_name}: {str(e)}")
@@ -69,11 +346,8 @@ class MySQLConnector:
 
     async def set_database(self, database: str) -> None:
         """Set the database for the instance."""
-        if not self.pool:
-            raise ValueError(f"No connection pool found for {self.collector_name}")
-
         try:
-            async with self.pool.acquire() as conn:
+            async with self._acquire(WORKLOAD_BATCH) as conn:
                 await conn.select_db(database)
             logger.info(f"Set database to {database} for {self.collector_name} - {self.instance_name}")
         except Exception as e:
@@ -90,11 +364,15 @@ class MySQLConnector:
             if 'password' in connection_params:
                 connection_params['password'] = decrypt_password(connection_params['password'])
 
+            connection_params.setdefault('connect_timeout', MYSQL_CONNECTION_TIMEOUT)
+            connection_params.setdefault('init_command', SESSION_INIT_COMMAND)
+
             async with await asyncmy.connect(**connection_params) as connection:
-                async with connection.cursor(asyncmy.cursors.DictCursor) as cursor:
-                    await cursor.execute(query)
-                    result = await cursor.fetchall()
-                    return result
+                return await self._run_with_deadline(connection, self._fetch_all(connection, query))
+        except asyncio.TimeoutError:
+            logger.error(f"Query with new connection timed out after {MYSQL_QUERY_TIMEOUT}s for {self.collector_name}")
+            logger.error(f"Query: {query}")
+            raise
         except asyncmy.OperationalError as e:
             logger.error(f"MySQL Operational Error: {str(e)}")
             if "Access denied" in str(e):
@@ -117,4 +395,56 @@ class MySQLConnector:
             return True
         except Exception as e:
             logger.error(f"Error testing MySQL connection: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+PROCESSLIST_COLUMNS = ('ID', 'DB', 'USER', 'HOST', 'TIME', 'INFO')
+
+
+def _sample_processlist(rows: int) -> List[Tuple]:
+    return [
+        (100000 + i, f"service_{i % 8}", f"app_user_{i % 4}", f"10.0.{i % 256}.{i % 100}:{40000 + i}", i % 30,
+         f"SELECT o.id, o.status FROM orders o WHERE o.store_id = {i} AND o.created_at > NOW() - INTERVAL 1 DAY")
+        for i in range(rows)
+    ]
+
+
+def run_benchmark(rows: int = 300, rounds: int = 200) -> None:
+    """
+    PROCESSLIST 한 번(rows 행)을 처리하는 비용을 DictCursor 방식(행마다 dict 생성 후 키 조회)과
+    튜플 방식(execute_query_raw)으로 비교합니다. 네트워크/프로토콜 디코딩은 두 방식이 같으므로 제외합니다.
+
+    :param rows: 샘플링 한 번의 행 수
+    :param rounds: 반복 횟수
+    """
+    import timeit
+    import tracemalloc
+    raw_rows = _sample_processlist(rows)
+
+    def dict_path():
+        # asyncmy DictCursor 와 같은 방식으로 행 dict 생성
+        result = [dict(zip(PROCESSLIST_COLUMNS, row)) for row in raw_rows]
+        for row in result:
+            pid, db, user, host, time_, info = (row['ID'], row['DB'], row['USER'], row['HOST'],
+                                                row['TIME'], row['INFO'])
+        return result
+
+    def tuple_path():
+        for row in raw_rows:
+            pid, db, user, host, time_, info = row
+        return raw_rows
+
+    print(f"{'path':<8}{'peak KB':>10}{'us/tick':>10}")
+    for name, path in (("dict", dict_path), ("tuple", tuple_path)):
+        tracemalloc.start()
+        path()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        elapsed = timeit.timeit(path, number=rounds) / rounds
+        print(f"{name:<8}{peak / 1024:>10.1f}{elapsed * 1e6:>10.1f}")
+
+
+# 사용 예시
+# python -m modules.mysql_connector [rows] [rounds]
+if __name__ == "__main__":
+    import sys
+    run_benchmark(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,251 @@
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set
+from urllib.parse import urlencode
+from fastapi import Request
+from fastapi.responses import Response
+from modules.fast_json import FastJSONResponse
+from modules.content_negotiation import JSON, negotiate, render
+from configs.cache_conf import cache_settings
+from configs.mongo_conf import mongo_settings
+from modules.mongodb_connector import change_streams_unsupported
+
+logger = logging.getLogger(__name__)
+
+# 원본 컬렉션별 인스턴스 필드, 변경 이벤트에서 인스턴스 단위 태그를 만들 때 사용
+INSTANCE_FIELDS = {
+    mongo_settings.MONGO_COM_STATUS_COLLECTION: 'instance_name',
+    mongo_settings.MONGO_DISK_USAGE_COLLECTION: 'instance_name',
+}
+
+
+def cache_tag(collection: str, instance: Optional[str] = None) -> str:
+    return f"{collection}:{instance}" if instance else collection
+
+
+class CacheEntry:
+    __slots__ = ('body', 'media_type', 'etag', 'expires_at', 'tags')
+
+    def __init__(self, body: bytes, media_type: str, etag: str, expires_at: float, tags: Set[str]):
+        self.body = body
+        self.media_type = media_type
+        self.etag = etag
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class ResponseCache:
+    """
+    읽기 API 의 직렬화된 JSON 응답을 보관하는 프로세스 내 캐시입니다.
+    - TTL 과 항목 수 상한(LRU)으로 크기를 제한합니다.
+    - 같은 키의 동시 요청은 한 번만 계산하고 결과를 공유합니다 (single-flight).
+    - 원본 컬렉션 변경 스트림 이벤트로 태그 단위 무효화합니다.
+    - 약한 ETag 를 붙여 If-None-Match 가 일치하면 304 를 반환합니다.
+    """
+
+    def __init__(self, max_entries: int = cache_settings.RESPONSE_CACHE_MAX_ENTRIES,
+                 default_ttl: int = cache_settings.RESPONSE_CACHE_DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tag_keys: Dict[str, Set[str]] = {}
+        # 계산 중 무효화된 결과를 저장하지 않기 위한 태그별 세대 번호
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._watch_task: Optional[asyncio.Task] = None
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'not_modified': 0, 'invalidations': 0,
+                      'evictions': 0}
+
+    @staticmethod
+    def request_key(request: Request) -> str:
+        params = urlencode(sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{params}"
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._tag_keys.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        removed = 0
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in list(self._tag_keys.get(tag, ())):
+                self._remove(key)
+                removed += 1
+        if removed:
+            self.stats['invalidations'] += removed
+        return removed
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._entries.clear()
+        self._tag_keys.clear()
+
+    async def _compute(self, key: str, producer: Callable[[], Awaitable[Any]], tags: Set[str],
+                       ttl: int, media_type: str) -> CacheEntry:
+        epoch = self._epoch
+        generations = {tag: self._generations.get(tag, 0) for tag in tags}
+        body = render(await producer(), media_type)
+        # 압축 미들웨어가 200 의 ETag 를 약한 ETag 로 바꾸므로 304 와 같도록 처음부터 약한 ETag 사용
+        entry = CacheEntry(body, media_type, f'W/"{hashlib.sha1(body).hexdigest()}"', time.monotonic() + ttl, tags)
+        if epoch == self._epoch and all(
+                self._generations.get(tag, 0) == generation for tag, generation in generations.items()):
+            self._store(key, entry)
+        return entry
+
+    async def get_or_compute(self, key: str, producer: Callable[[], Awaitable[Any]],
+                             tags: Iterable[str], ttl: Optional[int] = None,
+                             media_type: str = JSON) -> CacheEntry:
+        entry = self._get(key)
+        if entry is not None:
+            self.stats['hits'] += 1
+            return entry
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry = await self._compute(key, producer, set(tags), ttl or self.default_ttl, media_type)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            # 대기 중인 요청도 같은 예외(예: 404 HTTPException)를 받음
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def respond(self, request: Request, producer: Callable[[], Awaitable[Any]],
+                      tags: Iterable[str], ttl: Optional[int] = None,
+                      formats: Sequence[str] = (JSON,)) -> Response:
+        """
+        캐시된 응답을 반환하거나 producer 로 계산해 캐시합니다.
+
+        :param request: 요청 (경로와 쿼리 파라미터가 캐시 키)
+        :param producer: JSON 으로 직렬화할 값을 반환하는 코루틴 함수
+        :param tags: 무효화 태그 (cache_tag 로 생성)
+        :param ttl: 캐시 유지 시간 (초)
+        :param formats: Accept 헤더로 협상할 미디어 타입 (첫 번째가 기본값)
+        :return: ETag 가 포함된 응답 또는 304
+        """
+        media_type = negotiate(request, formats)
+        if not cache_settings.RESPONSE_CACHE_ENABLED:
+            if media_type == JSON:
+                return FastJSONResponse(await producer())
+            return Response(content=render(await producer(), media_type), media_type=media_type)
+
+        key = f"{self.request_key(request)}#{media_type}"
+        entry = await self.get_or_compute(key, producer, tags, ttl, media_type)
+        headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+        if_none_match = request.headers.get("if-none-match")
+        # If-None-Match 는 약한 비교 (W/ 접두어 무시)
+        if if_none_match and entry.etag.removeprefix("W/") in [
+                tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            self.stats['not_modified'] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+    def start_invalidation(self, db, collections: List[str]) -> None:
+        if not cache_settings.RESPONSE_CACHE_CHANGE_STREAMS:
+            return
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch(db, collections))
+
+    async def stop_invalidation(self) -> None:
+        if self._watch_task:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self, db, collections: List[str]) -> None:
+        """
+        원본 컬렉션의 쓰기를 변경 스트림으로 받아 해당 태그를 무효화합니다.
+        TTL 만료 같은 삭제는 무시하고 캐시 TTL 에 맡깁니다.
+        """
+        pipeline = [{"$match": {
+            "operationType": {"$in": ["insert", "update", "replace"]},
+            "ns.coll": {"$in": collections}
+        }}]
+        resume_token = None
+        while True:
+            try:
+                async with db.watch(pipeline, resume_after=resume_token) as stream:
+                    logger.info(f"Response cache invalidation watching {collections}")
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        collection = change["ns"]["coll"]
+                        tags = [cache_tag(collection)]
+                        instance_field = INSTANCE_FIELDS.get(collection)
+                        instance = (change.get("fullDocument") or {}).get(instance_field) if instance_field else None
+                        if instance:
+                            tags.append(cache_tag(collection, instance))
+                        elif instance_field:
+                            # 인스턴스를 알 수 없는 변경은 컬렉션 전체를 무효화
+                            tags.extend(tag for tag in list(self._tag_keys) if tag.startswith(f"{collection}:"))
+                        self.invalidate(tags)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if change_streams_unsupported(e):
+                    # standalone 등에서는 재시도해도 실패하므로 감시를 끄고 TTL 로만 만료
+                    logger.warning(f"Change streams are not supported, response cache relies on TTL only: {e}")
+                    return
+                logger.warning(f"Response cache change stream stopped, relying on TTL for 60s: {e}")
+                # 놓친 이벤트가 있을 수 있으므로 비우고 새로 시작
+                self.clear()
+                resume_token = None
+                await asyncio.sleep(60)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'watching': self._watch_task is not None and not self._watch_task.done(),
+            **self.stats
+        }
+
+
+response_cache = ResponseCache()
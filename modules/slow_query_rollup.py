@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from modules.mongodb_connector import MongoDBConnector
+from configs.mongo_conf import mongo_settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "slow_query_hourly"
+
+
+def floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_time_filter(start_datetime: Optional[datetime], end_datetime: Optional[datetime]) -> Dict[str, Any]:
+    """
+    롤업 컬렉션의 시간 조건을 만듭니다. 롤업은 시간 단위이므로 시작 시각은 정시로 내림합니다.
+
+    :param start_datetime: 시작 시각 (포함)
+    :param end_datetime: 종료 시각 (미포함)
+    :return: $match 조건
+    """
+    hour_filter = {}
+    if start_datetime:
+        hour_filter["$gte"] = floor_hour(start_datetime)
+    if end_datetime:
+        hour_filter["$lt"] = end_datetime
+    return {"hour": hour_filter} if hour_filter else {}
+
+
+async def _touched_hour_range(collection, lower: Optional[ObjectId],
+                              upper: ObjectId) -> Optional[Tuple[datetime, datetime]]:
+    """_id 구간에 새로 들어온 문서가 걸쳐 있는 start 시간대의 범위를 반환합니다."""
+    id_filter = {"$lt": upper}
+    if lower is not None:
+        id_filter["$gte"] = lower
+    cursor = collection.aggregate([
+        {"$match": {"_id": id_filter}},
+        {"$group": {"_id": None, "first": {"$min": "$start"}, "last": {"$max": "$start"}}}
+    ])
+    result = await cursor.to_list(length=1)
+    if not result or result[0]["first"] is None:
+        return None
+    return floor_hour(result[0]["first"]), floor_hour(result[0]["last"]) + timedelta(hours=1)
+
+
+async def _merge_hours(collection, first_hour: datetime, end_hour: datetime) -> None:
+    """
+    해당 시간대를 원본 문서에서 다시 집계해 롤업 컬렉션에 덮어씁니다.
+    시간대 단위로 통째로 교체하므로 같은 구간을 여러 번 처리해도 결과가 같습니다.
+    """
+    pipeline = [
+        {"$match": {"start": {"$gte": first_hour, "$lt": end_hour}}},
+        {
+            "$group": {
+                "_id": {
+                    "instance": "$instance",
+                    "db": "$db",
+                    "user": "$user",
+                    "hour": {"$dateTrunc": {"date": "$start", "unit": "hour"}}
+                },
+                "count": {"$sum": 1},
+                "max_time": {"$max": "$time"},
+                "total_time": {"$sum": "$time"}
+            }
+        },
+        {
+            "$project": {
+                "instance": "$_id.instance",
+                "db": "$_id.db",
+                "user": "$_id.user",
+                "hour": "$_id.hour",
+                "count": 1,
+                "max_time": 1,
+                "total_time": 1,
+                "updated_at": "$$NOW"
+            }
+        },
+        {
+            "$merge": {
+                "into": mongo_settings.MONGO_SLOW_LOG_ROLLUP_COLLECTION,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }
+        }
+    ]
+    await collection.aggregate(pipeline).to_list(length=None)
+
+
+async def refresh_slow_query_rollup() -> int:
+    """
+    마지막 체크포인트 이후 기록된 슬로우 쿼리를 시간별 롤업 컬렉션에 반영합니다.
+    체크포인트는 CAS 로 선점하므로 여러 워커가 동시에 호출해도 한 곳에서만 처리되고,
+    집계가 실패하면 체크포인트를 되돌려 다음 호출에서 다시 처리합니다.
+
+    :return: 다시 집계한 시간대 수
+    """
+    db = await MongoDBConnector.get_database()
+    checkpoints = db[mongo_settings.MONGO_ROLLUP_CHECKPOINT_COLLECTION]
+    slow_log = db[mongo_settings.MONGO_SLOW_LOG_COLLECTION]
+
+    now = datetime.now(timezone.utc)
+    upper = ObjectId.from_datetime(now - timedelta(seconds=mongo_settings.SLOW_LOG_ROLLUP_LAG_SECONDS))
+    checkpoint = await checkpoints.find_one({"_id": CHECKPOINT_NAME})
+    lower = checkpoint["upper_id"] if checkpoint else None
+    if lower is not None and lower >= upper:
+        return 0
+
+    # 처리 구간 선점
+    if checkpoint is None:
+        try:
+            await checkpoints.insert_one({"_id": CHECKPOINT_NAME, "upper_id": upper, "updated_at": now})
+        except DuplicateKeyError:
+            return 0
+    else:
+        claimed = await checkpoints.update_one(
+            {"_id": CHECKPOINT_NAME, "upper_id": lower},
+            {"$set": {"upper_id": upper, "updated_at": now}}
+        )
+        if claimed.modified_count == 0:
+            return 0
+
+    try:
+        hours = await _touched_hour_range(slow_log, lower, upper)
+        if hours is None:
+            return 0
+        first_hour, end_hour = hours
+        await _merge_hours(slow_log, first_hour, end_hour)
+    except Exception:
+        # 선점한 구간을 되돌려 다음 호출에서 다시 처리
+        if checkpoint is None:
+            await checkpoints.delete_one({"_id": CHECKPOINT_NAME, "upper_id": upper})
+        else:
+            await checkpoints.update_one({"_id": CHECKPOINT_NAME, "upper_id": upper},
+                                         {"$set": {"upper_id": lower}})
+        raise
+
+    merged_hours = int((end_hour - first_hour).total_seconds() // 3600)
+    logger.info(f"Slow query rollup refreshed {merged_hours} hour(s) from {first_hour} to {end_hour}")
+    return merged_hours
@@ -0,0 +1,270 @@
+import re
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMMENT_PATTERN = re.compile(r'/\*.*?\*/|--[^\n]*|#[^\n]*', re.DOTALL)
+STRING_PATTERN = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+NUMBER_PATTERN = re.compile(r'\b\d+(?:\.\d+)?\b|\b0x[0-9a-f]+\b', re.IGNORECASE)
+IN_LIST_PATTERN = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# 식별자(백틱 포함, db.table 형태), 괄호, 쉼표만 토큰으로 사용
+TOKEN_PATTERN = re.compile(r'`[^`]+`(?:\.`[^`]+`|\.[\w$]+)?|[\w$]+(?:\.`[^`]+`|\.[\w$]+)?|[(),;]')
+
+# 부분 문자열 검색용 접두어: 단어(식별자, 키워드, 리터럴 안의 단어)와 단어 안의 '_'/'$' 뒤에서 시작하는 3~16자 접두어
+WORD_PATTERN = re.compile(r'[a-z_$][\w$]*')
+WORD_SEPARATORS = '_$'
+SEARCH_PREFIX_MIN = 3
+SEARCH_PREFIX_MAX = 16
+# 문서당 저장하는 접두어 수 상한 (아주 긴 쿼리의 인덱스 항목 폭증 방지).
+# 단어 단위로 자르고, 잘린 문서는 sql_prefixes_truncated 로 표시해 검색 시 정규식으로만 확인
+SEARCH_PREFIX_LIMIT = 1000
+
+# 같은 이벤트의 start 추정치 허용 오차(초). 수집 쿼리의 UNIX_TIMESTAMP() 와 TIME 이 다른 초에 평가되면 1초 차이가 남
+EVENT_START_TOLERANCE = 1
+DUPLICATE_KEY_ERROR = 11000
+
+# 뒤에 테이블 이름이 오는 키워드
+TABLE_KEYWORDS = {'from', 'join', 'straight_join', 'update', 'into', 'table'}
+# FROM/UPDATE 뒤 쉼표로 이어지는 테이블 목록을 끝내는 키워드
+CLAUSE_KEYWORDS = {
+    'where', 'group', 'order', 'having', 'limit', 'union', 'join', 'inner', 'left', 'right', 'cross',
+    'natural', 'straight_join', 'on', 'using', 'set', 'values', 'value', 'select', 'for', 'lock',
+    'window', 'procedure', 'into', 'partition', 'force', 'ignore', 'use', 'outer', 'as', 'lateral',
+    'dual', 'with', 'returning'
+}
+
+
+def strip_literals(sql_text: str) -> str:
+    """주석을 제거하고 문자열/숫자 리터럴을 ? 로 바꿉니다."""
+    sql_text = COMMENT_PATTERN.sub(' ', sql_text)
+    sql_text = STRING_PATTERN.sub('?', sql_text)
+    return NUMBER_PATTERN.sub('?', sql_text)
+
+
+def normalize_sql(sql_text: str) -> str:
+    """
+    리터럴 값만 다른 쿼리가 같은 문자열이 되도록 정규화합니다 (MySQL digest text 와 유사).
+
+    :param sql_text: 원본 SQL
+    :return: 정규화된 SQL
+    """
+    normalized = strip_literals(sql_text)
+    normalized = IN_LIST_PATTERN.sub('(...)', normalized)
+    return WHITESPACE_PATTERN.sub(' ', normalized).strip().rstrip(';').strip().lower()
+
+
+def sql_digest(sql_text: str) -> str:
+    """정규화된 SQL 의 sha256 해시 (쿼리 패턴 식별자)"""
+    return hashlib.sha256(normalize_sql(sql_text).encode('utf-8')).hexdigest()
+
+
+def event_start_slots(start: datetime) -> List[int]:
+    """
+    이벤트 중복 판정용 시작 시각 칸 번호 두 개. 폭 2초 격자와 1초 어긋난 격자에서 start 가 속한 칸입니다.
+    start 가 EVENT_START_TOLERANCE(1초) 이내로 다르면 적어도 한 칸이 같고, 2초 이상 다르면 겹치지 않으므로
+    unique 인덱스 (instance, pid, digest, start_slots) 가 수집기 간 오차는 중복으로, 같은 pid 의 다음 쿼리는
+    (EXEC_TIME 이상 실행된 앞 쿼리가 끝난 뒤 시작하므로) 별개 이벤트로 판정합니다.
+
+    :param start: 쿼리 시작 시각 (초 단위, 시간대 없는 값은 UTC)
+    :return: [짝수 칸 번호, 홀수 칸 번호]
+    """
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    timestamp = int(start.timestamp())
+    return [timestamp // 2 * 2, (timestamp + 1) // 2 * 2 - 1]
+
+
+def slow_query_event_id(instance: str, pid: int, start: datetime, digest: str) -> str:
+    """
+    슬로우 쿼리 이벤트의 고정 식별자. MySQL pid 는 인스턴스 간, 재시작 후 재사용되므로
+    중복 판정과 같은 이벤트 식별 정보 (instance, pid, digest, start) 로 만듭니다.
+    start 는 반올림하지 않은 서버 기준 시작 초이므로 같은 pid 의 다른 이벤트는 다른 식별자를 얻고,
+    수집기 간 1초 오차로 생긴 두 번째 기록은 unique 인덱스(start_slots)가 막으므로 이벤트당 식별자는 하나만 저장됩니다.
+
+    :param start: 쿼리 시작 시각 (시간대 없는 값은 UTC)
+    :param digest: sql_digest 로 계산한 쿼리 패턴
+    :return: 24자리 16진수 문자열
+    """
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    source = f"{instance}:{pid}:{digest}:{int(start.timestamp())}"
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:24]
+
+
+def _table_name(token: str) -> str:
+    # db.table 은 테이블 이름만 사용, 백틱 제거 후 소문자
+    return token.split('.')[-1].strip('`').lower()
+
+
+def extract_tables(sql_text: str) -> List[str]:
+    """
+    SQL 이 참조하는 테이블 이름을 추출합니다. 파서 대신 가벼운 토크나이저로
+    FROM/JOIN/UPDATE/INTO 뒤의 식별자와 FROM 절의 쉼표 목록을 읽습니다. 서브쿼리는 건너뜁니다.
+
+    :param sql_text: 원본 SQL
+    :return: 정렬된 테이블 이름 목록 (중복 제거)
+    """
+    tokens = [token.lower() if not token.startswith('`') else token
+              for token in TOKEN_PATTERN.findall(strip_literals(sql_text))]
+    tables = set()
+    i = 0
+    while i < len(tokens):
+        keyword = tokens[i]
+        i += 1
+        if keyword not in TABLE_KEYWORDS:
+            continue
+        list_clause = keyword in ('from', 'update')
+        while i < len(tokens):
+            token = tokens[i]
+            if token in ('(', ')', ',', ';', '?') or token in CLAUSE_KEYWORDS:
+                break
+            tables.add(_table_name(tokens[i]))
+            i += 1
+            # 별칭 (AS alias 또는 alias)
+            if i < len(tokens) and tokens[i] == 'as':
+                i += 2
+            elif i < len(tokens) and tokens[i] not in CLAUSE_KEYWORDS and tokens[i] not in ('(', ')', ',', ';'):
+                i += 1
+            if list_clause and i < len(tokens) and tokens[i] == ',':
+                i += 1
+                continue
+            break
+    tables.discard('dual')
+    return sorted(tables)
+
+
+def _word_starts(word: str) -> List[int]:
+    # 단어 처음과 '_'/'$' 다음 위치 (order_items 는 order_items, items 로 시작하는 검색어 모두 허용).
+    # 검색어도 앞의 '_'/'$' 를 떼고 비교하므로 구분자로 시작하는 위치는 제외
+    return [i for i, char in enumerate(word)
+            if char not in WORD_SEPARATORS and (i == 0 or word[i - 1] in WORD_SEPARATORS)]
+
+
+def identifier_prefixes(sql_text: str) -> Tuple[List[str], bool]:
+    """
+    /slow_queries/search/text 의 인덱스 후보 검색에 쓰는 접두어 목록을 만듭니다.
+    단어마다 단어 처음과 '_'/'$' 다음 위치에서 시작하는 SEARCH_PREFIX_MIN~MAX 자 접두어를 모두 모읍니다.
+    리터럴 안의 단어(status = 'pending' 의 pending)도 포함하되 식별자와 키워드를 먼저 담고,
+    SEARCH_PREFIX_LIMIT 를 넘으면 남은 단어는 통째로 빼고 truncated 로 표시합니다.
+
+    :param sql_text: 원본 SQL
+    :return: (소문자 접두어 목록, 단어가 빠졌는지 여부)
+    """
+    lowered = sql_text.lower()
+    prefixes = set()
+    seen = set()
+    for word in WORD_PATTERN.findall(strip_literals(lowered)) + WORD_PATTERN.findall(lowered):
+        for start in _word_starts(word):
+            rest = word[start:start + SEARCH_PREFIX_MAX]
+            if len(rest) < SEARCH_PREFIX_MIN or rest in seen:
+                continue
+            seen.add(rest)
+            word_prefixes = {rest[:length] for length in range(SEARCH_PREFIX_MIN, len(rest) + 1)}
+            if len(prefixes | word_prefixes) > SEARCH_PREFIX_LIMIT:
+                return sorted(prefixes), True
+            prefixes |= word_prefixes
+    return sorted(prefixes), False
+
+
+def search_prefixes(text: str) -> List[str]:
+    """
+    검색어에서 sql_prefixes 와 비교할 접두어를 고릅니다. 각 단어의 앞 '_'/'$' 를 떼고 앞 SEARCH_PREFIX_MAX 자를 사용하며
+    SEARCH_PREFIX_MIN 자보다 짧은 단어는 건너뜁니다 (이후 정규식 확인에서만 비교).
+
+    :param text: 검색어
+    :return: 소문자 접두어 목록 (비어 있으면 인덱스로 후보를 좁힐 수 없음)
+    """
+    words = [word.lstrip(WORD_SEPARATORS) for word in WORD_PATTERN.findall(text.lower())]
+    return sorted({word[:SEARCH_PREFIX_MAX] for word in words if len(word) >= SEARCH_PREFIX_MIN})
+
+
+async def backfill_slow_query_metadata(collection, batch_size: int = 1000) -> int:
+    """
+    tables/digest/event_id/sql_prefixes 가 없는 기존 슬로우 쿼리 문서를 채웁니다. 반복 실행해도 남은 문서만 처리합니다.
+    sql_prefixes_truncated 가 없는 문서는 이전 방식(짧은 접두어만 남기고 자름, 리터럴 제외)의 접두어이므로 다시 계산합니다.
+
+    :param collection: 슬로우 쿼리 컬렉션
+    :param batch_size: bulk_write 한 번에 보낼 문서 수
+    :return: 갱신된 문서 수
+    """
+    # 문자열 유틸리티는 드라이버 없이 가져올 수 있도록 (테스트, 오프라인 도구) 함수 안에서 import
+    from pymongo import UpdateOne
+
+    updated = 0
+    duplicates = 0
+    batch = []
+    query = {'$or': [{'digest': {'$exists': False}}, {'event_id': {'$exists': False}},
+                     {'sql_prefixes_truncated': {'$exists': False}}]}
+    projection = {'sql_text': 1, 'instance': 1, 'pid': 1, 'start': 1, 'event_id': 1}
+    cursor = collection.find(query, projection).batch_size(batch_size)
+    async for document in cursor:
+        sql_text = document.get('sql_text') or ''
+        prefixes, truncated = identifier_prefixes(sql_text)
+        fields = {
+            'tables': extract_tables(sql_text),
+            'digest': sql_digest(sql_text),
+            'sql_prefixes': prefixes,
+            'sql_prefixes_truncated': truncated
+        }
+        # 이미 발급된 event_id 는 외부에서 참조 중일 수 있으므로 바꾸지 않음
+        if not document.get('event_id'):
+            fields['event_id'] = slow_query_event_id(document['instance'], document['pid'], document['start'],
+                                                     fields['digest'])
+        batch.append(UpdateOne({'_id': document['_id']}, {'$set': fields}))
+        if len(batch) >= batch_size:
+            batch_updated, batch_duplicates = await _write_backfill(collection, batch)
+            updated += batch_updated
+            duplicates += batch_duplicates
+            batch = []
+    if batch:
+        batch_updated, batch_duplicates = await _write_backfill(collection, batch)
+        updated += batch_updated
+        duplicates += batch_duplicates
+    logger.info(f"Backfilled tables/digest/event_id/sql_prefixes on {updated} slow query documents")
+    if duplicates:
+        logger.warning(f"Skipped {duplicates} slow query documents whose event_id duplicates another document "
+                       f"(same event stored twice with the same start)")
+    return updated
+
+
+async def _write_backfill(collection, batch: List[Any]):
+    """backfill 배치를 기록하고 (갱신 수, event_id 중복으로 건너뛴 수) 를 돌려줍니다."""
+    from pymongo.errors import BulkWriteError
+
+    try:
+        return (await collection.bulk_write(batch, ordered=False)).modified_count, 0
+    except BulkWriteError as e:
+        write_errors = e.details.get('writeErrors', [])
+        duplicates = sum(1 for error in write_errors if error.get('code') == DUPLICATE_KEY_ERROR)
+        if duplicates < len(write_errors):
+            raise
+        return e.details.get('nModified', 0), duplicates
+
+
+# 사용 예시
+if __name__ == "__main__":
+    sample = ("SELECT o.id, i.sku FROM `shop`.`orders` o JOIN order_items AS i ON i.order_id = o.id "
+              "WHERE o.store_id IN (1, 2, 3) AND o.memo = 'it''s' AND o.id IN (SELECT order_id FROM refunds)")
+    print(f"tables: {extract_tables(sample)}")
+    print(f"normalized: {normalize_sql(sample)}")
+    print(f"digest: {sql_digest(sample)}")
+    print(f"prefixes: {identifier_prefixes(sample)}")
+
+    async def _main():
+        from modules.mongodb_connector import MongoDBConnector
+        from configs.mongo_conf import mongo_settings
+        await MongoDBConnector.initialize()
+        try:
+            collection = await MongoDBConnector.get_collection(mongo_settings.MONGO_SLOW_LOG_COLLECTION)
+            print(f"Backfilled {await backfill_slow_query_metadata(collection)} documents")
+        finally:
+            await MongoDBConnector.close()
+
+    import sys
+    if "--backfill" in sys.argv:
+        asyncio.run(_main())
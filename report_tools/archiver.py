@@ -0,0 +1,308 @@
+import io
+import os
+import json
+import asyncio
+import hashlib
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+import zstandard as zstd
+from bson import json_util
+from fastapi import APIRouter, HTTPException
+from pymongo.errors import BulkWriteError
+from modules.mongodb_connector import MongoDBConnector
+from configs.retention_conf import retention_settings, RETENTION_POLICIES, STRING_TIME_COLLECTIONS
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".archive.lock"
+STALE_LOCK_SECONDS = 6 * 3600
+ARCHIVE_FORMAT = "jsonl+zstd"
+STRING_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _month_start(dt: datetime) -> datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def _next_month(month: datetime) -> datetime:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MongoArchiver:
+    """
+    보관 기간이 지나기 전에 오래된 MongoDB 문서를 월 단위 zstd JSONL 파일로 내보내는 아카이버입니다.
+    문서는 bson canonical extended JSON 으로 기록하므로 타입 손실 없이 다시 적재할 수 있습니다.
+    아카이브를 켜면 TTL 인덱스를 만들지 않고, 보관 기간이 지난 월은 매니페스트에 아카이브된 뒤에만 여기서 삭제합니다.
+    """
+
+    def __init__(self, archive_dir: str = retention_settings.ARCHIVE_DIR,
+                 batch_size: int = retention_settings.ARCHIVE_BATCH_SIZE,
+                 compression_level: int = retention_settings.ARCHIVE_COMPRESSION_LEVEL):
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.compression_level = compression_level
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.archive_dir, MANIFEST_FILE)
+
+    def load_manifest(self) -> Dict[str, Any]:
+        if not os.path.exists(self.manifest_path):
+            return {"archives": []}
+        with open(self.manifest_path, 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(manifest, fh, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _bound(month: datetime, is_string: bool) -> Any:
+        return month.strftime(STRING_TIME_FORMAT) if is_string else month
+
+    async def run(self) -> Dict[str, List[str]]:
+        """
+        완료된 월 중 아직 아카이브되지 않은 월을 모두 내보냅니다.
+
+        Returns:
+            Dict[str, List[str]]: 컬렉션별 새로 아카이브된 월 목록
+        """
+        if not retention_settings.ARCHIVE_ENABLED:
+            logger.info("Archiving is disabled")
+            return {}
+        # 여러 워커 프로세스의 스케줄러가 동시에 실행하지 않도록 잠금 파일 사용
+        if not self._acquire_lock():
+            logger.info("Another archive run is in progress, skipping")
+            return {}
+
+        try:
+            db = await MongoDBConnector.get_database()
+            manifest = self.load_manifest()
+            archived = {}
+
+            for collection_name, policy in RETENTION_POLICIES.items():
+                try:
+                    archived[collection_name] = await self._archive_collection(db, collection_name, policy, manifest)
+                    # TTL 인덱스가 없는 컬렉션은 아카이브가 끝난 월만 직접 삭제
+                    if not policy['ttl'] and policy['days'] > 0:
+                        await self._purge_archived(db, collection_name, policy, manifest)
+                except Exception as e:
+                    logger.error(f"Error archiving {collection_name}: {str(e)}", exc_info=True)
+
+            logger.info(f"Archive run completed: {archived}")
+            return archived
+        finally:
+            os.remove(os.path.join(self.archive_dir, LOCK_FILE))
+
+    def _acquire_lock(self) -> bool:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        lock_path = os.path.join(self.archive_dir, LOCK_FILE)
+        if os.path.exists(lock_path) and \
+                datetime.now().timestamp() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+            logger.warning(f"Removing stale archive lock {lock_path}")
+            os.remove(lock_path)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(str(os.getpid()))
+        return True
+
+    async def _archive_collection(self, db, collection_name: str, policy: Dict[str, Any],
+                                  manifest: Dict[str, Any]) -> List[str]:
+        field = policy['field']
+        is_string = collection_name in STRING_TIME_COLLECTIONS
+        collection = db[collection_name]
+
+        oldest = await collection.find_one({field: {"$ne": None}}, {field: 1}, sort=[(field, 1)])
+        if not oldest:
+            return []
+
+        oldest_value = oldest[field]
+        if is_string:
+            oldest_value = datetime.strptime(oldest_value[:19], STRING_TIME_FORMAT)
+        month = _month_start(oldest_value)
+        current_month = _month_start(datetime.now(timezone.utc))
+
+        done = {entry['month'] for entry in manifest['archives'] if entry['collection'] == collection_name}
+        archived = []
+        while month < current_month:
+            month_key = month.strftime("%Y-%m")
+            if month_key not in done:
+                entry = await self._archive_month(collection, collection_name, field, month, is_string)
+                manifest['archives'].append(entry)
+                self._save_manifest(manifest)
+                archived.append(month_key)
+            month = _next_month(month)
+        return archived
+
+    async def _archive_month(self, collection, collection_name: str, field: str, month: datetime,
+                             is_string: bool) -> Dict[str, Any]:
+        month_key = month.strftime("%Y-%m")
+        lower, upper = self._bound(month, is_string), self._bound(_next_month(month), is_string)
+
+        collection_dir = os.path.join(self.archive_dir, collection_name)
+        os.makedirs(collection_dir, exist_ok=True)
+        file_path = os.path.join(collection_dir, f"{collection_name}_{month_key}.jsonl.zst")
+        tmp_path = f"{file_path}.tmp"
+
+        count = 0
+        compressor = zstd.ZstdCompressor(level=self.compression_level)
+        cursor = collection.find({field: {"$gte": lower, "$lt": upper}}).batch_size(self.batch_size)
+        with open(tmp_path, 'wb') as fh:
+            with compressor.stream_writer(fh, closefd=False) as writer:
+                async for document in cursor:
+                    line = json_util.dumps(document, json_options=json_util.CANONICAL_JSON_OPTIONS)
+                    writer.write(line.encode('utf-8') + b'\n')
+                    count += 1
+        os.replace(tmp_path, file_path)
+
+        entry = {
+            "collection": collection_name,
+            "month": month_key,
+            "file": os.path.relpath(file_path, self.archive_dir),
+            "format": ARCHIVE_FORMAT,
+            "time_field": field,
+            "range": {"gte": str(lower), "lt": str(upper)},
+            "documents": count,
+            "bytes": os.path.getsize(file_path),
+            "sha256": _sha256(file_path),
+            "purged": False,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        logger.info(f"Archived {count} documents of {collection_name} for {month_key} to {file_path}")
+        return entry
+
+    async def _purge_archived(self, db, collection_name: str, policy: Dict[str, Any],
+                              manifest: Dict[str, Any]) -> None:
+        """
+        매니페스트에 아카이브된 월 중 보관 기간이 지난 월의 문서를 삭제합니다 (TTL 인덱스 대신 사용).
+        파일 체크섬이 맞지 않으면 삭제하지 않고, 아카이브 뒤에 늘어난 문서가 있으면 그 월을 다시 내보낸 뒤 삭제합니다.
+        """
+        field = policy['field']
+        is_string = collection_name in STRING_TIME_COLLECTIONS
+        collection = db[collection_name]
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=policy['days'])
+        for index, entry in enumerate(manifest['archives']):
+            if entry['collection'] != collection_name or entry['purged']:
+                continue
+            month = datetime.strptime(entry['month'], "%Y-%m")
+            if _next_month(month) > cutoff:
+                continue
+            file_path = os.path.join(self.archive_dir, entry['file'])
+            if not os.path.exists(file_path) or _sha256(file_path) != entry['sha256']:
+                logger.error(f"Archive {file_path} is missing or corrupt, not purging {collection_name} "
+                             f"for {entry['month']}")
+                continue
+            time_range = {field: {"$gte": self._bound(month, is_string),
+                                  "$lt": self._bound(_next_month(month), is_string)}}
+            if await collection.count_documents(time_range) > entry['documents']:
+                # 아카이브 이후 기록된 문서까지 포함해 다시 내보냄
+                entry = await self._archive_month(collection, collection_name, field, month, is_string)
+                manifest['archives'][index] = entry
+                self._save_manifest(manifest)
+            result = await collection.delete_many(time_range)
+            entry['purged'] = True
+            self._save_manifest(manifest)
+            logger.info(f"Purged {result.deleted_count} archived documents of {collection_name} for {entry['month']}")
+
+    async def restore(self, file: str, target_collection: Optional[str] = None) -> int:
+        """
+        아카이브 파일을 다시 MongoDB 에 적재합니다.
+        원본 컬렉션에 넣으면 보관 기간 정리(아카이버 삭제 또는 TTL)로 곧바로 다시 지워지므로 기본값은 '<컬렉션>_restored' 컬렉션입니다.
+
+        :param file: 매니페스트 기준 상대 경로 또는 절대 경로
+        :param target_collection: 적재할 컬렉션 이름
+        :return: 적재된 문서 수
+        """
+        manifest = self.load_manifest()
+        relative = os.path.relpath(file, self.archive_dir) if os.path.isabs(file) else file
+        entry = next((item for item in manifest['archives'] if item['file'] == relative), None)
+        if entry is None:
+            raise ValueError(f"{file} is not listed in {self.manifest_path}")
+
+        file_path = os.path.join(self.archive_dir, entry['file'])
+        if _sha256(file_path) != entry['sha256']:
+            raise ValueError(f"Checksum mismatch for {file_path}")
+
+        db = await MongoDBConnector.get_database()
+        collection = db[target_collection or f"{entry['collection']}_restored"]
+
+        restored = 0
+        batch = []
+        with open(file_path, 'rb') as fh:
+            reader = io.TextIOWrapper(zstd.ZstdDecompressor().stream_reader(fh), encoding='utf-8')
+            for line in reader:
+                if line.strip():
+                    batch.append(json_util.loads(line))
+                if len(batch) >= self.batch_size:
+                    restored += await self._insert_batch(collection, batch)
+                    batch = []
+        if batch:
+            restored += await self._insert_batch(collection, batch)
+
+        logger.info(f"Restored {restored} documents from {file_path} into {collection.name}")
+        return restored
+
+    @staticmethod
+    async def _insert_batch(collection, batch: List[Dict[str, Any]]) -> int:
+        try:
+            result = await collection.insert_many(batch, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            # 이미 적재된 문서(_id 중복)는 건너뜀
+            return e.details.get('nInserted', 0)
+
+
+# API 라우터 추가
+@router.post("/archive", description="수동으로 MongoDB 아카이브 실행")
+async def manual_archive():
+    try:
+        archived = await MongoArchiver().run()
+        return {"status": "success", "archived": archived}
+    except Exception as e:
+        logger.error(f"Failed to execute manual archive: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"아카이브 실행 중 오류 발생: {str(e)}")
+
+
+@router.get("/archive/manifest")
+async def get_archive_manifest():
+    return MongoArchiver().load_manifest()
+
+
+async def _main(args):
+    await MongoDBConnector.initialize()
+    try:
+        archiver = MongoArchiver()
+        if args.command == "archive":
+            print(json.dumps(await archiver.run(), ensure_ascii=False, indent=2))
+        else:
+            print(f"Restored {await archiver.restore(args.file, args.collection)} documents")
+    finally:
+        await MongoDBConnector.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MongoDB 컬렉션 아카이브/복원 도구")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("archive", help="완료된 월의 문서를 아카이브")
+    restore_parser = subparsers.add_parser("restore", help="아카이브 파일을 다시 적재")
+    restore_parser.add_argument("file", help="매니페스트에 기록된 아카이브 파일 경로")
+    restore_parser.add_argument("--collection", help="적재할 컬렉션 (기본값: <컬렉션>_restored)")
+    asyncio.run(_main(parser.parse_args()))
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 import logging
 
 from modules.mongodb_connector import MongoDBConnector
+from modules.response_cache import response_cache, cache_tag
 from configs.mongo_conf import mongo_settings
+from configs.cache_conf import cache_settings
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -17,7 +19,17 @@ async def aggregate_data(collection, pipeline: List[Dict[str, Any]]) -> List[Dic
     return await collection.aggregate(pipeline).to_list(length=None)
 
 @router.get("/daily-instance-statistics")
-async def get_daily_instance_statistics():
+async def get_daily_instance_statistics(request: Request):
+    # 날짜가 바뀌면 집계 대상이 달라지므로 자정(UTC)을 넘겨 캐시하지 않음
+    now = datetime.utcnow()
+    until_midnight = (now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1) - now).total_seconds()
+    return await response_cache.respond(
+        request, compute_daily_instance_statistics,
+        tags=[cache_tag(mongo_settings.MONGO_RDS_INSTANCE_ALL_STAT_COLLECTION)],
+        ttl=max(1, min(cache_settings.RESPONSE_CACHE_DAILY_TTL, int(until_midnight))))
+
+
+async def compute_daily_instance_statistics():
     try:
         db = await get_database()
         collection = db[mongo_settings.MONGO_RDS_INSTANCE_ALL_STAT_COLLECTION]
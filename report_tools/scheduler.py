@@ -10,6 +10,8 @@ from apis.routes.slow_query_stat import get_weekly_statistics
 from configs.scheduler_conf import SchedulerSettings
 from configs.app_conf import app_settings
 from .cleanup import ReportCleaner
+from .archiver import MongoArchiver
+from modules.slow_query_rollup import refresh_slow_query_rollup
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,18 +24,30 @@ class ReportScheduler:
         self.tasks: Dict[str, Callable] = {
             "collect_daily_metrics": self.collect_daily_metrics,
             "cleanup_old_files": self.cleanup_old_files,
-            "weekly_slow_query_report": self.weekly_slow_query_report
+            "weekly_slow_query_report": self.weekly_slow_query_report,
+            "archive_old_documents": self.archive_old_documents,
+            "refresh_slow_query_rollup": self.refresh_slow_query_rollup
         }
+        self.hourly_tasks = {"refresh_slow_query_rollup"}
         self.weekly_tasks = {"weekly_slow_query_report"}
+        self.monthly_tasks = {"archive_old_documents"}
         self.yearly_tasks = {"cleanup_old_files"}
         self.report_cleaner = ReportCleaner()
+        self.archiver = MongoArchiver()
 
     async def schedule_task(self, task_name: str, hour: int, minute: int):
         while True:
             now = datetime.now(kst)
             next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
 
-            if task_name in self.yearly_tasks:
+            if task_name in self.hourly_tasks:
+                # 시간별 태스크 (매시 minute 분, hour 는 사용하지 않음)
+                if next_run.replace(hour=now.hour) <= now:
+                    next_run = next_run.replace(hour=now.hour) + timedelta(hours=1)
+                else:
+                    next_run = next_run.replace(hour=now.hour)
+
+            elif task_name in self.yearly_tasks:
                 # 연간 태스크 (1월 3일)
                 next_run = next_run.replace(month=1, day=3)
                 if (now.month > 1 or (now.month == 1 and now.day > 3) or
@@ -42,6 +56,14 @@ class ReportScheduler:
 
                 logger.info(f"Yearly task {task_name} scheduled for {next_run.strftime('%Y-%m-%d %H:%M:%S %Z')}")
 
+            elif task_name in self.monthly_tasks:
+                # 월간 태스크 (매월 1일)
+                next_run = next_run.replace(day=1)
+                if next_run <= now:
+                    next_run = (next_run.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+                logger.info(f"Monthly task {task_name} scheduled for {next_run.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+
             elif task_name in self.weekly_tasks:
                 # 주간 태스크 (월요일)
                 days_until_monday = (7 - now.weekday()) % 7
@@ -72,6 +94,8 @@ class ReportScheduler:
             if (task_name in self.weekly_tasks and
                     current_time.weekday() != 0):
                 continue
+            if task_name in self.monthly_tasks and current_time.day != 1:
+                continue
 
             await self.run_task(task_name)
 
@@ -108,11 +132,28 @@ class ReportScheduler:
         except Exception as e:
             logger.error(f"Error during scheduled cleanup: {str(e)}")
 
+    async def archive_old_documents(self):
+        """보관 기간이 지나기 전 MongoDB 문서를 월 단위로 아카이브"""
+        try:
+            await self.archiver.run()
+            logger.info("Monthly archive completed successfully")
+        except Exception as e:
+            logger.error(f"Error during scheduled archive: {str(e)}")
+
+    async def refresh_slow_query_rollup(self):
+        """슬로우 쿼리 시간별 롤업 갱신"""
+        try:
+            await refresh_slow_query_rollup()
+        except Exception as e:
+            logger.error(f"Error during slow query rollup refresh: {str(e)}")
+
     async def weekly_slow_query_report(self):
         try:
             # 현재 시간이 월요일인지 확인
             now = datetime.now(kst)
             if now.weekday() == 0:  # 0 = 월요일
+                # 지난주 마지막 시간대까지 롤업에 반영한 뒤 보고서 생성 (API 는 롤업을 읽기만 함)
+                await self.refresh_slow_query_rollup()
                 await get_weekly_statistics()
                 logger.info("Weekly slow query report generated and sent successfully")
             else:
@@ -133,11 +174,15 @@ class ReportScheduler:
 
     async def start(self):
         tasks = [
+            # 시작 시 한 번 갱신해 체크포인트가 없으면 전체 기간을 백필하고, 이후에는 매시 증분 갱신
+            self.run_task("refresh_slow_query_rollup"),
             self.schedule_task("collect_daily_metrics",
                              scheduler_settings.COLLECT_DAILY_METRICS_HOUR,
                              scheduler_settings.COLLECT_DAILY_METRICS_MINUTE),
             self.schedule_task("cleanup_old_files", 3, 0),  # 1월 3일 오전 3시
-            self.schedule_task("weekly_slow_query_report", 10, 0)  # 매주 월요일 오전 10시
+            self.schedule_task("weekly_slow_query_report", 10, 0),  # 매주 월요일 오전 10시
+            self.schedule_task("archive_old_documents", 4, 0),  # 매월 1일 오전 4시
+            self.schedule_task("refresh_slow_query_rollup", 0, 5)  # 매시 5분
         ]
         logger.info("Starting scheduler with KST timezone")
         await asyncio.gather(*tasks)
@@ -0,0 +1,81 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+from modules.sql_utils import event_start_slots, identifier_prefixes, search_prefixes, slow_query_event_id, sql_digest
+
+
+def _at(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def _same_event(start_a: datetime, start_b: datetime) -> bool:
+    # unique 인덱스 (instance, pid, digest, start_slots) 는 칸이 하나라도 겹치면 중복으로 판정
+    return bool(set(event_start_slots(start_a)) & set(event_start_slots(start_b)))
+
+
+def test_one_second_skew_is_duplicate_across_every_boundary():
+    # 두 수집기의 start 가 1초 다르면 칸 경계 위치와 무관하게 같은 이벤트
+    for timestamp in range(990, 1000):
+        assert _same_event(_at(timestamp), _at(timestamp + 1)), timestamp
+
+
+def test_rounding_boundary_case():
+    # 5초 반올림에서는 992.4 -> 990, 992.6 -> 995 로 갈렸던 경우 (서버 초 단위로는 992 와 993)
+    assert _same_event(_at(992), _at(993))
+    assert _same_event(_at(994), _at(995))
+
+
+def test_two_queries_on_same_pid_are_distinct():
+    # 같은 pid 의 다음 슬로우 쿼리는 EXEC_TIME(2초) 이상 실행된 앞 쿼리가 끝난 뒤 시작
+    for timestamp in range(990, 1000):
+        for gap in (2, 3, 4, 5):
+            assert not _same_event(_at(timestamp), _at(timestamp + gap)), (timestamp, gap)
+
+
+def test_naive_start_is_utc():
+    start = _at(992)
+    assert event_start_slots(start.replace(tzinfo=None)) == event_start_slots(start)
+    assert event_start_slots(start + timedelta(milliseconds=900)) == event_start_slots(start)
+
+
+def test_event_id_differs_for_two_queries_on_same_pid():
+    digest = sql_digest("SELECT * FROM orders WHERE id = 1")
+    first = slow_query_event_id("db-1", 42, _at(992), digest)
+    second = slow_query_event_id("db-1", 42, _at(994), digest)
+    assert first != second
+    assert slow_query_event_id("db-1", 42, _at(992), digest) == first
+
+
+def test_event_id_differs_by_digest_and_ignores_subsecond_start():
+    start = _at(992)
+    orders = slow_query_event_id("db-1", 42, start, sql_digest("SELECT * FROM orders"))
+    refunds = slow_query_event_id("db-1", 42, start, sql_digest("SELECT * FROM refunds"))
+    assert orders != refunds
+    assert slow_query_event_id("db-1", 42, start.replace(tzinfo=None) + timedelta(milliseconds=500),
+                               sql_digest("SELECT * FROM orders")) == orders
+
+
+def _search_matches(sql_text: str, q: str) -> bool:
+    # /slow_queries/search/text 와 같은 판정: 접두어 인덱스 후보 (또는 잘린 문서) 중 정규식이 맞는 문서
+    prefixes, truncated = identifier_prefixes(sql_text)
+    candidate = truncated or set(search_prefixes(q)) <= set(prefixes)
+    return candidate and re.search(re.escape(q), sql_text, re.IGNORECASE) is not None
+
+
+def test_search_finds_long_words_in_long_orm_queries():
+    columns = ", ".join(f"t.column_{i}_name" for i in range(60))
+    sql_text = f"SELECT {columns}, t.customer_order_fulfillment_history FROM orders t"
+    assert _search_matches(sql_text, "customer_order_fulfillment")
+    assert _search_matches(sql_text, "fulfillment_history")
+    wide = ", ".join(f"t.{name}_{i}_value" for i in range(400) for name in ("alpha", "beta"))
+    sql_text = f"SELECT {wide}, t.customer_order_fulfillment_history FROM orders t"
+    assert identifier_prefixes(sql_text)[1]
+    assert _search_matches(sql_text, "fulfillment_history")
+
+
+def test_search_matches_leading_underscore_and_literal_words():
+    sql_text = "SELECT id FROM orders WHERE status = 'pending' AND fulfillment_history IS NULL"
+    assert _search_matches(sql_text, "_history")
+    assert _search_matches(sql_text, "pending")
+    assert _search_matches(sql_text, "status = 'pend")
+    assert not _search_matches(sql_text, "shipped")